@@ -0,0 +1,78 @@
+"""
+Latency benchmark for single-entity queries against the blocker index
+(`Index.query`), as used by a long-running screening service:
+
+    python contrib/blocker_query.py entities.ftm.json --queries 1000
+
+The index is built from the entity file once. Each query then looks up an
+entity from the same file, so there's at least one candidate for it.
+"""
+
+import sys
+import time
+import click
+import random
+import shutil
+import logging
+from pathlib import Path
+from tempfile import mkdtemp
+from typing import List
+from followthemoney import StatementEntity
+
+from nomenklatura.blocker import Index
+from nomenklatura.resolver import Resolver
+from nomenklatura.db import make_session
+from nomenklatura.store import load_entity_file_store
+
+
+def percentile(values: List[float], pct: float) -> float:
+    idx = min(len(values) - 1, int(len(values) * pct))
+    return sorted(values)[idx]
+
+
+@click.command()
+@click.argument("entities_file", type=click.Path(exists=True, path_type=Path))
+@click.option("--queries", type=int, default=1000)
+@click.option("--limit", type=int, default=10)
+def main(entities_file: Path, queries: int, limit: int) -> None:
+    logging.basicConfig(level=logging.WARNING)
+    session = make_session("sqlite:///:memory:")
+    resolver = Resolver[StatementEntity](session, create=True)
+    store = load_entity_file_store(entities_file, resolver)
+    view = store.default_view()
+    data_dir = Path(mkdtemp(prefix="blocker-query-"))
+    index = Index(view, data_dir)
+    try:
+        start = time.time()
+        index.build()
+        print(f"Built index in {time.time() - start:.2f}s")
+        entities = list(view.entities())
+        rng = random.Random(42)
+        sample = [rng.choice(entities) for _ in range(queries)]
+
+        start = time.time()
+        index.query(sample[0], limit=limit)
+        print(f"First query (builds the postings): {time.time() - start:.3f}s")
+
+        timings: List[float] = []
+        results = 0
+        for entity in sample:
+            start = time.perf_counter()
+            results += len(index.query(entity, limit=limit))
+            timings.append((time.perf_counter() - start) * 1000)
+        print(
+            f"{len(timings)} queries, {results / len(timings):.1f} candidates each: "
+            f"p50={percentile(timings, 0.5):.2f}ms "
+            f"p95={percentile(timings, 0.95):.2f}ms "
+            f"p99={percentile(timings, 0.99):.2f}ms "
+            f"max={max(timings):.2f}ms"
+        )
+    finally:
+        index.close()
+        store.close()
+        session.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+Compare the recall of the blocker index with and without the MinHash field,
+against the judgements of a resolver dump (see `nk bench-blocker`):
+
+    python contrib/blocker_recall.py entities.ftm.json resolver.ijson \
+        --bands 0 --bands 8 --bands 16
+
+For each MinHash configuration (`--bands 0` is the index without the MinHash
+field), this runs `nomenklatura.blocker.bench.bench_blocker` and prints the
+recall of the positive judgements at each `--max-pairs` cut-off, the number of
+distinct tokens and term rows (the pair cost of the index) and the time taken.
+"""
+
+import sys
+import click
+import logging
+from pathlib import Path
+from typing import List
+
+from nomenklatura.blocker.bench import bench_blocker
+
+
+@click.command()
+@click.argument("entities_file", type=click.Path(exists=True, path_type=Path))
+@click.argument("resolver_file", type=click.Path(exists=True, path_type=Path))
+@click.option("--bands", type=int, multiple=True, default=[0, 8, 16])
+@click.option("--rows", type=int, default=2)
+@click.option("--max-pairs", type=int, multiple=True, default=[1000, 10000, 100000])
+def main(
+    entities_file: Path,
+    resolver_file: Path,
+    bands: List[int],
+    rows: int,
+    max_pairs: List[int],
+) -> None:
+    logging.basicConfig(level=logging.WARNING)
+    for band_count in bands:
+        options = {"minhash_bands": band_count, "minhash_rows": rows}
+        result = bench_blocker(entities_file, resolver_file, max_pairs, options)
+        label = f"bands={band_count} rows={rows}" if band_count > 0 else "no minhash"
+        recalls = [f"@{c['max_pairs']}: {c['recall']:.3f}" for c in result["cutoffs"]]
+        cost = result["pair_cost"]
+        took = result["time"]["build"] + result["time"]["pairs"]
+        print(
+            f"{label:<20} {', '.join(recalls)} | "
+            f"{cost['tokens']} tokens, {cost['term_rows']} term rows, {took:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
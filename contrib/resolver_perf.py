@@ -0,0 +1,104 @@
+"""
+Micro-benchmark for the hot read paths of the resolver on a large, synthetic
+judgement graph held in an in-memory SQLite database.
+
+    python contrib/resolver_perf.py --clusters 100000 --lookups 1000000
+
+Clusters get between one and `--max-size` members merged into an `NK-` canonical
+ID, and a share of the clusters is blocked from another one by a negative
+judgement. Each lookup picks a random member ID.
+"""
+
+import sys
+import time
+import click
+import random
+from typing import Any, Callable, Dict, List
+from sqlalchemy import insert
+from followthemoney import StatementEntity
+
+from nomenklatura.db import make_session
+from nomenklatura.judgement import Judgement
+from nomenklatura.resolver import Identifier, Resolver
+
+
+def build(
+    resolver: Resolver[StatementEntity], clusters: int, max_size: int
+) -> List[str]:
+    rng = random.Random(42)
+    ids: List[str] = []
+    rows: List[Dict[str, Any]] = []
+    canonicals: List[str] = []
+    for cluster in range(clusters):
+        canonical = Identifier.make(f"c{cluster}").id
+        canonicals.append(canonical)
+        for member in range(rng.randint(1, max_size)):
+            id = f"e{cluster}-{member}"
+            ids.append(id)
+            edge = {"target": canonical, "source": id}
+            rows.append({**edge, "judgement": Judgement.POSITIVE.value})
+    for canonical in canonicals[: clusters // 10]:
+        other = rng.choice(canonicals)
+        if other == canonical:
+            continue
+        target, source = max(canonical, other), min(canonical, other)
+        edge = {"target": target, "source": source}
+        rows.append({**edge, "judgement": Judgement.NEGATIVE.value})
+    for row in rows:
+        row.update(user="bench", created_at="2024-01-01T00:00:00")
+    resolver._session.connection.execute(insert(resolver._table), rows)
+    resolver.load_into_memory()
+    return ids
+
+
+def timed(label: str, count: int, func: Callable[[], None]) -> None:
+    start = time.time()
+    func()
+    took = time.time() - start
+    rate = count / took if took > 0 else float("inf")
+    print(f"{label:<32} {count} calls in {took:.2f}s ({rate:,.0f}/s)")
+
+
+@click.command()
+@click.option("--clusters", type=int, default=100_000)
+@click.option("--max-size", type=int, default=8)
+@click.option("--lookups", type=int, default=500_000)
+def main(clusters: int, max_size: int, lookups: int) -> None:
+    session = make_session("sqlite:///:memory:")
+    resolver = Resolver[StatementEntity](session, create=True)
+    start = time.time()
+    ids = build(resolver, clusters, max_size)
+    print(f"Loaded {len(ids)} IDs in {clusters} clusters in {time.time() - start:.2f}s")
+
+    rng = random.Random(23)
+    sample = [rng.choice(ids) for _ in range(lookups)]
+    # Also look up IDs which aren't in the resolver at all:
+    sample.extend(f"x{i}" for i in range(lookups // 10))
+    pairs = list(zip(sample, reversed(sample)))
+
+    def connected_max() -> None:
+        # The approach used before `get_canonical` read the sorted cluster:
+        for id in sample:
+            max(resolver.connected(Identifier.get(id)))
+
+    def get_canonical() -> None:
+        for id in sample:
+            resolver.get_canonical(id)
+
+    def get_referents() -> None:
+        for id in sample:
+            resolver.get_referents(id)
+
+    def check_candidate() -> None:
+        for left, right in pairs:
+            resolver.check_candidate(left, right)
+
+    timed("max(connected(Identifier))", len(sample), connected_max)
+    timed("get_canonical", len(sample), get_canonical)
+    timed("get_referents", len(sample), get_referents)
+    timed("check_candidate", len(pairs), check_candidate)
+    session.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
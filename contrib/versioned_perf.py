@@ -0,0 +1,85 @@
+"""
+Benchmark the read path of the versioned Redis store against an in-memory
+fakeredis instance, with a simulated network round-trip latency.
+
+    python contrib/versioned_perf.py tests/fixtures/donations.ijson --copies 20
+
+Each scan is run once with one round trip per entity (batch size 1) and once
+with pipelined, chunked reads (the default batch size of the view).
+"""
+
+import sys
+import time
+import click
+import orjson
+from pathlib import Path
+from typing import Any, Optional
+from fakeredis import FakeStrictRedis
+from followthemoney import Dataset, StatementEntity
+
+from nomenklatura.resolver import Linker
+from nomenklatura.store.versioned import VersionedRedisStore, VersionedRedisView
+
+
+class LatencyRedis(FakeStrictRedis):
+    """Add a fixed delay to every round trip to the (fake) server."""
+
+    latency = 0.0
+
+    def execute_command(self, *args: Any, **options: Any) -> Any:
+        time.sleep(self.latency)
+        return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[Any] = None):  # type: ignore
+        pipeline = super().pipeline(transaction=transaction, shard_hint=shard_hint)
+        execute = pipeline.execute
+
+        def delayed_execute(raise_on_error: bool = True) -> Any:
+            time.sleep(self.latency)
+            return execute(raise_on_error=raise_on_error)
+
+        pipeline.execute = delayed_execute  # type: ignore
+        return pipeline
+
+
+def load(store: VersionedRedisStore[Dataset, StatementEntity], path: Path, copies: int):
+    with store.writer() as writer:
+        for copy in range(copies):
+            with open(path, "rb") as fh:
+                while line := fh.readline():
+                    data = orjson.loads(line)
+                    data["id"] = f"{data['id']}-{copy}"
+                    proxy = StatementEntity.from_data(store.dataset, data)
+                    writer.add_entity(proxy)
+        writer.release()
+
+
+def run(view: VersionedRedisView[Dataset, StatementEntity], batch: int) -> None:
+    view.BATCH_ENTITIES = batch
+    start = time.time()
+    entities = sum(1 for _ in view.entities())
+    took = time.time() - start
+    print(f"entities()   batch={batch:<5} {entities} entities in {took:.2f}s")
+    start = time.time()
+    statements = sum(1 for _ in view.statements())
+    took = time.time() - start
+    print(f"statements() batch={batch:<5} {statements} statements in {took:.2f}s")
+
+
+@click.command()
+@click.argument("path", type=click.Path(exists=True, path_type=Path))
+@click.option("--copies", type=int, default=10)
+@click.option("--latency", type=float, default=0.2, help="Round trip in ms")
+def main(path: Path, copies: int, latency: float) -> None:
+    dataset = Dataset.make({"name": "bench", "title": "Benchmark"})
+    db = LatencyRedis(decode_responses=False)
+    store = VersionedRedisStore(dataset, Linker({}), db=db)
+    load(store, path, copies)
+    db.latency = latency / 1000.0
+    view = store.view(dataset)
+    run(view, 1)
+    run(view, VersionedRedisView.BATCH_ENTITIES)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
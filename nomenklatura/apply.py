@@ -0,0 +1,291 @@
+import io
+import csv
+import logging
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import chain
+from typing import Any, BinaryIO, Callable, Deque, Dict, Generator, Iterable
+from typing import List, Optional, TextIO, cast
+
+import orjson
+from followthemoney import ValueEntity, Statement, registry
+from followthemoney.cli.util import write_entity
+from followthemoney.statement import CSV, PACK, write_statements
+from followthemoney.statement.serialize import read_csv_statements
+from followthemoney.statement.serialize import read_pack_statements_decoded
+from followthemoney.statement.util import get_prop_type, unpack_prop
+from rigour.boolean import text_bool
+
+from nomenklatura.resolver import Linker
+
+log = logging.getLogger(__name__)
+
+# Size of the chunks of input handed to the workers, in bytes:
+CHUNK_SIZE = 8 * 1024 * 1024
+ENTITY = registry.entity.name
+# The columns read or rewritten by the chunk workers. Other columns are passed
+# through, and files without one of these are converted by way of `Statement`
+# objects instead:
+CSV_REQUIRED = [
+    "canonical_id",
+    "entity_id",
+    "prop",
+    "prop_type",
+    "value",
+    "dataset",
+    "original_value",
+    "external",
+    "id",
+]
+PACK_REQUIRED = [
+    "entity_id",
+    "prop",
+    "value",
+    "dataset",
+    "original_value",
+    "external",
+    "id",
+]
+
+# The linker used in worker processes, set once by `_init_worker`:
+_linker: Optional[Linker[Any]] = None
+
+
+def _init_worker(linker: Linker[Any]) -> None:
+    global _linker
+    _linker = linker
+
+
+def _get_linker() -> Linker[Any]:
+    if _linker is None:
+        raise RuntimeError("Linker is not initialised in this process")
+    return _linker
+
+
+def read_chunks(
+    lines: Iterable[bytes], quoted: bool, size: int = CHUNK_SIZE
+) -> Generator[bytes, None, None]:
+    """Group lines into chunks of about `size` bytes. For CSV files (`quoted`),
+    quoted values may contain line breaks, so chunks are only cut after lines
+    which leave an even number of quote characters in the chunk."""
+    buffer: List[bytes] = []
+    length = 0
+    quotes = 0
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if quoted:
+            quotes += line.count(b'"')
+        if length >= size and quotes % 2 == 0:
+            yield b"".join(buffer)
+            buffer = []
+            length = 0
+    if len(buffer):
+        yield b"".join(buffer)
+
+
+def _canonical_value(
+    linker: Linker[Any], row: List[str], idx: Dict[str, int], prop: str
+) -> None:
+    # Rewrite an entity reference to its canonical ID. Like `Statement.clone()`
+    # in `Linker.apply_statement`, this keeps the original value and updates the
+    # statement ID, which is derived from the value.
+    value = row[idx["value"]]
+    canonical = linker.get_canonical(value)
+    if canonical == value:
+        return
+    row[idx["value"]] = canonical
+    if not row[idx["original_value"]]:
+        row[idx["original_value"]] = value
+    external = text_bool(row[idx["external"]]) or False
+    key = Statement.make_key(
+        row[idx["dataset"]], row[idx["entity_id"]], prop, canonical, external
+    )
+    row[idx["id"]] = key or ""
+
+
+def _apply_csv_chunk(chunk: bytes, columns: List[str]) -> bytes:
+    linker = _get_linker()
+    idx = {c: i for i, c in enumerate(columns)}
+    text = io.StringIO(chunk.decode("utf-8"), newline="")
+    out = io.StringIO(newline="")
+    writer = csv.writer(out, dialect=csv.unix_dialect)
+    for row in csv.reader(text, dialect=csv.unix_dialect):
+        row[idx["canonical_id"]] = linker.get_canonical(row[idx["entity_id"]])
+        if row[idx["prop_type"]] == ENTITY:
+            _canonical_value(linker, row, idx, row[idx["prop"]])
+        writer.writerow(row)
+    return out.getvalue().encode("utf-8")
+
+
+def _apply_pack_chunk(chunk: bytes, columns: List[str]) -> bytes:
+    linker = _get_linker()
+    idx = {c: i for i, c in enumerate(columns)}
+    text = io.StringIO(chunk.decode("utf-8"), newline="")
+    # Pack files don't store the canonical ID, but two statements may become
+    # identical once their values are canonicalised. Like the pack writer, keep
+    # only the last of them:
+    rows: Dict[str, List[str]] = {}
+    for row in csv.reader(text, dialect=csv.unix_dialect):
+        schema, _, prop = unpack_prop(row[idx["prop"]])
+        if get_prop_type(schema, prop) == ENTITY:
+            _canonical_value(linker, row, idx, prop)
+        rows[row[idx["id"]]] = row
+    out = io.StringIO(newline="")
+    writer = csv.writer(out, dialect=csv.unix_dialect, quoting=csv.QUOTE_MINIMAL)
+    writer.writerows(rows.values())
+    return out.getvalue().encode("utf-8")
+
+
+def _apply_json_chunk(chunk: bytes, columns: List[str]) -> bytes:
+    linker = _get_linker()
+    out = io.BytesIO()
+    for line in chunk.splitlines():
+        if not line.strip():
+            continue
+        data = orjson.loads(line)
+        data["canonical_id"] = linker.get_canonical(data["entity_id"])
+        if get_prop_type(data["schema"], data["prop"]) == ENTITY:
+            value = data["value"]
+            canonical = linker.get_canonical(value)
+            if canonical != value:
+                data["value"] = canonical
+                data["original_value"] = data.get("original_value") or value
+                data["id"] = Statement.make_key(
+                    data["dataset"],
+                    data["entity_id"],
+                    data["prop"],
+                    canonical,
+                    data.get("external", False),
+                )
+        out.write(orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE))
+    return out.getvalue()
+
+
+def _apply_entity_chunk(chunk: bytes, columns: List[str]) -> bytes:
+    linker = _get_linker()
+    out = io.BytesIO()
+    for line in chunk.splitlines():
+        if not line.strip():
+            continue
+        proxy = ValueEntity.from_dict(orjson.loads(line), cleaned=True)
+        write_entity(out, linker.apply_stream(proxy))
+    return out.getvalue()
+
+
+ChunkFunc = Callable[[bytes, List[str]], bytes]
+
+
+def _map_chunks(
+    linker: Linker[Any],
+    func: ChunkFunc,
+    chunks: Iterable[bytes],
+    columns: List[str],
+    workers: int,
+) -> Generator[bytes, None, None]:
+    if workers <= 1:
+        _init_worker(linker)
+        for chunk in chunks:
+            yield func(chunk, columns)
+        return
+    # Only a few chunks per worker are read ahead, so memory use is bounded
+    # regardless of the size of the input. Results are yielded in input order.
+    pending: Deque[Future[bytes]] = deque()
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(linker,)
+    ) as executor:
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk, columns))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while len(pending):
+            yield pending.popleft().result()
+
+
+def _read_header(fh: BinaryIO) -> Optional[bytes]:
+    line = fh.readline()
+    if not len(line):
+        return None
+    return line
+
+
+class _HeaderReader(io.RawIOBase):
+    """Read a header line which was already consumed, then the rest of `fh`."""
+
+    def __init__(self, header: bytes, fh: BinaryIO) -> None:
+        self.header = header
+        self.fh = fh
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        if len(self.header):
+            data = self.header[: len(buffer)]
+            self.header = self.header[len(data) :]
+        else:
+            data = self.fh.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def apply_statements(
+    linker: Linker[Any],
+    infh: BinaryIO,
+    outfh: BinaryIO,
+    format: str,
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+) -> None:
+    """Canonicalise a statement file: set the canonical ID of each statement and
+    replace entity references with their canonical IDs. The input is split into
+    chunks which are processed by a pool of `workers` processes that each hold a
+    copy of the linker. Rows are rewritten in place rather than being parsed into
+    `Statement` objects, so all other columns are passed through unchanged."""
+    if format not in (CSV, PACK):
+        chunks = read_chunks(infh, False, size=chunk_size)
+        for data in _map_chunks(linker, _apply_json_chunk, chunks, [], workers):
+            outfh.write(data)
+        outfh.flush()
+        return
+
+    header = _read_header(infh)
+    if header is None:
+        return
+    columns = next(csv.reader([header.decode("utf-8")], dialect=csv.unix_dialect))
+    required = CSV_REQUIRED if format == CSV else PACK_REQUIRED
+    if any(c not in columns for c in required):
+        # Legacy pack files have no header row, and files may leave out columns
+        # which are filled with defaults when they are read. These are converted
+        # by way of `Statement` objects:
+        if format == CSV:
+            reader = io.BufferedReader(_HeaderReader(header, infh))
+            stmts = read_csv_statements(cast(BinaryIO, reader))
+        else:
+            lines = (line.decode("utf-8") for line in chain([header], infh))
+            stmts = read_pack_statements_decoded(cast(TextIO, lines))
+        write_statements(outfh, format, (linker.apply_statement(s) for s in stmts))
+        return
+
+    func = _apply_csv_chunk if format == CSV else _apply_pack_chunk
+    outfh.write(header)
+    chunks = read_chunks(infh, True, size=chunk_size)
+    for data in _map_chunks(linker, func, chunks, columns, workers):
+        outfh.write(data)
+    outfh.flush()
+
+
+def apply_entities(
+    linker: Linker[Any],
+    infh: BinaryIO,
+    outfh: BinaryIO,
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+) -> None:
+    """Canonicalise the IDs and entity references of a stream of entities, see
+    `Linker.apply_stream`. Chunks of the input are processed by a pool of
+    `workers` processes."""
+    chunks = read_chunks(infh, False, size=chunk_size)
+    for data in _map_chunks(linker, _apply_entity_chunk, chunks, [], workers):
+        outfh.write(data)
+    outfh.flush()
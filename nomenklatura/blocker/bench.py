@@ -0,0 +1,174 @@
+import time
+import shutil
+import logging
+import resource
+import threading
+from pathlib import Path
+from tempfile import mkdtemp
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Set
+
+from followthemoney import StatementEntity
+from followthemoney.util import PathLike
+
+from nomenklatura.db import make_session
+from nomenklatura.judgement import Judgement
+from nomenklatura.resolver import Edge, Resolver
+from nomenklatura.store import load_entity_file_store
+from nomenklatura.blocker.index import Index
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CUTOFFS = (1_000, 10_000, 100_000)
+RANK_PERCENTILES = (0.25, 0.5, 0.75, 0.9)
+
+
+class MemorySampler(threading.Thread):
+    """Poll the memory used by the DuckDB buffer manager of an index in the
+    background, to find its peak while the index is built and queried."""
+
+    INTERVAL = 0.1
+
+    def __init__(self, index: Index) -> None:
+        super().__init__(daemon=True)
+        self.cursor = index.con.cursor()
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def sample(self) -> None:
+        q = "SELECT sum(memory_usage_bytes) FROM duckdb_memory()"
+        res = self.cursor.execute(q).fetchone()
+        if res is not None and res[0] is not None:
+            self.peak = max(self.peak, int(res[0]))
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.INTERVAL):
+            self.sample()
+
+    def stop(self) -> int:
+        self.stopped.set()
+        self.join()
+        self.sample()
+        self.cursor.close()
+        return self.peak
+
+
+def _percentile(values: List[int], pct: float) -> Optional[int]:
+    if not len(values):
+        return None
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def bench_blocker(
+    entities_path: Path,
+    resolver_path: PathLike,
+    cutoffs: Sequence[int] = DEFAULT_CUTOFFS,
+    options: Dict[str, Any] = {},
+) -> Dict[str, Any]:
+    """Measure how many of the positive judgements in a resolver dump are
+    found by the blocker in an entity file, at several `max_pairs` cut-offs.
+
+    The entities are indexed as they are, without applying the judgements,
+    so that every positive edge between two indexed entities is a pair the
+    blocker should rank highly. A single ranking of `max(cutoffs)` pairs is
+    generated, since a smaller limit only returns a prefix of it."""
+    cutoffs = sorted(set(cutoffs))
+    data_dir = Path(mkdtemp(prefix="nomenklatura-bench-"))
+    session = make_session(f"sqlite:///{(data_dir / 'resolver.db').as_posix()}")
+    empty = Resolver[StatementEntity](session, create=True)
+    truth = Resolver[StatementEntity](session, create=True, table_name="judgements")
+    truth.load(resolver_path)
+    truth.load_into_memory()
+    store = load_entity_file_store(entities_path, empty)
+    index = Index(store.default_view(), data_dir / "index", options=options)
+    sampler = MemorySampler(index)
+    sampler.start()
+    try:
+        started = time.time()
+        index.build()
+        build_time = time.time() - started
+
+        ids: Set[str] = {
+            id for (id,) in index.con.execute("SELECT id FROM ids").fetchall()
+        }
+        edges: Set[FrozenSet[str]] = set()
+        with open(resolver_path, "r") as fh:
+            for line in fh:
+                edge = Edge.from_line(line)
+                if edge.judgement != Judgement.POSITIVE:
+                    continue
+                if edge.source.id in ids and edge.target.id in ids:
+                    edges.add(frozenset((edge.source.id, edge.target.id)))
+        log.info("Benchmarking blocker on %d positive edges", len(edges))
+
+        started = time.time()
+        ranks: List[int] = []
+        judgements: List[Judgement] = []
+        pairs = index.pairs(max_pairs=max(cutoffs))
+        for rank, ((left, right), _) in enumerate(pairs, 1):
+            if frozenset((left.id, right.id)) in edges:
+                ranks.append(rank)
+            judgements.append(truth.get_judgement(left.id, right.id))
+        pairs_time = time.time() - started
+
+        results: List[Dict[str, Any]] = []
+        for cutoff in cutoffs:
+            found = sum(1 for rank in ranks if rank <= cutoff)
+            judged = judgements[:cutoff]
+            positive = judged.count(Judgement.POSITIVE)
+            results.append(
+                {
+                    "max_pairs": cutoff,
+                    "pairs": len(judged),
+                    "found_edges": found,
+                    "recall": found / max(1, len(edges)),
+                    "positive_pairs": positive,
+                    "negative_pairs": judged.count(Judgement.NEGATIVE),
+                    "unjudged_pairs": judged.count(Judgement.NO_JUDGEMENT),
+                    "precision": positive / max(1, len(judged)),
+                }
+            )
+
+        q = """
+            SELECT count(*), ifnull(sum(CASE WHEN stopword THEN 1 ELSE 0 END), 0),
+                ifnull(sum(CASE WHEN NOT stopword THEN compatible_pair_cost END), 0)
+            FROM token_stats
+        """
+        res = index.con.execute(q).fetchone()
+        tokens, stopwords, candidate_pairs = res if res is not None else (0, 0, 0)
+        res = index.con.execute("SELECT count(*) FROM term_frequencies").fetchone()
+        term_rows = res[0] if res is not None else 0
+        peak = sampler.stop()
+        # Linux reports the peak resident set size in kilobytes:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return {
+            "entities_path": str(entities_path),
+            "resolver_path": str(resolver_path),
+            "options": dict(options),
+            "entities": len(ids),
+            "positive_edges": len(edges),
+            "cutoffs": results,
+            "ranks": {
+                "found": len(ranks),
+                "min": min(ranks, default=None),
+                **{f"p{int(p * 100)}": _percentile(ranks, p) for p in RANK_PERCENTILES},
+                "max": max(ranks, default=None),
+            },
+            "pair_cost": {
+                "term_rows": term_rows,
+                "tokens": tokens,
+                "stopwords": stopwords,
+                "candidate_token_pairs": int(candidate_pairs),
+            },
+            "time": {"build": build_time, "pairs": pairs_time},
+            "memory": {
+                "duckdb_peak_bytes": peak,
+                "max_rss_bytes": max_rss,
+            },
+        }
+    finally:
+        if sampler.is_alive():
+            sampler.stop()
+        index.close()
+        store.close()
+        session.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
@@ -29,6 +29,7 @@
 # making memory_limit smaller might help fit what the buffer manager manages,
 # plus all the additional DuckDB and non-DuckDB memory usage.
 import csv
+import math
 import duckdb
 import logging
 from pathlib import Path
@@ -36,16 +37,20 @@ from itertools import islice
 from time import perf_counter
 from rigour.reset import reset_caches
 from collections import defaultdict
-from typing import Any, Dict, Generator, Iterable, List, Tuple, TypeVar
+from typing import Any, Dict, Generator, Iterable, List, Optional, Set, Tuple
+from typing import TypeVar
 
-from followthemoney import DS, SE, StatementEntity, model, registry
+from followthemoney import DS, SE, Schema, StatementEntity, model, registry
+from followthemoney.exc import InvalidData
 from nomenklatura.settings import DUCKDB_MEMORY, DUCKDB_THREADS
-from nomenklatura.resolver import Identifier
+from nomenklatura.resolver import Identifier, Linker, Resolver
 from nomenklatura.store import View
 from nomenklatura.blocker.tokenizer import (
+    MINHASH_FIELD,
     NAME_PART_FIELD,
     SYMBOL_FIELD,
     WORD_FIELD,
+    MinHasher,
     tokenize_entity,
 )
 
@@ -82,10 +87,16 @@ class Index(object):
 
     Use this to generate dedupe pairs or match incoming entities when exhaustive
     comparison is impractical.
+
+    If a `linker` is given, entities are indexed under their canonical ID, so
+    that the records of a cluster which a store or a matching input yields
+    separately are indexed as one entity. This means pairs within a cluster
+    are never generated.
     """
 
     BOOSTS = {
         NAME_PART_FIELD: 5.0,
+        MINHASH_FIELD: 2.0,
         WORD_FIELD: 0.5,
         registry.name.name: 15.0,
         registry.phone.name: 10.0,
@@ -99,8 +110,10 @@ class Index(object):
         view: View[DS, SE],
         data_dir: Path,
         options: Dict[str, Any] = {},
+        linker: Optional[Linker[Any]] = None,
     ):
         self.view = view
+        self.linker = linker
         self.max_candidates = int(options.get("max_candidates", 75))
         self.min_score_ratio = float(
             options.get("min_score_ratio", DEFAULT_MIN_SCORE_RATIO)
@@ -109,6 +122,18 @@ class Index(object):
             options.get("max_bucket_size", DEFAULT_MAX_BUCKET_SIZE)
         )
         self.max_pair_cost = _bucket_pair_cost(self.max_bucket_size)
+        self.pair_partitions = int(options.get("pair_partitions", 1))
+        if self.pair_partitions < 1:
+            raise ValueError("pair_partitions must be >= 1")
+        # Fuzzy name blocking is off unless a number of MinHash bands is set:
+        self.minhash: Optional[MinHasher] = None
+        minhash_bands = int(options.get("minhash_bands", 0))
+        if minhash_bands > 0:
+            self.minhash = MinHasher(
+                minhash_bands,
+                rows=int(options.get("minhash_rows", 2)),
+                ngram=int(options.get("minhash_ngram", 3)),
+            )
         self.max_match_pair_cost = _bucket_pair_cost(self.max_bucket_size, cross=True)
         self.data_dir = data_dir.resolve()
         self.data_dir.mkdir(parents=True, exist_ok=True)
@@ -135,12 +160,15 @@ class Index(object):
         log.info(
             "Blocker index configured: max_bucket_size=%d, "
             "pair cost cap=%d, matching pair cost cap=%d, "
-            "max_candidates=%d, min_score_ratio=%.2f",
+            "max_candidates=%d, min_score_ratio=%.2f, pair_partitions=%d, "
+            "minhash=%s",
             self.max_bucket_size,
             self.max_pair_cost,
             self.max_match_pair_cost,
             self.max_candidates,
             self.min_score_ratio,
+            self.pair_partitions,
+            self.minhash,
         )
         self.duckdb_path = self.data_dir / "index.duckdb"
         self.con = duckdb.connect(self.duckdb_path, config=self.duckdb_config)
@@ -153,19 +181,27 @@ class Index(object):
         """)
         self.con.execute(f"DELETE FROM {table}")
 
+        merged = 0
+
         def generate() -> Generator[Tuple[str, str, str, str, int], None, None]:
+            nonlocal merged
             idx = 0
             tokens = 0
             for entity in entities:
                 if not entity.schema.matchable or entity.id is None:
                     continue
+                entity_id = entity.id
+                if self.linker is not None:
+                    entity_id = self.linker.get_canonical(entity.id)
+                    if entity_id != entity.id:
+                        merged += 1
                 counts: Dict[Tuple[str, str], int] = defaultdict(int)
-                for field, token in tokenize_entity(entity):
+                for field, token in tokenize_entity(entity, minhash=self.minhash):
                     token = token[:40]  # Limit token length
                     counts[(field, token)] += 1
 
                 for (field, token), count in counts.items():
-                    yield (entity.schema.name, entity.id, field, token, count)
+                    yield (entity.schema.name, entity_id, field, token, count)
                     tokens += 1
 
                 idx += 1
@@ -191,9 +227,47 @@ class Index(object):
             """)
 
         path.unlink(missing_ok=True)
+        if merged > 0:
+            self._collapse_clusters(table)
+            log.info("Collapsed %d records into their clusters in %r", merged, table)
         reset_caches()
         self.con.execute("CHECKPOINT")
 
+    def _collapse_clusters(self, table: str) -> None:
+        """Merge the tokens of the records of each cluster in a loaded table.
+        The records get the common schema of the cluster, and a token shared by
+        several records is kept once, with the highest count of any of them (so
+        that a name repeated by each source isn't counted as several names)."""
+        schemata_query = f"""
+            SELECT id, list(DISTINCT schema) FROM {table}
+            GROUP BY id HAVING count(DISTINCT schema) > 1
+        """
+        common: List[Tuple[str, str]] = []
+        for id, names in self.con.execute(schemata_query).fetchall():
+            schemata = [model.schemata[n] for n in sorted(names)]
+            schema = schemata[0]
+            try:
+                for other in schemata[1:]:
+                    schema = model.common_schema(schema, other)
+            except InvalidData as exc:
+                log.warning("Cannot merge schemata of cluster %r: %s", id, exc)
+            common.append((id, schema.name))
+        columns = {"id": "TEXT", "schema": "TEXT"}
+        if self._load_rows("cluster_schemata", columns, common) > 0:
+            update_query = f"""
+                UPDATE {table} SET schema = c.schema
+                FROM cluster_schemata AS c
+                WHERE {table}.id = c.id
+            """
+            self.con.execute(update_query)
+        collapse_query = f"""
+        CREATE OR REPLACE TABLE {table} AS
+            SELECT schema, id, field, token, max("count") AS "count"
+            FROM {table}
+            GROUP BY schema, id, field, token
+        """
+        self.con.execute(collapse_query)
+
     def entity_count(self, table: str) -> int:
         if not self._has_table(table):
             return 0
@@ -328,14 +402,17 @@ class Index(object):
 
         matching_token_stats_query = """
         CREATE OR REPLACE TABLE matching_token_stats AS
-            WITH indexed_token_schema_counts AS (
-                SELECT
-                    token,
-                    schema,
-                    count(*) AS df
+            WITH indexed_keyed_counts AS (
+                SELECT token, schema, count(*) AS df
                 FROM term_frequencies_all
                 GROUP BY token, schema
             ),
+            indexed_token_schema_counts AS (
+                SELECT t.token, sk.schema, c.df
+                FROM indexed_keyed_counts AS c
+                JOIN tokens AS t ON t.key = c.token
+                JOIN schema_keys AS sk ON sk.key = c.schema
+            ),
             compatible AS (
                 SELECT
                     m.token,
@@ -496,37 +573,93 @@ class Index(object):
             perf_counter() - started,
         )
 
+    def _build_dictionaries(self) -> None:
+        """Map entity IDs, tokens, fields and schemata to dense integer keys, so
+        that the pair and matching joins compare and hash integers instead of
+        strings. Entity IDs are numbered in sort order, so comparing and sorting
+        keys gives the same result as for the IDs themselves."""
+        log.info("Building ID and token dictionaries...")
+        ids_query = """
+        CREATE OR REPLACE TABLE ids AS
+            SELECT CAST(row_number() OVER (ORDER BY id) AS INTEGER) AS key, id
+            FROM (SELECT DISTINCT id FROM entries)
+        """
+        self.con.execute(ids_query)
+        tokens_query = """
+        CREATE OR REPLACE TABLE tokens AS
+            SELECT CAST(row_number() OVER (ORDER BY token) AS INTEGER) AS key, token
+            FROM (SELECT DISTINCT token FROM entries)
+        """
+        self.con.execute(tokens_query)
+        fields_query = """
+        CREATE OR REPLACE TABLE fields AS
+            SELECT CAST(row_number() OVER (ORDER BY field) AS INTEGER) AS key, field
+            FROM (SELECT field FROM entries UNION SELECT field FROM boosts)
+        """
+        self.con.execute(fields_query)
+        # Matching entities can have schemata which aren't in the index:
+        schema_keys_query = """
+        CREATE OR REPLACE TABLE schema_keys AS
+            SELECT CAST(row_number() OVER (ORDER BY schema) AS INTEGER) AS key, schema
+            FROM (
+                SELECT schema FROM entries
+                UNION SELECT "left" FROM schemata
+                UNION SELECT "right" FROM schemata
+            )
+        """
+        self.con.execute(schema_keys_query)
+        schema_pairs_query = """
+        CREATE OR REPLACE TABLE schema_pairs AS
+            SELECT l.key AS "left", r.key AS "right"
+            FROM schemata AS s
+            JOIN schema_keys AS l ON l.schema = s."left"
+            JOIN schema_keys AS r ON r.schema = s."right"
+        """
+        self.con.execute(schema_pairs_query)
+
     def _build_frequencies(self) -> None:
+        self.con.execute("DROP TABLE IF EXISTS posting_counts")
+        self.con.execute("DROP TABLE IF EXISTS postings")
+        self._build_dictionaries()
         log.info("Calculating term weights...")
         # IDF separates distinctive evidence from common-token noise without
         # letting aliases dilute full-name matches. Dampen alias-derived parts
         # and symbols because they multiply with the number of names.
         term_frequencies_query = f"""
         CREATE OR REPLACE TABLE term_frequencies_all AS
-            WITH entity_count AS (
-                SELECT count(DISTINCT id) AS n FROM entries
+            WITH keyed AS MATERIALIZED (
+                SELECT sk.key AS schema, f.key AS field, t.key AS token,
+                    i.key AS id, e.field AS field_name, e.count
+                FROM entries AS e
+                JOIN schema_keys AS sk ON sk.schema = e.schema
+                JOIN fields AS f ON f.field = e.field
+                JOIN tokens AS t ON t.token = e.token
+                JOIN ids AS i ON i.id = e.id
+            ),
+            entity_count AS (
+                SELECT count(*) AS n FROM ids
             ),
             token_idf AS (
-                SELECT e.token, 1.0 + ln(c.n / count(DISTINCT e.id)) AS idf
-                FROM entries AS e, entity_count AS c
-                GROUP BY e.token, c.n
+                SELECT k.token, 1.0 + ln(c.n / count(DISTINCT k.id)) AS idf
+                FROM keyed AS k, entity_count AS c
+                GROUP BY k.token, c.n
             ),
             name_counts AS (
                 SELECT id, greatest(1, sum(count)) AS n_names
-                FROM entries
-                WHERE field = '{registry.name.name}'
+                FROM keyed
+                WHERE field_name = '{registry.name.name}'
                 GROUP BY id
             )
-            SELECT e.schema, e.field, e.token, e.id,
-                CASE WHEN e.field IN ('{NAME_PART_FIELD}', '{SYMBOL_FIELD}')
+            SELECT k.schema, k.field, k.token, k.id,
+                CASE WHEN k.field_name IN ('{NAME_PART_FIELD}', '{SYMBOL_FIELD}')
                     THEN ifnull(boo.boost, 1) * i.idf
                         / sqrt(ifnull(nc.n_names, 1))
                     ELSE ifnull(boo.boost, 1) * i.idf
                 END AS weight
-            FROM entries AS e
-            JOIN token_idf AS i ON i.token = e.token
-            LEFT OUTER JOIN name_counts AS nc ON nc.id = e.id
-            LEFT OUTER JOIN boosts boo ON e.field = boo.field
+            FROM keyed AS k
+            JOIN token_idf AS i ON i.token = k.token
+            LEFT OUTER JOIN name_counts AS nc ON nc.id = k.id
+            LEFT OUTER JOIN boosts boo ON k.field_name = boo.field
         """
         self.con.execute(term_frequencies_query)
 
@@ -535,7 +668,18 @@ class Index(object):
             self._build_stopwords()
         if not self._has_table("entries_filtered"):
             self._apply_stopwords("entries", "entries_filtered")
-        self._apply_stopwords("term_frequencies_all", "term_frequencies")
+        stopword_keys_query = """
+        CREATE OR REPLACE TABLE stopword_keys AS
+            SELECT t.key AS token
+            FROM stopwords AS sw
+            JOIN tokens AS t ON t.token = sw.token
+        """
+        self.con.execute(stopword_keys_query)
+        self._apply_stopwords(
+            "term_frequencies_all",
+            "term_frequencies",
+            stopwords_table="stopword_keys",
+        )
 
     def _log_pair_query_stats(self, max_pairs: int) -> None:
         table_stats_query = """
@@ -585,28 +729,202 @@ class Index(object):
             max_pairs,
         )
 
+    def _load_rows(
+        self, table: str, columns: Dict[str, str], rows: Iterable[Tuple[Any, ...]]
+    ) -> int:
+        """Bulk load rows into a new table by way of a CSV file."""
+        path = self.data_dir / f"{table}.csv"
+        defs = ", ".join(f'"{c}" {t}' for c, t in columns.items())
+        self.con.execute(f"CREATE OR REPLACE TABLE {table} ({defs})")
+        count = 0
+        for batch in batched(rows, 500_000):
+            with open(path, "w", encoding="utf-8") as fh:
+                csv.writer(fh).writerows(batch)
+            self.con.execute(
+                f"""
+                INSERT INTO {table} SELECT * FROM read_csv(?,
+                    HEADER=FALSE,
+                    QUOTE='"',
+                    DELIM=',',
+                    ENCODING='utf-8',
+                    COLUMNS=?
+                )
+                """,
+                [path.as_posix(), columns],
+            )
+            count += len(batch)
+        path.unlink(missing_ok=True)
+        return count
+
+    def _load_resolver(self, resolver: Resolver[Any]) -> None:
+        """Load the pairs of clusters which have a blocking judgement. The index
+        is keyed by the canonical IDs of its linker, so the cluster keys of the
+        judgements are mapped to those before they're matched to the `ids`
+        table."""
+        if self.linker is None:
+            raise ValueError("Index must be built with a linker to use a resolver")
+        linker = self.linker
+        started = perf_counter()
+        blocked = self._load_rows(
+            "resolver_blocked",
+            {"left": "TEXT", "right": "TEXT"},
+            (
+                (linker.get_canonical(left), linker.get_canonical(right))
+                for left, right, _ in resolver.blocked_clusters()
+            ),
+        )
+        blocked_nodes_query = """
+        CREATE OR REPLACE TABLE blocked_nodes AS
+            SELECT DISTINCT
+                greatest(l.key, r.key) AS "left",
+                least(l.key, r.key) AS "right"
+            FROM resolver_blocked AS b
+            JOIN ids AS l ON l.id = b.left
+            JOIN ids AS r ON r.id = b.right
+        """
+        self.con.execute(blocked_nodes_query)
+        res = self.con.execute("SELECT count(*) FROM blocked_nodes").fetchone()
+        blocked_nodes = res[0] if res is not None else 0
+        log.info(
+            "Loaded resolver: %d blocked cluster pairs (%d in the index) in %.2fs",
+            blocked,
+            blocked_nodes,
+            perf_counter() - started,
+        )
+
+    def _field_scores_query(self, terms: str, partition: Optional[int] = None) -> str:
+        """Score the pairs of entities in `terms` which share a token, for each
+        field. If a `partition` is given, only the tokens in that hash partition
+        are joined."""
+        source = terms
+        if partition is not None:
+            where = f"hash(token) % {self.pair_partitions} = {partition}"
+            source = f"(SELECT * FROM {terms} WHERE {where})"
+        return f"""
+            SELECT "left".id AS lid, "right".id AS rid, "left".field AS field,
+                max("left".weight + "right".weight) AS maxw, count(*) AS n
+            FROM {source} as "left"
+            JOIN {source} as "right"
+                ON "left".token = "right".token AND "left".field = "right".field
+            INNER JOIN schema_pairs AS sp
+                ON sp.left = "left".schema AND sp.right = "right".schema
+            WHERE "left".id > "right".id
+            GROUP BY "left".id, "right".id, "left".field
+        """
+
+    def _build_pair_partitions(self, terms: str) -> str:
+        """Compute the per-field pair scores in partitions of the token space,
+        each stored in its own table, and return a query which merges them.
+
+        Each partition only joins the terms of its own tokens, so the memory
+        used by the self-join is bounded by the largest partition. Partitions
+        are recorded with a fingerprint of the terms they were computed from,
+        so a run which fails after some partitions were stored can reuse them
+        when it is started again on the same data."""
+        count = self.pair_partitions
+        fingerprint_query = f"""
+            SELECT count(*), ifnull(bit_xor(hash(schema, field, token, id, weight)), 0)
+            FROM {terms}
+        """
+        res = self.con.execute(fingerprint_query).fetchone()
+        rows, digest = res if res is not None else (0, 0)
+        fingerprint = f"{terms}:{count}:{rows}:{digest}"
+        self.con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pair_partitions
+                (partition INT, fingerprint TEXT, rows BIGINT)
+            """
+        )
+        stale_query = "SELECT partition FROM pair_partitions WHERE fingerprint != ?"
+        for (partition,) in self.con.execute(stale_query, [fingerprint]).fetchall():
+            self.con.execute(f"DROP TABLE IF EXISTS pair_partition_{partition}")
+        self.con.execute(
+            "DELETE FROM pair_partitions WHERE fingerprint != ?", [fingerprint]
+        )
+        done_query = "SELECT partition FROM pair_partitions"
+        done = {p for (p,) in self.con.execute(done_query).fetchall()}
+
+        started = perf_counter()
+        for partition in range(count):
+            table = f"pair_partition_{partition}"
+            if partition in done and self._has_table(table):
+                log.info("Reusing pair partition %d/%d", partition + 1, count)
+                continue
+            part_started = perf_counter()
+            field_scores = self._field_scores_query(terms, partition=partition)
+            self.con.execute(f"CREATE OR REPLACE TABLE {table} AS {field_scores}")
+            res = self.con.execute(f"SELECT count(*) FROM {table}").fetchone()
+            part_rows = res[0] if res is not None else 0
+            self.con.execute(
+                "INSERT INTO pair_partitions VALUES (?, ?, ?)",
+                [partition, fingerprint, part_rows],
+            )
+            self.con.execute("CHECKPOINT")
+            log.info(
+                "Pair partition %d/%d: %d field score rows in %.2fs (%.2fs total)",
+                partition + 1,
+                count,
+                part_rows,
+                perf_counter() - part_started,
+                perf_counter() - started,
+            )
+        # A pair can share tokens of the same field in several partitions:
+        partials = " UNION ALL ".join(
+            f"SELECT * FROM pair_partition_{p}" for p in range(count)
+        )
+        return f"""
+            SELECT lid, rid, field, max(maxw) AS maxw, sum(n) AS n
+            FROM ({partials})
+            GROUP BY lid, rid, field
+        """
+
     def pairs(
-        self, max_pairs: int = 10_000
+        self, max_pairs: int = 10_000, resolver: Optional[Resolver[Any]] = None
     ) -> Iterable[Tuple[Tuple[Identifier, Identifier], float]]:
+        """Generate the `max_pairs` highest-scoring candidate pairs.
+
+        If a `resolver` is given, pairs of clusters which already have a
+        judgement are excluded in the query, so they don't use up the
+        `max_pairs` budget. The index must then be built with the resolver (or
+        a linker of its current state) as its `linker`, so that the members of
+        each cluster are indexed as one entity.
+
+        With the `pair_partitions` option, the pair scores are computed in
+        that many partitions of the token space (see `_build_pair_partitions`)
+        before the best pairs are selected."""
         self._ensure_pair_stopwords()
         self._log_pair_query_stats(max_pairs)
+        terms = "term_frequencies"
+        exclude = ""
+        if resolver is not None:
+            self._load_resolver(resolver)
+            exclude = """
+                    LEFT OUTER JOIN blocked_nodes AS b
+                        ON b.left = f.lid AND b.right = f.rid
+                    WHERE b.left IS NULL
+            """
+        if self.pair_partitions > 1:
+            field_scores = self._build_pair_partitions(terms)
+        else:
+            field_scores = self._field_scores_query(terms)
         log.info("Generating pairs...")
         # Limit correlated evidence with logarithmic credit per field.
-        pairs_query = """
-            SELECT lid, rid, sum(maxw * (1.0 + ln(n))) AS score
-            FROM (
-                SELECT "left".id AS lid, "right".id AS rid, "left".field AS field,
-                    max("left".weight + "right".weight) AS maxw, count(*) AS n
-                FROM term_frequencies as "left"
-                JOIN term_frequencies as "right"
-                    ON "left".token = "right".token AND "left".field = "right".field
-                INNER JOIN schemata ON schemata.left = "left".schema AND schemata.right = "right".schema
-                WHERE "left".id > "right".id
-                GROUP BY "left".id, "right".id, "left".field
+        # All joins run on integer keys; the IDs are only looked up for the
+        # selected pairs.
+        pairs_query = f"""
+            WITH scores AS (
+                SELECT lid, rid, sum(maxw * (1.0 + ln(n))) AS score
+                FROM ({field_scores}) AS f
+                {exclude}
+                GROUP BY lid, rid
+                ORDER BY score DESC, lid, rid
+                LIMIT ?
             )
-            GROUP BY lid, rid
-            ORDER BY score DESC, lid, rid
-            LIMIT ?
+            SELECT l.id, r.id, s.score
+            FROM scores AS s
+            JOIN ids AS l ON l.key = s.lid
+            JOIN ids AS r ON r.key = s.rid
+            ORDER BY s.score DESC, s.lid, s.rid
         """
         started = perf_counter()
         results = self.con.execute(pairs_query, [max_pairs])
@@ -666,32 +984,54 @@ class Index(object):
         # Same per-field aggregation as pairs(), then per-subject top-K and a
         # relative score floor inside the query, so DuckDB never sorts or
         # ships candidate rows that would be discarded here (issue #351).
+        # Subjects are keyed like the indexed entities (`_build_dictionaries`),
+        # and also carry the key of the same ID in the index, if any, so that
+        # an entity is never matched with itself. Tokens which aren't in the
+        # index can't match and are dropped by the join.
         matches_query = """
-        WITH field_scores AS (
-            SELECT m.id AS matching_id, tf.id AS matches_id, tf.field AS field,
+        WITH subjects AS MATERIALIZED (
+            SELECT CAST(row_number() OVER (ORDER BY d.id) AS INTEGER) AS key,
+                d.id, ifnull(i.key, 0) AS id_key
+            FROM (SELECT DISTINCT id FROM matching_filtered) AS d
+            LEFT OUTER JOIN ids AS i ON i.id = d.id
+        ),
+        subject_terms AS (
+            SELECT s.key AS subject, s.id_key, sk.key AS schema,
+                f.key AS field, t.key AS token
+            FROM matching_filtered AS m
+            JOIN subjects AS s ON s.id = m.id
+            JOIN schema_keys AS sk ON sk.schema = m.schema
+            JOIN fields AS f ON f.field = m.field
+            JOIN tokens AS t ON t.token = m.token
+        ),
+        field_scores AS (
+            SELECT m.subject AS subject, tf.id AS match, tf.field AS field,
                 max(tf.weight) AS maxw, count(*) AS n
-            FROM matching_filtered m
+            FROM subject_terms m
             JOIN term_frequencies_all tf
-            ON m.token = tf.token AND m.field = tf.field AND tf.id != m.id
-            INNER JOIN schemata s
+            ON m.token = tf.token AND m.field = tf.field AND tf.id != m.id_key
+            INNER JOIN schema_pairs s
             ON s.left = m.schema AND s.right = tf.schema
-            GROUP BY m.id, tf.id, tf.field
+            GROUP BY m.subject, tf.id, tf.field
         ),
         pair_scores AS (
-            SELECT matching_id, matches_id, sum(maxw * (1.0 + ln(n))) AS score
+            SELECT subject, match, sum(maxw * (1.0 + ln(n))) AS score
             FROM field_scores
-            GROUP BY matching_id, matches_id
-        )
-        SELECT matching_id, matches_id, score
-        FROM (
-            SELECT matching_id, matches_id, score,
+            GROUP BY subject, match
+        ),
+        ranked AS (
+            SELECT subject, match, score,
                 row_number() OVER w AS rn,
                 first_value(score) OVER w AS best
             FROM pair_scores
-            WINDOW w AS (PARTITION BY matching_id ORDER BY score DESC, matches_id)
+            WINDOW w AS (PARTITION BY subject ORDER BY score DESC, match)
         )
-        WHERE rn <= ? AND score >= best * ?
-        ORDER BY matching_id, rn
+        SELECT s.id, i.id, r.score
+        FROM ranked AS r
+        JOIN subjects AS s ON s.key = r.subject
+        JOIN ids AS i ON i.key = r.match
+        WHERE r.rn <= ? AND r.score >= r.best * ?
+        ORDER BY r.subject, r.rn
         """
         started = perf_counter()
         results = self.con.execute(
@@ -722,6 +1062,98 @@ class Index(object):
             perf_counter() - started,
         )
 
+    def _ensure_postings(self) -> None:
+        if self._has_table("posting_counts"):
+            return
+        log.info("Building token postings for queries...")
+        started = perf_counter()
+        # Both tables are sorted by token, so that the min/max statistics of
+        # their row groups let a lookup of a few tokens skip almost all rows.
+        postings_query = """
+        CREATE OR REPLACE TABLE postings AS
+            SELECT t.token, f.field, sk.schema, i.id, tf.weight
+            FROM term_frequencies_all AS tf
+            JOIN tokens AS t ON t.key = tf.token
+            JOIN fields AS f ON f.key = tf.field
+            JOIN schema_keys AS sk ON sk.key = tf.schema
+            JOIN ids AS i ON i.key = tf.id
+            ORDER BY t.token
+        """
+        posting_counts_query = """
+        CREATE OR REPLACE TABLE posting_counts AS
+            SELECT token, schema, count(*) AS df
+            FROM postings
+            GROUP BY token, schema
+            ORDER BY token
+        """
+        self.con.execute("SET preserve_insertion_order = true")
+        try:
+            self.con.execute(postings_query)
+            self.con.execute(posting_counts_query)
+        finally:
+            self.con.execute("SET preserve_insertion_order = false")
+        self.con.execute("CHECKPOINT")
+        log.info("Token postings built in %.2fs", perf_counter() - started)
+
+    def query(self, entity: StatementEntity, limit: int = 10) -> BlockingMatches:
+        """Find the best candidates for a single entity in the index.
+
+        This scores candidates like `match_entities`, but is meant for one
+        entity at a time, e.g. in a screening service: the entity is tokenized
+        in Python and its tokens are looked up in a table of postings which is
+        built once per index, so no tables are created for each query. Like
+        the matching stopwords, tokens with more compatible postings than the
+        matching pair cost cap are skipped."""
+        self._ensure_postings()
+        terms: Set[Tuple[str, str]] = set()
+        for field, token in tokenize_entity(entity, minhash=self.minhash):
+            terms.add((field, token[:40]))
+        if not len(terms):
+            return []
+        cursor = self.con.cursor()
+        try:
+            q = "SELECT token, schema, df FROM posting_counts WHERE token IN ?"
+            cursor.execute(q, [list({token for _, token in terms})])
+            costs: Dict[str, int] = defaultdict(int)
+            for token, schema, df in cursor.fetchall():
+                if self._can_match(entity.schema, schema):
+                    costs[token] += df
+            tokens = [t for t, c in costs.items() if c <= self.max_match_pair_cost]
+            if not len(tokens):
+                return []
+            q = "SELECT token, field, schema, id, weight FROM postings WHERE token IN ?"
+            cursor.execute(q, [tokens])
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        # Postings are keyed by canonical ID if the index has a linker, so the
+        # entity's own cluster is excluded by its canonical ID:
+        entity_id = entity.id
+        if self.linker is not None and entity_id is not None:
+            entity_id = self.linker.get_canonical(entity_id)
+        fields: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        for token, field, schema, id, weight in rows:
+            if (field, token) not in terms or id == entity_id:
+                continue
+            if not self._can_match(entity.schema, schema):
+                continue
+            maxw, n = fields.get((id, field), (0.0, 0))
+            fields[(id, field)] = (max(maxw, weight), n + 1)
+        scores: Dict[str, float] = defaultdict(float)
+        for (id, _), (maxw, n) in fields.items():
+            scores[id] += maxw * (1.0 + math.log(n))
+        ranked = sorted(scores.items(), key=lambda s: (-s[1], s[0]))[:limit]
+        if not len(ranked):
+            return []
+        floor = ranked[0][1] * self.min_score_ratio
+        return [(Identifier.get(id), score) for id, score in ranked if score >= floor]
+
+    @staticmethod
+    def _can_match(schema: Schema, other: str) -> bool:
+        # Same relation as the `schemata` table:
+        return model.get(other) in schema.matchable_schemata
+
     def _log_matching_query_stats(self, num_matching: int) -> None:
         matching_stats_query = """
             SELECT
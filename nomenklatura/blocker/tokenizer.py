@@ -1,16 +1,19 @@
+import random
+from zlib import crc32
 from normality import WS
 from rigour.ids import StrictFormat
 from rigour.addresses import normalize_address
 from rigour.names import Symbol, NamePartTag
 from rigour.names import tokenize_name
 from rigour.text import is_stopword
-from typing import Generator, Set, Tuple
+from typing import Generator, List, Optional, Set, Tuple
 from followthemoney import registry, StatementEntity
 from followthemoney.names import entity_names
 
 WORD_FIELD = "wd"
 NAME_PART_FIELD = "np"
 SYMBOL_FIELD = "sy"
+MINHASH_FIELD = "mh"
 SKIP = (
     # done via entity_names:
     registry.name,
@@ -58,7 +61,65 @@ TEXT_TYPES = (
 )
 
 
-def tokenize_entity(entity: StatementEntity) -> Generator[Tuple[str, str], None, None]:
+# Mersenne prime for the universal hash family used by `MinHasher`:
+MINHASH_PRIME = (1 << 61) - 1
+
+
+class MinHasher(object):
+    """Compute MinHash band signatures over the character n-grams of a name.
+
+    Names which differ by a typo or a transliteration variant in each of their
+    parts don't share any name part token, but they share most of their
+    n-grams. Each of the `bands` signatures combines the minimum hashes of
+    `rows` hash functions, so two names share a band token with a probability
+    of about `s ** rows`, where `s` is the Jaccard similarity of their n-grams.
+    More bands find more fuzzy pairs, more rows make each band stricter.
+    """
+
+    def __init__(self, bands: int, rows: int = 2, ngram: int = 3) -> None:
+        if bands < 1 or rows < 1 or ngram < 1:
+            raise ValueError("MinHash bands, rows and ngram must be >= 1")
+        self.bands = bands
+        self.rows = rows
+        self.ngram = ngram
+        # Fixed seed, so that signatures are stable across processes and runs:
+        rng = random.Random(4223)
+        self.params = [
+            (rng.randrange(1, MINHASH_PRIME), rng.randrange(0, MINHASH_PRIME))
+            for _ in range(bands * rows)
+        ]
+
+    def ngrams(self, text: str) -> Set[int]:
+        padded = f" {text} "
+        if len(padded) <= self.ngram:
+            return {crc32(padded.encode("utf-8"))}
+        grams = (
+            padded[i : i + self.ngram] for i in range(len(padded) - self.ngram + 1)
+        )
+        return {crc32(g.encode("utf-8")) for g in grams}
+
+    def signatures(self, text: str) -> List[str]:
+        """Return one token for each band of the MinHash signature of `text`."""
+        grams = self.ngrams(text)
+        mins = [min((a * g + b) % MINHASH_PRIME for g in grams) for a, b in self.params]
+        tokens: List[str] = []
+        for band in range(self.bands):
+            row = mins[band * self.rows : (band + 1) * self.rows]
+            digest = crc32(",".join(str(m) for m in row).encode("utf-8"))
+            tokens.append(f"{MINHASH_FIELD}:{band}:{digest:08x}")
+        return tokens
+
+    def __repr__(self) -> str:
+        return "<MinHasher(bands=%d, rows=%d, ngram=%d)>" % (
+            self.bands,
+            self.rows,
+            self.ngram,
+        )
+
+
+def tokenize_entity(
+    entity: StatementEntity, minhash: Optional[MinHasher] = None
+) -> Generator[Tuple[str, str], None, None]:
     unique: Set[Tuple[str, str]] = set()
 
     # Parsed name parts
@@ -84,6 +145,18 @@ def tokenize_entity(entity: StatementEntity) -> Generator[Tuple[str, str], None,
                 continue
             unique.add((NAME_PART_FIELD, f"{NAME_PART_FIELD}:{part.comparable}"))
 
+        if minhash is not None:
+            # Sorted, so that the order of the name parts doesn't matter:
+            parts = sorted(
+                part.comparable
+                for part in name.parts
+                if part.tag not in (NamePartTag.STOP, NamePartTag.LEGAL)
+            )
+            text = " ".join(parts)
+            if len(text) > 3 and len(text) < 200:
+                for token in minhash.signatures(text):
+                    unique.add((MINHASH_FIELD, token))
+
         if name.comparable:
             name_fp = "".join(sorted({part.comparable for part in name.parts}))
             if len(name_fp) > 3 and len(name_fp) < 200:
@@ -1,20 +1,23 @@
+import json
 import shutil
 import yaml
 import click
 import logging
 from pathlib import Path
-from typing import Generator, Optional, Tuple
+from typing import TYPE_CHECKING, BinaryIO, Optional, Tuple, cast
 from followthemoney import Dataset, ValueEntity, StatementEntity as Entity
-from followthemoney.statement import Statement, CSV, FORMATS
-from followthemoney.statement import write_statements, read_path_statements
+from followthemoney.statement import CSV, FORMATS
 from followthemoney.cli.util import path_writer, InPath, OutPath
 from followthemoney.cli.util import path_entities, write_entity
 from followthemoney.cli.aggregate import sorted_aggregate
 
+from nomenklatura import settings
+from nomenklatura.apply import apply_entities, apply_statements
+from nomenklatura.blocker.bench import DEFAULT_CUTOFFS, bench_blocker
 from nomenklatura.cache import Cache
 from nomenklatura.db import make_session, Session
 from nomenklatura.matching import train_v1_matcher, train_erun_matcher
-from nomenklatura.store import load_entity_file_store
+from nomenklatura.store import Store, load_entity_file_store
 from nomenklatura.resolver import Resolver, Linker
 from nomenklatura.enrich import Enricher, make_enricher, match, enrich
 from nomenklatura.matching import get_algorithm, DedupeAlgorithm
@@ -25,11 +28,19 @@ from nomenklatura.wikidata.client import WikidataClient
 from nomenklatura.wikidata.reconcile import reconcile as run_reconcile
 from nomenklatura.wikidata.write import QSCommand, serialize
 
+if TYPE_CHECKING:
+    from nomenklatura.wikidata.dump import WikidataDump
+
 INDEX_SEGMENT = "xref-index"
 
 log = logging.getLogger(__name__)
 
 ResPath = click.Path(dir_okay=False, writable=True, path_type=Path)
+spill_option = click.option(
+    "--spill/--no-spill",
+    default=None,
+    help="Load entities into a temporary on-disk store (default: by file size)",
+)
 
 
 def _load_enricher(
@@ -83,6 +94,7 @@ def cli() -> None:
     default=False,
     help="Clear the index directory, if it exists.",
 )
+@spill_option
 def xref_file(
     path: Path,
     data_path: Optional[Path] = None,
@@ -93,33 +105,37 @@ def xref_file(
     clear: bool = False,
     focus: tuple[str, ...] = (),
     discount_internal: float = 1.0,
+    spill: Optional[bool] = None,
 ) -> None:
     with make_session() as session:
         resolver = Resolver[Entity](session, create=True)
         resolver.load_into_memory()
         data_path = _get_data_path(data_path)
 
-        store = load_entity_file_store(path, resolver=resolver)
-        algorithm_type = get_algorithm(algorithm)
-        if algorithm_type is None:
-            raise click.Abort(f"Unknown algorithm: {algorithm}")
+        store = load_entity_file_store(path, resolver=resolver, spill=spill)
+        try:
+            algorithm_type = get_algorithm(algorithm)
+            if algorithm_type is None:
+                raise click.Abort(f"Unknown algorithm: {algorithm}")
 
-        index_dir = data_path / INDEX_SEGMENT
-        if clear and index_dir.exists():
-            log.info("Clearing index: %s", index_dir)
-            shutil.rmtree(index_dir, ignore_errors=True)
-        run_xref(
-            resolver,
-            session,
-            store,
-            index_dir,
-            auto_threshold=auto_threshold,
-            algorithm=algorithm_type,
-            scored=scored,
-            limit=limit,
-            focus_datasets=set(focus),
-            discount_internal=discount_internal,
-        )
+            index_dir = data_path / INDEX_SEGMENT
+            if clear and index_dir.exists():
+                log.info("Clearing index: %s", index_dir)
+                shutil.rmtree(index_dir, ignore_errors=True)
+            run_xref(
+                resolver,
+                session,
+                store,
+                index_dir,
+                auto_threshold=auto_threshold,
+                algorithm=algorithm_type,
+                scored=scored,
+                limit=limit,
+                focus_datasets=set(focus),
+                discount_internal=discount_internal,
+            )
+        finally:
+            store.close()
         log.info("Xref complete in: %r", resolver)
 
 
@@ -145,6 +161,13 @@ def xref_file(
     default=False,
     help="(headless only) propose new items for unmatched persons",
 )
+@spill_option
+@click.option(
+    "--dump",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    help="Read items from a store made with wikidata-import-dump",
+)
 def wikidata_reconcile(
     path: Path,
     threshold: float = 0.96,
@@ -154,21 +177,29 @@ def wikidata_reconcile(
     source_url: Optional[str] = None,
     review: bool = False,
     create: bool = False,
+    spill: Optional[bool] = None,
+    dump: Optional[Path] = None,
 ) -> None:
     if review and create:
         # Review mode creates items interactively.
         raise click.UsageError("--create cannot be combined with --review")
     session = make_session()
+    store: Optional[Store[Dataset, Entity]] = None
+    dump_store: Optional["WikidataDump"] = None
     try:
+        if dump is not None:
+            from nomenklatura.wikidata.dump import WikidataDump
+
+            dump_store = WikidataDump(dump)
         resolver = Resolver[Entity](session, create=True)
         resolver.load_into_memory()
-        store = load_entity_file_store(path, resolver=resolver)
+        store = load_entity_file_store(path, resolver=resolver, spill=spill)
         algorithm_type = get_algorithm(algorithm)
         if algorithm_type is None:
             raise click.Abort(f"Unknown algorithm: {algorithm}")
         dataset = Dataset.make({"name": "wikidata", "title": "Wikidata"})
         cache = Cache(session, dataset, create=True)
-        client = WikidataClient(cache)
+        client = WikidataClient(cache, dump=dump_store)
         if review:
             commands = reconcile_ui(
                 resolver,
@@ -198,6 +229,10 @@ def wikidata_reconcile(
     finally:
         # Keep completed requests and judgements after an interrupted run.
         session.commit()
+        if store is not None:
+            store.close()
+        if dump_store is not None:
+            dump_store.close()
     _write_qs(path.with_name(path.name + ".qs"), commands)
     log.info("Reconcile complete in: %r", resolver)
 
@@ -210,6 +245,32 @@ def _write_qs(path: Path, commands: list[QSCommand]) -> None:
     log.info("Wrote %d QuickStatements commands: %s", len(commands), path)
 
 
+@cli.command(
+    "wikidata-import-dump",
+    help="Import persons, positions, countries and classes from a Wikidata dump",
+)
+@click.argument("dump_path", type=InPath)
+@click.argument("store_path", type=click.Path(file_okay=False, path_type=Path))
+@click.option(
+    "-t",
+    "--type",
+    "types",
+    type=str,
+    multiple=True,
+    help="Import instances of this QID (default: humans, positions, countries)",
+)
+def wikidata_import_dump(
+    dump_path: Path, store_path: Path, types: Tuple[str, ...] = ()
+) -> None:
+    from nomenklatura.wikidata.dump import DUMP_TYPES, WikidataDump
+
+    dump = WikidataDump(store_path)
+    try:
+        dump.load(dump_path, types=types or DUMP_TYPES)
+    finally:
+        dump.close()
+
+
 @cli.command("prune", help="Remove dedupe candidates")
 def xref_prune() -> None:
     with make_session() as session:
@@ -221,12 +282,12 @@ def xref_prune() -> None:
 @cli.command("apply", help="Apply resolver to an entity stream")
 @click.argument("path", type=InPath)
 @click.option("-o", "--outpath", type=OutPath, default="-")
-def apply(path: Path, outpath: Path) -> None:
+@click.option("-w", "--workers", type=int, default=settings.LOAD_WORKERS)
+def apply(path: Path, outpath: Path, workers: int) -> None:
     linker = _get_linker()
-    with path_writer(outpath) as outfh:
-        for proxy in path_entities(path, ValueEntity):
-            proxy = linker.apply_stream(proxy)
-            write_entity(outfh, proxy)
+    with click.open_file(path, "rb") as infh:
+        with path_writer(outpath) as outfh:
+            apply_entities(linker, cast(BinaryIO, infh), outfh, workers=workers)
 
 
 @cli.command("sorted-aggregate", help="Merge sort-order entities")
@@ -249,18 +310,27 @@ def make_sortable(path: Path, outpath: Path) -> None:
 @click.argument("path", type=InPath)
 @click.option("-x", "--xref", is_flag=True, default=False)
 @click.option("-p", "--data-path", type=Path, default=None)
-def dedupe(path: Path, xref: bool = False, data_path: Optional[Path] = None) -> None:
+@spill_option
+def dedupe(
+    path: Path,
+    xref: bool = False,
+    data_path: Optional[Path] = None,
+    spill: Optional[bool] = None,
+) -> None:
     with make_session() as session:
         resolver = Resolver[Entity](session, create=True)
         resolver.load_into_memory()
         data_path = _get_data_path(data_path)
-        store = load_entity_file_store(path, resolver=resolver)
-        if xref:
-            index_dir = data_path / INDEX_SEGMENT
-            run_xref(resolver, session, store, index_dir)
-        session.checkpoint()
+        store = load_entity_file_store(path, resolver=resolver, spill=spill)
+        try:
+            if xref:
+                index_dir = data_path / INDEX_SEGMENT
+                run_xref(resolver, session, store, index_dir)
+            session.checkpoint()
 
-        dedupe_ui(resolver, session, store)
+            dedupe_ui(resolver, session, store)
+        finally:
+            store.close()
 
 
 @cli.command("train-v1-matcher", help="Train a matching model from judgement pairs")
@@ -323,15 +393,13 @@ def enrich_command(
 @click.option("-i", "--infile", type=InPath, default="-")
 @click.option("-o", "--outpath", type=OutPath, default="-")
 @click.option("-f", "--format", type=click.Choice(FORMATS), default=CSV)
-def statements_apply(infile: Path, outpath: Path, format: str) -> None:
+@click.option("-w", "--workers", type=int, default=settings.LOAD_WORKERS)
+def statements_apply(infile: Path, outpath: Path, format: str, workers: int) -> None:
     linker = _get_linker()
-
-    def _generate() -> Generator[Statement, None, None]:
-        for stmt in read_path_statements(infile, format=format):
-            yield linker.apply_statement(stmt)
-
-    with path_writer(outpath) as outfh:
-        write_statements(outfh, format, _generate())
+    with click.open_file(infile, "rb") as infh:
+        with path_writer(outpath) as outfh:
+            fh = cast(BinaryIO, infh)
+            apply_statements(linker, fh, outfh, format, workers=workers)
 
 
 @cli.command("load-resolver", help="Load resolver edges from file into database")
@@ -358,5 +426,40 @@ def bench(name: str, pairs_file: Path, number: int = 1000) -> None:
     bench_matcher(name, pairs_file, number)
 
 
+@cli.command("bench-blocker", help="Benchmark the blocker against resolver judgements")
+@click.argument("path", type=InPath)
+@click.argument("resolver_path", type=InPath)
+@click.option("-o", "--outpath", type=OutPath, default="-")
+@click.option(
+    "-m",
+    "--max-pairs",
+    type=int,
+    multiple=True,
+    default=DEFAULT_CUTOFFS,
+    help="Pair budget to report recall at (repeatable)",
+)
+@click.option(
+    "-b",
+    "--blocker-option",
+    "options",
+    type=(str, str),
+    multiple=True,
+    help="Blocker index option, e.g. -b max_bucket_size 100 (repeatable)",
+)
+def bench_blocker_(
+    path: Path,
+    resolver_path: Path,
+    outpath: Path,
+    max_pairs: Tuple[int, ...],
+    options: Tuple[Tuple[str, str], ...],
+) -> None:
+    result = bench_blocker(
+        path, resolver_path, cutoffs=max_pairs, options=dict(options)
+    )
+    with path_writer(outpath) as fh:
+        fh.write(json.dumps(result, indent=2).encode("utf-8"))
+        fh.write(b"\n")
+
+
 if __name__ == "__main__":
     cli()
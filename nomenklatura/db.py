@@ -1,5 +1,6 @@
 from contextlib import contextmanager
 from functools import cache
+from io import StringIO
 from typing import Any, Dict, Generator, Iterable, List, Mapping, Optional, cast
 import logging
 
@@ -13,6 +14,8 @@ from sqlalchemy import (
     Unicode,
     create_engine,
     delete,
+    select,
+    text,
 )
 from sqlalchemy.engine import Connection, CursorResult, Dialect, Engine
 from sqlalchemy.sql.expression import Executable
@@ -22,6 +25,7 @@ from sqlalchemy.dialects.sqlite import Insert as SQLiteInsert
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from nomenklatura import settings
+from nomenklatura.util import chunked
 
 Conn = Connection
 Connish = Optional[Connection]
@@ -29,6 +33,9 @@ KEY_LEN = 255
 VALUE_LEN = 65535
 # Max rows per INSERT for SQLite to stay under SQLITE_MAX_VARIABLE_NUMBER (32,766).
 SQLITE_MAX_VARS = 32766
+# Rows per COPY FROM STDIN buffer when bulk loading into PostgreSQL.
+COPY_BATCH = 100_000
+COPY_DRIVERS = ("psycopg2", "psycopg")
 
 log = logging.getLogger(__name__)
 
@@ -84,6 +91,11 @@ def is_sqlite(dialect: Dialect) -> bool:
     return dialect.name == "sqlite"
 
 
+def supports_copy(dialect: Dialect) -> bool:
+    """Return whether statements can be bulk loaded using PostgreSQL COPY."""
+    return is_postgres(dialect) and dialect.driver in COPY_DRIVERS
+
+
 def dialect_insert(dialect: Dialect, table: Table) -> PostgreSQLInsert | SQLiteInsert:
     """Build an insert that supports the given database's upsert API.
 
@@ -214,15 +226,138 @@ def make_statement_table(
     )
 
 
+def _copy_value(value: Any) -> str:
+    # Encode a value for the text format of COPY FROM STDIN.
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    encoded = str(value)
+    if "\\" in encoded:
+        encoded = encoded.replace("\\", "\\\\")
+    if "\t" in encoded or "\n" in encoded or "\r" in encoded:
+        encoded = encoded.replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return encoded
+
+
+def _copy_rows(conn: Connection, table: Table, rows: List[List[Any]]) -> None:
+    """Stream a batch of rows into a table using COPY FROM STDIN."""
+    buffer = StringIO()
+    for row in rows:
+        buffer.write("\t".join([_copy_value(v) for v in row]))
+        buffer.write("\n")
+    buffer.seek(0)
+    preparer = conn.dialect.identifier_preparer
+    columns = ", ".join(preparer.quote(c.name) for c in table.columns)
+    sql = f"COPY {preparer.format_table(table)} ({columns}) FROM STDIN"
+    cursor = conn.connection.driver_connection.cursor()  # type: ignore
+    try:
+        if conn.dialect.driver == "psycopg2":
+            cursor.copy_expert(sql, buffer)
+        else:
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+
+def copy_statements(
+    conn: Connection,
+    table: Table,
+    statements: Iterable[Statement],
+    update: bool = False,
+) -> int:
+    """Bulk load statements into a PostgreSQL statement table using COPY.
+
+    Rows are streamed into a temporary staging table, and then merged into the
+    target table with a single INSERT ... SELECT. Existing statements are kept
+    as they are, unless `update` is set."""
+    staging = Table(
+        f"{table.name}_staging",
+        MetaData(),
+        *[Column(c.name, c.type) for c in table.columns],
+    )
+    preparer = conn.dialect.identifier_preparer
+    conn.execute(
+        text(
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {preparer.format_table(staging)} "
+            f"(LIKE {preparer.format_table(table)} INCLUDING DEFAULTS) "
+            "ON COMMIT DROP"
+        )
+    )
+    columns = [c.name for c in table.columns]
+    count = 0
+    for batch in chunked(statements, COPY_BATCH):
+        rows: List[List[Any]] = []
+        for stmt in batch:
+            # See insert_statements() for why this does not use to_db_row():
+            row = cast(Dict[str, Any], stmt.to_dict())
+            row["prop_type"] = stmt.prop_type
+            rows.append([row[c] for c in columns])
+        _copy_rows(conn, staging, rows)
+        count += len(rows)
+
+    # DISTINCT ON: a row may only be affected once by each upsert.
+    query = select(staging).distinct(staging.c.id)
+    istmt = psql_insert(table).from_select(columns, query)
+    # Large merges would run into the statement timeout set in get_engine(), so
+    # it's lifted for the merge only and then restored for the transaction:
+    timeout = conn.execute(text("SELECT current_setting('statement_timeout')"))
+    prior_timeout = timeout.scalar_one()
+    conn.execute(text("SET LOCAL statement_timeout = 0"))
+    if update:
+        ustmt = istmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_=dict(
+                canonical_id=istmt.excluded.canonical_id,
+                schema=istmt.excluded.schema,
+                prop_type=istmt.excluded.prop_type,
+                lang=istmt.excluded.lang,
+                original_value=istmt.excluded.original_value,
+                last_seen=istmt.excluded.last_seen,
+            ),
+        )
+        conn.execute(ustmt)
+    else:
+        conn.execute(istmt.on_conflict_do_nothing(index_elements=["id"]))
+    restore = text("SELECT set_config('statement_timeout', :value, true)")
+    conn.execute(restore, {"value": prior_timeout})
+    conn.execute(text(f"TRUNCATE {preparer.format_table(staging)}"))
+    return count
+
+
 def insert_statements(
     engine: Engine,
     table: Table,
     dataset_name: str,
     statements: Iterable[Statement],
     batch_size: int = settings.STATEMENT_BATCH,
+    rebuild_indexes: bool = False,
 ) -> None:
+    """Replace the statements of a dataset in the given statement table.
+
+    On PostgreSQL, statements are bulk loaded using COPY (see `copy_statements`),
+    other databases use batched inserts. Set `rebuild_indexes` to drop the
+    secondary indexes of the table during a large load and re-create them
+    afterwards."""
     dataset_count: int = 0
     is_postgresql = is_postgres(engine.dialect)
+    if supports_copy(engine.dialect):
+        with engine.begin() as conn:
+            del_q = delete(table).where(table.c.dataset == dataset_name)
+            conn.execute(del_q)
+            if rebuild_indexes:
+                for index in table.indexes:
+                    index.drop(bind=conn, checkfirst=True)
+            log.info("Copying statements into %r..." % dataset_name)
+            dataset_count = copy_statements(conn, table, statements)
+            if rebuild_indexes:
+                log.info("Re-building indexes on %r..." % table.name)
+                for index in table.indexes:
+                    index.create(bind=conn, checkfirst=True)
+        log.info("Load complete: %r (%d total)" % (dataset_name, dataset_count))
+        return
+
     # Built once and re-used for every batch: rows are passed as executemany
     # parameters, so SQLAlchemy compiles the statement only on the first batch.
     # An inline `.values(batch)` clause instead makes each batch a distinct
@@ -261,13 +396,3 @@ def insert_statements(
         if len(batch):
             conn.execute(upsert, batch)
         log.info("Load complete: %r (%d total)" % (dataset_name, dataset_count))
-
-
-# TODO: consider offering a COPY-based loader:
-# raw_conn = await conn.get_raw_connection()
-# driver_conn: Connection = raw_conn.driver_connection
-# result = await driver_conn.copy_records_to_table(
-#     stmt_table.name,
-#     records=load_data_rows(),
-#     columns=COLUMNS,
-# )
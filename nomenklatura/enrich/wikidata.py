@@ -226,11 +226,11 @@ class WikidataEnricher(Enricher[DS]):
                 alias.apply(proxy, "weakAlias", clean=clean_wikidata_name)
 
         if proxy.schema.is_a("Person") and not item.is_instance("Q5"):
-            log.debug("Person is not a Q5 [%s]: %s", item.id, item.labels)
+            log.debug("Person is not a Q5 [%s]: %s", item.id, item.label)
             return None
 
         names_concat = " ".join(names)
-        for claim in item.claims:
+        for claim in item.filter_claims(PROPS_DIRECT):
             if claim.property is None:
                 continue
             ftm_prop = PROPS_DIRECT.get(claim.property)
@@ -40,6 +40,12 @@ class Identifier(object):
     def __repr__(self) -> str:
         return f"<I({self.id})>"
 
+    @classmethod
+    def is_canonical(cls, id: str) -> bool:
+        """Check if a plain string ID would make a canonical `Identifier`,
+        without constructing one."""
+        return id.startswith(cls.PREFIX) or is_qid(id)
+
     @classmethod
     def get(cls, id: StrIdent) -> "Identifier":
         if isinstance(id, str):
@@ -69,6 +69,13 @@ class Linker(Generic[SE]):
                     seen.add(canonical)
                     yield ident
 
+    def clusters(self) -> Generator[Tuple[str, str], None, None]:
+        """Return each identifier which has been merged into a cluster, together
+        with the first identifier of its cluster."""
+        for node, cluster in self._mapping.items():
+            if node != cluster[0]:
+                yield node, cluster[0]
+
     def get_referents(self, canonical_id: str, canonicals: bool = True) -> Set[str]:
         """Get all the non-canonical entity identifiers which refer to a given
         canonical identifier."""
@@ -63,6 +63,8 @@ class Resolver(Linker[SE]):
         # Suggestions remain in the table; hot reads use these derived indexes.
         self._linker: Linker[SE] = Linker({})
         self._blockers: Dict[Tuple[str, str], Judgement] = {}
+        # Blockers folded to the cluster level: cluster ID -> blocked cluster IDs.
+        self._blocked: Dict[str, Dict[str, Judgement]] = {}
 
         unique_kw: Dict[str, Any] = {"unique": True}
         if session.is_sqlite:
@@ -101,14 +103,59 @@ class Resolver(Linker[SE]):
     def _index_row(self, target: str, source: str, judgement: Judgement) -> None:
         """Fold a live database row into the in-memory indexes."""
         if judgement == Judgement.POSITIVE:
-            self._linker.add(source, target)
+            clusters = (
+                self._linker.get_canonical(source),
+                self._linker.get_canonical(target),
+            )
+            canonical = self._linker.add(source, target)
+            for cluster in clusters:
+                if cluster != canonical:
+                    self._merge_blocked(cluster, canonical)
         elif judgement in (Judgement.NEGATIVE, Judgement.UNSURE):
             self._blockers[(target, source)] = judgement
+            self._block(target, source, judgement)
+
+    def _block(self, left: str, right: str, judgement: Judgement) -> None:
+        """Record a blocker between the clusters of two IDs. If the clusters are
+        linked by more than one blocker, a negative judgement wins."""
+        left = self._linker.get_canonical(left)
+        right = self._linker.get_canonical(right)
+        if left == right:
+            return
+        blocked = self._blocked.setdefault(left, {})
+        if blocked.get(right) != Judgement.NEGATIVE:
+            blocked[right] = judgement
+            self._blocked.setdefault(right, {})[left] = judgement
+
+    def _merge_blocked(self, cluster: str, canonical: str) -> None:
+        """Move the blockers of a cluster which was merged into another."""
+        blocked = self._blocked.pop(cluster, None)
+        if blocked is None:
+            return
+        for other, judgement in blocked.items():
+            self._blocked.get(other, {}).pop(cluster, None)
+            self._block(canonical, other, judgement)
+
+    def _unblock(self, target: str, source: str) -> None:
+        """Re-derive the cluster-level blocker after a blocking edge was removed,
+        from the blocking edges which remain between the two clusters."""
+        left = self._linker.connected_ids(target)
+        right = self._linker.connected_ids(source)
+        self._blocked.get(left[0], {}).pop(right[0], None)
+        self._blocked.get(right[0], {}).pop(left[0], None)
+        for e in left:
+            for o in right:
+                judgement = self._blockers.get((e, o))
+                if judgement is None:
+                    judgement = self._blockers.get((o, e))
+                if judgement is not None:
+                    self._block(e, o, judgement)
 
     def _load_all(self) -> None:
         """Rebuild both indexes from scratch over every live edge."""
         self._linker = Linker({})
         self._blockers = {}
+        self._blocked = {}
         max_ts: Optional[str] = None
         stmt = select(
             self._table.c.target,
@@ -162,8 +209,8 @@ class Resolver(Linker[SE]):
                         max_ts = deleted_at
                     if judgement == Judgement.POSITIVE:
                         needs_rebuild = True
-                    else:
-                        self._blockers.pop((target, source), None)
+                    elif self._blockers.pop((target, source), None) is not None:
+                        self._unblock(target, source)
                 else:
                     self._index_row(target, source, judgement)
         cursor.close()
@@ -212,11 +259,14 @@ class Resolver(Linker[SE]):
 
     def get_canonical(self, entity_id: str) -> str:
         """Return the canonical identifier for the given entity ID."""
-        node = Identifier.get(entity_id)
-        max_ = max(self.connected(node))
-        if max_.canonical:
-            return max_.id
-        return node.id
+        entity_id = str(entity_id)
+        # Clusters are sorted when they're built, so the strongest identifier
+        # is always first. This avoids building `Identifier` objects on the
+        # hot path (it's called for every statement when assembling entities).
+        canonical = self._linker.connected_ids(entity_id)[0]
+        if canonical == entity_id or Identifier.is_canonical(canonical):
+            return canonical
+        return entity_id
 
     def canonicals(self) -> Generator[Identifier, None, None]:
         """Return all the canonical cluster identifiers."""
@@ -225,16 +275,29 @@ class Resolver(Linker[SE]):
     def get_referents(self, canonical_id: str, canonicals: bool = True) -> Set[str]:
         """Get all the non-canonical entity identifiers which refer to a given
         canonical identifier."""
-        node = Identifier.get(canonical_id)
+        canonical_id = str(canonical_id)
         referents: Set[str] = set()
-        for connected in self.connected(node):
-            if not canonicals and connected.canonical:
+        for connected in self._linker.connected_ids(canonical_id):
+            if connected == canonical_id:
                 continue
-            if connected == node:
+            if not canonicals and Identifier.is_canonical(connected):
                 continue
-            referents.add(connected.id)
+            referents.add(connected)
         return referents
 
+    def clusters(self) -> Generator[Tuple[str, str], None, None]:
+        """Return each entity ID which is part of a merged cluster, together with
+        the key of its cluster (the first ID of the cluster)."""
+        return self._linker.clusters()
+
+    def blocked_clusters(self) -> Generator[Tuple[str, str, Judgement], None, None]:
+        """Return each pair of cluster keys which is blocked by a negative or
+        unsure judgement once, with the greater key first."""
+        for left, blocked in self._blocked.items():
+            for right, judgement in blocked.items():
+                if left > right:
+                    yield left, right, judgement
+
     def get_resolved_edge(
         self, left_id: StrIdent, right_id: StrIdent
     ) -> Optional[Edge]:
@@ -269,16 +332,14 @@ class Resolver(Linker[SE]):
 
         # Any blocking (negative/unsure) edge spanning the two clusters decides
         # the pair. A positive edge can't span them — it would have merged the
-        # clusters above — so only blockers remain to check.
-        other_connected = self._linker.connected_ids(other)
-        for e in entity_connected:
-            for o in other_connected:
-                judgement = self._blockers.get((e, o))
-                if judgement is None:
-                    judgement = self._blockers.get((o, e))
-                if judgement is not None:
-                    return judgement
-
+        # clusters above — so only blockers remain to check. They're indexed by
+        # cluster, i.e. by the first ID of each cluster.
+        blocked = self._blocked.get(entity_connected[0])
+        if blocked is not None:
+            other_connected = self._linker.connected_ids(other)
+            judgement = blocked.get(other_connected[0])
+            if judgement is not None:
+                return judgement
         return Judgement.NO_JUDGEMENT
 
     def check_candidate(self, left: StrIdent, right: StrIdent) -> bool:
@@ -21,3 +21,7 @@ DUCKDB_THREADS = env_opt("NOMENKLATURA_DUCKDB_THREADS")
 
 LEVELDB_MAX_FILES = env_int("NOMENKLATURA_LEVELDB_MAX_FILES", 500)
 LEVELDB_BUFFER = env_int("NOMENKLATURA_LEVELDB_BUFFER", 20)
+
+LOAD_WORKERS = env_int("NOMENKLATURA_LOAD_WORKERS", 4)
+LOAD_CHUNK_SIZE = env_int("NOMENKLATURA_LOAD_CHUNK_SIZE", 64)
+LOAD_SPILL_SIZE = env_int("NOMENKLATURA_LOAD_SPILL_SIZE", 2048)
@@ -1,45 +1,171 @@
+import logging
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Any, Deque, Generator, List, Optional, Set, Tuple
 
 import orjson
 from normality import slugify
-from followthemoney import Dataset, StatementEntity
+from followthemoney import Dataset, Statement, StatementEntity
 from followthemoney.dataset import DataCatalog
+from nomenklatura import settings
 from nomenklatura.resolver import Resolver
 from nomenklatura.store.base import Store, View, Writer
+from nomenklatura.store.cache import CachedView, EntityCache
+from nomenklatura.store.duckdb_ import DuckDBStore
 from nomenklatura.store.memory import MemoryStore
 from nomenklatura.store.sql import SQLStore
 
 SimpleMemoryStore = MemoryStore[Dataset, StatementEntity]
+# The positional arguments of `Statement`, as sent back from loader processes:
+StatementRow = Tuple[Any, ...]
+
+log = logging.getLogger(__name__)
 
 __all__ = [
     "Store",
     "Writer",
     "View",
+    "CachedView",
+    "EntityCache",
     "MemoryStore",
     "SimpleMemoryStore",
     "SQLStore",
+    "DuckDBStore",
     "load_entity_file_store",
 ]
 
 
+def _chunk_offsets(path: Path, chunk_size: int) -> List[Tuple[int, int]]:
+    """Split a file into byte ranges of roughly `chunk_size`, aligned to line
+    boundaries."""
+    size = path.stat().st_size
+    offsets: List[Tuple[int, int]] = []
+    with open(path, "rb") as fh:
+        start = 0
+        while start < size:
+            fh.seek(min(start + chunk_size, size))
+            fh.readline()
+            end = min(fh.tell(), size)
+            offsets.append((start, end))
+            start = end
+    return offsets
+
+
+def _load_chunk(
+    path: Path, start: int, end: int, name: str, cleaned: bool
+) -> Tuple[List[StatementRow], Set[str]]:
+    # Runs in a worker process: parse a range of lines and return the
+    # statements as plain tuples, which are cheap to send back.
+    dataset = Dataset.make({"name": name, "title": name})
+    rows: List[StatementRow] = []
+    datasets: Set[str] = set()
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        data = fh.read(end - start)
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        proxy = StatementEntity.from_data(dataset, orjson.loads(line), cleaned=cleaned)
+        datasets.update(proxy.datasets)
+        for stmt in proxy.statements:
+            rows.append(
+                (
+                    stmt.entity_id,
+                    stmt.prop,
+                    stmt.schema,
+                    stmt.value,
+                    stmt.dataset,
+                    stmt.lang,
+                    stmt.original_value,
+                    stmt.first_seen,
+                    stmt.external,
+                    stmt.id,
+                    stmt.canonical_id,
+                    stmt.last_seen,
+                    stmt.origin,
+                )
+            )
+    return rows, datasets
+
+
+def _load_parallel(
+    path: Path, dataset: Dataset, cleaned: bool, workers: int, chunk_size: int
+) -> Generator[Tuple[List[Statement], Set[str]], None, None]:
+    offsets = _chunk_offsets(path, chunk_size)
+    log.info("Loading %s in %d chunks, %d workers...", path, len(offsets), workers)
+    # Only a few chunks per worker are read ahead, so the parsed statements
+    # held in this process are bounded by the chunk size, not the file size.
+    # Chunks are merged in file order, so the result doesn't depend on which
+    # worker finishes first.
+    pending: Deque[Future[Tuple[List[StatementRow], Set[str]]]] = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for start, end in offsets:
+            future = executor.submit(
+                _load_chunk, path, start, end, dataset.name, cleaned
+            )
+            pending.append(future)
+            if len(pending) >= workers * 2:
+                rows, datasets = pending.popleft().result()
+                yield [Statement(*row) for row in rows], datasets
+        while len(pending):
+            rows, datasets = pending.popleft().result()
+            yield [Statement(*row) for row in rows], datasets
+
+
 def load_entity_file_store(
     path: Path,
     resolver: Resolver[StatementEntity],
     cleaned: bool = True,
-) -> SimpleMemoryStore:
-    """Create a simple in-memory store by reading FtM entities from a file path."""
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    spill: Optional[bool] = None,
+) -> Store[Dataset, StatementEntity]:
+    """Create a store by reading FtM entities from a file path.
+
+    Files larger than `chunk_size` bytes (`NOMENKLATURA_LOAD_CHUNK_SIZE`, in MB)
+    are split on line boundaries and parsed by a pool of `workers` processes
+    (`NOMENKLATURA_LOAD_WORKERS`). With `cleaned`, property values are taken as
+    they are instead of being validated and normalised, which is much faster
+    for files exported by FtM tools.
+
+    The entities are held in memory, unless `spill` is set or the file is larger
+    than `NOMENKLATURA_LOAD_SPILL_SIZE` (in MB). In that case they are loaded into
+    a temporary `DuckDBStore`, which is deleted when the store is closed."""
     name = slugify(path.stem, sep="_") or Dataset.UNDEFINED
     dataset = Dataset.make({"name": name, "title": path.name})
-    store = MemoryStore(dataset, resolver)
+    if workers is None:
+        workers = settings.LOAD_WORKERS
+    if chunk_size is None:
+        chunk_size = settings.LOAD_CHUNK_SIZE * 1024 * 1024
+    size = path.stat().st_size
+    if spill is None:
+        spill = size > settings.LOAD_SPILL_SIZE * 1024 * 1024
+    store: Store[Dataset, StatementEntity]
+    if spill:
+        store = DuckDBStore(dataset, resolver)
+        log.info("Loading %s into temporary store: %s", path, store.path)
+    else:
+        store = MemoryStore(dataset, resolver)
+
+    def add_datasets(names: Set[str]) -> None:
+        for ds in names:
+            if ds not in dataset.dataset_names:
+                discovered = Dataset.make({"name": ds})
+                dataset.children.add(discovered)
+
     with store.writer() as writer:
-        with open(path, "rb") as fh:
-            while line := fh.readline():
-                data = orjson.loads(line)
-                proxy = StatementEntity.from_data(dataset, data, cleaned=cleaned)
-                for ds in proxy.datasets:
-                    if ds not in dataset.dataset_names:
-                        discovered = Dataset.make({"name": ds})
-                        dataset.children.add(discovered)
-                writer.add_entity(proxy)
+        if workers > 1 and size > chunk_size:
+            chunks = _load_parallel(path, dataset, cleaned, workers, chunk_size)
+            for statements, datasets in chunks:
+                add_datasets(datasets)
+                for stmt in statements:
+                    writer.add_statement(stmt)
+        else:
+            with open(path, "rb") as fh:
+                while line := fh.readline():
+                    data = orjson.loads(line)
+                    proxy = StatementEntity.from_data(dataset, data, cleaned=cleaned)
+                    add_datasets(proxy.datasets)
+                    writer.add_entity(proxy)
     return store
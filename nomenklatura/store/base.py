@@ -1,11 +1,16 @@
 from types import TracebackType
-from typing import Optional, Generator, List, Tuple, Generic, Type, cast
+from typing import TYPE_CHECKING, Optional, Generator, List, Set, Tuple, Generic, Type
+from typing import cast
+from weakref import WeakSet
 from followthemoney import Schema, registry, Property, DS, Statement
 from followthemoney import StatementEntity, SE
 from followthemoney.statement.util import get_prop_type
 
 from nomenklatura.resolver import Linker, StrIdent
 
+if TYPE_CHECKING:
+    from nomenklatura.store.cache import EntityCache
+
 
 class Store(Generic[DS, SE]):
     """A data storage and retrieval mechanism for statement-based entity data.
@@ -16,6 +21,7 @@ class Store(Generic[DS, SE]):
         self.dataset = dataset
         self.linker = linker
         self.entity_class = cast(Type[SE], StatementEntity)
+        self._caches: "WeakSet[EntityCache[SE]]" = WeakSet()
 
     def writer(self) -> "Writer[DS, SE]":
         raise NotImplementedError()
@@ -43,7 +49,16 @@ class Store(Generic[DS, SE]):
             entity.extra_referents.update(self.linker.get_referents(entity.id))
         return entity
 
+    def invalidate(self, entity_id: str) -> None:
+        """Drop an entity from the caches of all `CachedView`s on this store."""
+        for cache in self._caches:
+            cache.invalidate(entity_id)
+
     def update(self, id: str) -> None:
+        # A merge also changes the canonical values of entity references held
+        # by other cached entities, so flush the caches entirely.
+        for cache in self._caches:
+            cache.clear()
         canonical_id = self.linker.get_canonical(id)
         with self.writer() as writer:
             for referent in self.linker.get_referents(canonical_id):
@@ -63,6 +78,7 @@ class Writer(Generic[DS, SE]):
 
     def __init__(self, store: Store[DS, SE]):
         self.store = store
+        self._touched: Set[str] = set()
 
     def add_statement(self, stmt: Statement) -> None:
         raise NotImplementedError()
@@ -77,6 +93,19 @@ class Writer(Generic[DS, SE]):
     def flush(self) -> None:
         pass
 
+    def _touch(self, entity_id: str) -> None:
+        """Drop an entity which is being written from the caches of the store's
+        `CachedView`s. Writers which buffer statements also keep the ID until
+        `_flush_touched()`, so that a read before the flush is not cached."""
+        if len(self.store._caches):
+            self.store.invalidate(entity_id)
+            self._touched.add(entity_id)
+
+    def _flush_touched(self) -> None:
+        for entity_id in self._touched:
+            self.store.invalidate(entity_id)
+        self._touched.clear()
+
     def close(self) -> None:
         self.store.close()
 
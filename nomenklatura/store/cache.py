@@ -0,0 +1,158 @@
+from collections import OrderedDict
+from typing import Any, Dict, Generator, Generic, List, Optional, Tuple
+from followthemoney import DS, SE, Property, Schema
+
+from nomenklatura.store.base import View
+
+# Rough per-statement overhead of a Statement object and its attribute strings,
+# used to estimate the memory held by a cached entity.
+STATEMENT_BYTES = 400
+
+
+def entity_size(entity: SE) -> int:
+    """Estimate the number of bytes held in memory by an assembled entity."""
+    size = 0
+    for stmt in entity._iter_stmt():
+        size += STATEMENT_BYTES + len(stmt.value)
+        if stmt.original_value is not None:
+            size += len(stmt.original_value)
+    return size
+
+
+class EntityCache(Generic[SE]):
+    """A bounded LRU cache of assembled entities, keyed by canonical ID.
+
+    The cache can be limited by the number of entries, the approximate number
+    of bytes held by the cached entities, or both. Hit and miss counters are
+    kept so that the size can be tuned for a given workload."""
+
+    def __init__(
+        self, max_entries: Optional[int] = 10_000, max_bytes: Optional[int] = None
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, Tuple[SE, int]] = OrderedDict()
+
+    def get(self, id: str) -> Optional[SE]:
+        item = self._entries.get(id)
+        if item is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(id)
+        self.hits += 1
+        return item[0]
+
+    def put(self, id: str, entity: SE) -> None:
+        self.invalidate(id)
+        size = entity_size(entity) if self.max_bytes is not None else 0
+        self._entries[id] = (entity, size)
+        self.size += size
+        while len(self._entries) > 1 and self._is_full():
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= evicted
+            self.evictions += 1
+
+    def invalidate(self, id: str) -> None:
+        item = self._entries.pop(id, None)
+        if item is not None:
+            self.size -= item[1]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def _is_full(self) -> bool:
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            return True
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            return True
+        return False
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the cache counters, e.g. for logging after a run."""
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+    def __contains__(self, id: object) -> bool:
+        # Doesn't count as a hit or change the LRU order, unlike `get()`:
+        return id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return f"<EntityCache({len(self._entries)}, hit_rate={self.hit_rate:.2f})>"
+
+
+class CachedView(View[DS, SE]):
+    """A read-through cache wrapped around another view of the same store.
+
+    Graph walks (e.g. `get_adjacent()` during xref) assemble the same hub
+    entities over and over. This view keeps recently assembled entities in an
+    `EntityCache` so that repeated lookups skip the backend and the assembly.
+    The cache is keyed by canonical ID and invalidated when entities are
+    written, updated via `Store.update()` or removed using `Writer.pop()`.
+    Entities returned from the cache are shared between callers and must not
+    be modified."""
+
+    def __init__(
+        self,
+        view: View[DS, SE],
+        max_entries: Optional[int] = 10_000,
+        max_bytes: Optional[int] = None,
+    ) -> None:
+        super().__init__(view.store, view.scope, external=view.external)
+        self.view = view
+        self.cache: EntityCache[SE] = EntityCache(
+            max_entries=max_entries, max_bytes=max_bytes
+        )
+        self.store._caches.add(self.cache)
+
+    def has_entity(self, id: str) -> bool:
+        if self.store.linker.get_canonical(id) in self.cache:
+            return True
+        return self.view.has_entity(id)
+
+    def get_entity(self, id: str) -> Optional[SE]:
+        # Keyed by the canonical ID, so that the members of a cluster share an
+        # entry and `Store.invalidate()` can find it:
+        canonical_id = self.store.linker.get_canonical(id)
+        entity = self.cache.get(canonical_id)
+        if entity is not None:
+            return entity
+        entity = self.view.get_entity(id)
+        if entity is not None:
+            self.cache.put(canonical_id, entity)
+        return entity
+
+    def get_inverted(self, id: str) -> Generator[Tuple[Property, SE], None, None]:
+        yield from self.view.get_inverted(id)
+
+    def entities(
+        self, include_schemata: Optional[List[Schema]] = None
+    ) -> Generator[SE, None, None]:
+        # Full scans would only flush the cache, so they bypass it.
+        if include_schemata is None:
+            yield from self.view.entities()
+        else:
+            yield from self.view.entities(include_schemata=include_schemata)
+
+    def __repr__(self) -> str:
+        return f"<CachedView({self.view!r}, {self.cache!r})>"
@@ -0,0 +1,225 @@
+import csv
+import shutil
+import logging
+from pathlib import Path
+from tempfile import mkdtemp
+from typing import Any, Dict, Generator, List, Optional, Tuple
+
+import duckdb
+from followthemoney import DS, SE, Property, Schema, Statement, registry
+
+from nomenklatura.settings import DUCKDB_MEMORY, DUCKDB_THREADS
+from nomenklatura.resolver import Identifier, Linker
+from nomenklatura.store.base import Store, View, Writer
+from nomenklatura.store.util import ROW_COLUMNS, ROW_TYPES, placeholders
+from nomenklatura.store.util import pack_row, unpack_row
+
+log = logging.getLogger(__name__)
+
+Row = Tuple[Any, ...]
+
+
+class DuckDBStore(Store[DS, SE]):
+    """Persist statements to a local DuckDB database file.
+
+    DuckDB is already used by the blocking index, so this backend needs no
+    extra dependencies. Statements are bulk loaded in large batches and full
+    scans stream out of a columnar table, which suits single-process batch
+    jobs like cross-referencing and exports.
+
+    If no `path` is given, the database is created in a temporary directory
+    which is deleted when the store is closed."""
+
+    def __init__(self, dataset: DS, linker: Linker[SE], path: Optional[Path] = None):
+        super().__init__(dataset, linker)
+        self.temp_dir: Optional[Path] = None
+        if path is None:
+            self.temp_dir = Path(mkdtemp(prefix="nomenklatura-"))
+            path = self.temp_dir / "store.duckdb"
+        self.path = path.resolve()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        config: Dict[str, Any] = {"python_enable_replacements": False}
+        if DUCKDB_MEMORY is not None:
+            config["memory_limit"] = f"{DUCKDB_MEMORY}MB"
+        if DUCKDB_THREADS is not None:
+            config["threads"] = int(DUCKDB_THREADS)
+        self.con = duckdb.connect(self.path.as_posix(), config=config)
+        # The table has no primary key, so that bulk loads don't maintain an
+        # index of all statement IDs in memory. A statement which is added again
+        # is appended, and only the last copy of it is read (see `DuckDBView`).
+        columns = ", ".join(f'"{c}" {t}' for c, t in ROW_TYPES.items())
+        self.con.execute(f"CREATE TABLE IF NOT EXISTS statement ({columns})")
+        self._indexed = False
+
+    def _ensure_index(self) -> None:
+        # The index for canonical ID lookups is built on the first lookup rather
+        # than maintained while statements are bulk loaded. Later writes keep it
+        # up to date.
+        if not self._indexed:
+            self.con.execute(
+                "CREATE INDEX IF NOT EXISTS statement_canonical_id "
+                "ON statement (canonical_id)"
+            )
+            self._indexed = True
+
+    def writer(self) -> Writer[DS, SE]:
+        return DuckDBWriter(self)
+
+    def view(self, scope: DS, external: bool = False) -> View[DS, SE]:
+        return DuckDBView(self, scope, external=external)
+
+    def close(self) -> None:
+        self.con.close()
+        if self.temp_dir is not None:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+            self.temp_dir = None
+
+
+class DuckDBWriter(Writer[DS, SE]):
+    BATCH_STATEMENTS = 100_000
+
+    def __init__(self, store: DuckDBStore[DS, SE]):
+        super().__init__(store)
+        self.store: DuckDBStore[DS, SE] = store
+        self.batch: Dict[str, List[Optional[str]]] = {}
+        self.path = self.store.path.with_suffix(".load.csv")
+
+    def add_statement(self, stmt: Statement) -> None:
+        if stmt.entity_id is None or stmt.id is None:
+            return
+        stmt.canonical_id = self.store.linker.get_canonical(stmt.entity_id)
+        self._touch(stmt.canonical_id)
+        self.batch[stmt.id] = pack_row(stmt)
+        if len(self.batch) >= self.BATCH_STATEMENTS:
+            self.flush()
+
+    def flush(self) -> None:
+        if not len(self.batch):
+            return
+        # Load the batch from a CSV file so DuckDB can parse it column-wise,
+        # rather than binding each value from Python:
+        with open(self.path, "w", encoding="utf-8") as fh:
+            csv.writer(fh).writerows(self.batch.values())
+        self.store.con.execute(
+            f"""
+            INSERT INTO statement ({ROW_COLUMNS})
+                SELECT {ROW_COLUMNS} FROM read_csv(?,
+                    HEADER=FALSE,
+                    QUOTE='"',
+                    DELIM=',',
+                    ENCODING='utf-8',
+                    COLUMNS=?
+                )
+            """,
+            [self.path.as_posix(), ROW_TYPES],
+        )
+        self.path.unlink(missing_ok=True)
+        self.batch = {}
+        self._flush_touched()
+
+    def pop(self, entity_id: str) -> List[Statement]:
+        self.store.invalidate(entity_id)
+        self.flush()
+        self.store._ensure_index()
+        q = f"SELECT {ROW_COLUMNS} FROM statement WHERE canonical_id = ? ORDER BY rowid"
+        rows = self.store.con.execute(q, [entity_id]).fetchall()
+        q = "DELETE FROM statement WHERE canonical_id = ?"
+        self.store.con.execute(q, [entity_id])
+        # Keep only the last copy of each statement:
+        statements = {s.id: s for s in (unpack_row(row) for row in rows)}
+        return list(statements.values())
+
+
+class DuckDBView(View[DS, SE]):
+    BATCH_ROWS = 10_000
+
+    def __init__(
+        self, store: DuckDBStore[DS, SE], scope: DS, external: bool = False
+    ) -> None:
+        super().__init__(store, scope, external=external)
+        self.store: DuckDBStore[DS, SE] = store
+        self.datasets = sorted(self.dataset_names)
+        self.where = f"dataset IN ({placeholders(self.datasets)})"
+        if not self.external:
+            self.where += " AND NOT external"
+
+    def _query(self, q: str, params: List[Any]) -> Generator[Row, None, None]:
+        # Each query gets its own cursor, so lookups can run while a scan is
+        # being iterated:
+        cursor = self.store.con.cursor()
+        try:
+            result = cursor.execute(q, [*self.datasets, *params])
+            while batch := result.fetchmany(self.BATCH_ROWS):
+                yield from batch
+        finally:
+            cursor.close()
+
+    def _iterate(self, q: str, params: List[Any]) -> Generator[SE, None, None]:
+        # The query must be ordered by canonical ID, and then by `rowid` so that
+        # the last copy of a statement which was added more than once is kept.
+        current_id: Optional[str] = None
+        statements: Dict[Optional[str], Statement] = {}
+        for row in self._query(q, params):
+            stmt = unpack_row(row)
+            if stmt.canonical_id != current_id:
+                entity = self.store.assemble(list(statements.values()))
+                if entity is not None:
+                    yield entity
+                current_id = stmt.canonical_id
+                statements = {}
+            statements[stmt.id] = stmt
+        entity = self.store.assemble(list(statements.values()))
+        if entity is not None:
+            yield entity
+
+    def has_entity(self, id: str) -> bool:
+        self.store._ensure_index()
+        q = f"SELECT id FROM statement WHERE {self.where} AND canonical_id = ? LIMIT 1"
+        for _ in self._query(q, [id]):
+            return True
+        return False
+
+    def get_entity(self, id: str) -> Optional[SE]:
+        self.store._ensure_index()
+        q = f"""
+            SELECT {ROW_COLUMNS} FROM statement
+            WHERE {self.where} AND canonical_id = ?
+            ORDER BY rowid
+        """
+        for entity in self._iterate(q, [id]):
+            return entity
+        return None
+
+    def get_inverted(self, id: str) -> Generator[Tuple[Property, SE], None, None]:
+        self.store._ensure_index()
+        ids = [i.id for i in self.store.linker.connected(Identifier.get(id))]
+        q = f"""
+            SELECT {ROW_COLUMNS} FROM statement
+            WHERE {self.where} AND canonical_id IN (
+                SELECT canonical_id FROM statement
+                WHERE prop_type = ? AND value IN ({placeholders(ids)})
+            )
+            ORDER BY canonical_id, rowid
+        """
+        params = [registry.entity.name, *ids]
+        for entity in list(self._iterate(q, params)):
+            for prop, value in entity.itervalues():
+                if value == id and prop.reverse is not None:
+                    yield prop.reverse, entity
+
+    def entities(
+        self, include_schemata: Optional[List[Schema]] = None
+    ) -> Generator[SE, None, None]:
+        q = f"SELECT {ROW_COLUMNS} FROM statement WHERE {self.where}"
+        params: List[Any] = []
+        if include_schemata is not None:
+            names = [s.name for s in include_schemata]
+            q += f""" AND canonical_id IN (
+                SELECT canonical_id FROM statement
+                WHERE schema IN ({placeholders(names)}))"""
+            params.extend(names)
+        q += " ORDER BY canonical_id, rowid"
+        for entity in self._iterate(q, params):
+            if include_schemata is not None and entity.schema not in include_schemata:
+                continue
+            yield entity
@@ -98,6 +98,7 @@ class LevelDBWriter(Writer[DS, SE]):
     BATCH_STATEMENTS = 100_000
 
     def __init__(self, store: LevelDBStore[DS, SE]):
+        super().__init__(store)
         self.store: LevelDBStore[DS, SE] = store
         self.batch: Optional[Any] = None
         self.batch_size = 0
@@ -107,6 +108,7 @@ class LevelDBWriter(Writer[DS, SE]):
             self.batch.write()
         self.batch = None
         self.batch_size = 0
+        self._flush_touched()
 
     def add_statement(self, stmt: Statement) -> None:
         if stmt.entity_id is None:
@@ -117,6 +119,7 @@ class LevelDBWriter(Writer[DS, SE]):
             self.batch = self.store.db.write_batch()
         canonical_id = self.store.linker.get_canonical(stmt.entity_id)
         stmt.canonical_id = canonical_id
+        self._touch(canonical_id)
 
         ext = "x" if stmt.external else ""
         key = f"s:{canonical_id}:{ext}:{stmt.dataset}:{stmt.schema}:{stmt.id}".encode(E)
@@ -140,6 +143,7 @@ class LevelDBWriter(Writer[DS, SE]):
         self.batch_size += 1
 
     def pop(self, entity_id: str) -> List[Statement]:
+        self.store.invalidate(entity_id)
         if self.batch_size >= self.BATCH_STATEMENTS:
             self.flush()
         if self.batch is None:
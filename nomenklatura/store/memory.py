@@ -1,21 +1,110 @@
-from typing import Dict, Set, List, Optional, Generator, Tuple
+import sys
+from typing import Any, Dict, Set, List, Optional, Generator, Tuple, Union
 from followthemoney import DS, SE, Schema, registry, Property, Statement
 
 from nomenklatura.store.base import Store, View, Writer
 from nomenklatura.resolver import Linker
 
+# The low-cardinality fields of a statement: schema, prop, dataset, lang, origin
+# and external. Each distinct combination is stored once; their number is bound
+# by the model and the datasets, so they are kept for the life of the store.
+Header = Tuple[str, str, str, Optional[str], Optional[str], bool]
+# A statement packed as (value, header, first_seen, last_seen, original_value,
+# entity_id), where the entity ID is only set if it isn't the canonical ID. Unset
+# fields at the end are left out. Values, entity IDs and timestamps are interned,
+# since they are often repeated across statements.
+PackedStatement = Tuple[Any, ...]
+PADDING: PackedStatement = (None,) * 6
+# Packed statements are keyed by their statement ID. IDs which are a SHA1 hex
+# digest, like generated IDs, are kept as an integer, which is half the size.
+StatementKey = Union[int, str]
+
+
+def _stmt_key(id: str) -> StatementKey:
+    if len(id) == 40:
+        try:
+            key = int(id, 16)
+        except ValueError:
+            return id
+        if f"{key:040x}" == id:
+            return key
+    return id
+
+
+def _stmt_id(key: StatementKey) -> str:
+    if isinstance(key, int):
+        return f"{key:040x}"
+    return key
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    # Interned strings are shared, and freed once they are no longer used:
+    if value is None:
+        return None
+    return sys.intern(value)
+
 
 class MemoryStore(Store[DS, SE]):
     """Hold statements in plain dictionaries, with no persistence.
 
     The right choice for datasets that fit into memory, e.g. when processing
-    an entity file on the command line."""
+    an entity file on the command line. Statements are kept as compact tuples
+    which share their repetitive fields, and `Statement` objects are only built
+    when an entity is assembled."""
 
     def __init__(self, dataset: DS, linker: Linker[SE]):
         super().__init__(dataset, linker)
-        self.stmts: Dict[str, Set[Statement]] = {}
+        self.stmts: Dict[str, Dict[StatementKey, PackedStatement]] = {}
         self.inverted: Dict[str, Set[str]] = {}
         self.entities: Dict[str, Set[str]] = {}
+        self.headers: Dict[Header, Header] = {}
+
+    def pack(self, stmt: Statement, canonical_id: str) -> PackedStatement:
+        header: Header = (
+            stmt.schema,
+            stmt.prop,
+            stmt.dataset,
+            stmt.lang,
+            stmt.origin,
+            stmt.external,
+        )
+        header = self.headers.setdefault(header, header)
+        entity_id = None if stmt.entity_id == canonical_id else stmt.entity_id
+        packed = (
+            _intern(stmt.value),
+            header,
+            _intern(stmt.first_seen),
+            _intern(stmt.last_seen),
+            stmt.original_value,
+            _intern(entity_id),
+        )
+        size = len(packed)
+        while packed[size - 1] is None:
+            size -= 1
+        return packed[:size]
+
+    def unpack(
+        self, key: StatementKey, packed: PackedStatement, canonical_id: str
+    ) -> Statement:
+        value, header, first_seen, last_seen, original_value, entity_id = (
+            packed + PADDING[len(packed) :]
+        )
+        schema, prop, dataset, lang, origin, external = header
+        return Statement(
+            entity_id=entity_id or canonical_id,
+            prop=prop,
+            schema=schema,
+            value=value,
+            dataset=dataset,
+            lang=lang,
+            original_value=original_value,
+            first_seen=first_seen,
+            external=external,
+            id=_stmt_id(key),
+            canonical_id=canonical_id,
+            last_seen=last_seen,
+            origin=origin,
+        )
 
     def writer(self) -> Writer[DS, SE]:
         return MemoryWriter(self)
@@ -26,17 +115,23 @@ class MemoryStore(Store[DS, SE]):
 
 class MemoryWriter(Writer[DS, SE]):
     def __init__(self, store: MemoryStore[DS, SE]):
+        super().__init__(store)
         self.store: MemoryStore[DS, SE] = store
 
     def add_statement(self, stmt: Statement) -> None:
-        if stmt.entity_id is None:
+        if stmt.entity_id is None or stmt.id is None:
             return
         canonical_id = stmt.canonical_id or self.store.linker.get_canonical(
             stmt.entity_id
         )
+        canonical_id = sys.intern(canonical_id)
+        self.store.invalidate(canonical_id)
         if canonical_id not in self.store.stmts:
-            self.store.stmts[canonical_id] = set()
-        self.store.stmts[canonical_id].add(stmt)
+            self.store.stmts[canonical_id] = {}
+        # Keyed by statement ID, so that adding a statement again (e.g. with a
+        # new `last_seen`) replaces it:
+        packed = self.store.pack(stmt, canonical_id)
+        self.store.stmts[canonical_id][_stmt_key(stmt.id)] = packed
 
         if stmt.dataset not in self.store.entities:
             self.store.entities[stmt.dataset] = set()
@@ -49,7 +144,9 @@ class MemoryWriter(Writer[DS, SE]):
             self.store.inverted[inverted_id].add(canonical_id)
 
     def pop(self, entity_id: str) -> List[Statement]:
-        statements = self.store.stmts.pop(entity_id, set())
+        self.store.invalidate(entity_id)
+        packed = self.store.stmts.pop(entity_id, {})
+        statements = [self.store.unpack(k, p, entity_id) for k, p in packed.items()]
         for stmt in statements:
             if stmt.dataset in self.store.entities:
                 self.store.entities[stmt.dataset].discard(entity_id)
@@ -59,7 +156,7 @@ class MemoryWriter(Writer[DS, SE]):
                 if inverted_id in self.store.inverted:
                     self.store.inverted[inverted_id].discard(entity_id)
 
-        return list(statements)
+        return statements
 
 
 class MemoryView(View[DS, SE]):
@@ -70,8 +167,8 @@ class MemoryView(View[DS, SE]):
         self.store: MemoryStore[DS, SE] = store
 
     def has_entity(self, id: str) -> bool:
-        for stmt in self.store.stmts.get(id, []):
-            if self.external is False and stmt.external:
+        for packed in self.store.stmts.get(id, {}).values():
+            if self.external is False and packed[1][5]:
                 continue
             return True
         return False
@@ -80,10 +177,10 @@ class MemoryView(View[DS, SE]):
         if id not in self.store.stmts:
             return None
         stmts: List[Statement] = []
-        for stmt in self.store.stmts[id]:
-            if self.external is False and stmt.external:
+        for key, packed in self.store.stmts[id].items():
+            if self.external is False and packed[1][5]:
                 continue
-            stmts.append(stmt)
+            stmts.append(self.store.unpack(key, packed, id))
         return self.store.assemble(stmts)
 
     def get_inverted(self, id: str) -> Generator[Tuple[Property, SE], None, None]:
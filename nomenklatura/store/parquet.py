@@ -0,0 +1,298 @@
+#
+# Parquet-based, read-mostly store for Nomenklatura.
+#
+# Statements are kept in a directory of Parquet files which use the columns of the
+# FtM statement CSV format, each file sorted by `canonical_id`. Reads go through an
+# in-memory DuckDB connection: point lookups only open the files whose row groups
+# may contain the requested IDs, and DuckDB skips the remaining row groups based on
+# their min/max statistics. Dataset and `external` filters are pushed into the scan.
+import csv
+import heapq
+import logging
+from bisect import bisect_right
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Dict, Generator, Iterable, List, Optional, Set, Tuple
+
+import duckdb
+from followthemoney import DS, SE, Property, Schema, Statement, registry
+
+from nomenklatura.settings import DUCKDB_MEMORY, DUCKDB_THREADS
+from nomenklatura.resolver import Identifier, Linker, StrIdent
+from nomenklatura.store.base import Store, View, Writer
+from nomenklatura.store.util import ROW_COLUMNS, ROW_TYPES, placeholders
+from nomenklatura.store.util import pack_row, unpack_row
+
+log = logging.getLogger(__name__)
+
+Row = Tuple[Any, ...]
+# Sidecar index: for each file, the sorted (min, max) canonical IDs of its row groups.
+RowGroups = Dict[str, Tuple[List[str], List[str]]]
+
+
+class ParquetStore(Store[DS, SE]):
+    """A store reading statements from Parquet files sorted by canonical ID.
+
+    Any Parquet file in `path` which has the columns of the statement CSV format
+    can be read without an ingest step, as long as its rows are sorted by the
+    `canonical_id` column. The writer appends new, sorted part files. Merges
+    recorded in the linker are applied at read time, so `update()` is a no-op.
+    """
+
+    ROW_GROUP_SIZE = 50_000
+
+    def __init__(self, dataset: DS, linker: Linker[SE], path: Path):
+        super().__init__(dataset, linker)
+        self.path = path.resolve()
+        self.path.mkdir(parents=True, exist_ok=True)
+        config: Dict[str, Any] = {"python_enable_replacements": False}
+        if DUCKDB_MEMORY is not None:
+            config["memory_limit"] = f"{DUCKDB_MEMORY}MB"
+        if DUCKDB_THREADS is not None:
+            config["threads"] = int(DUCKDB_THREADS)
+        self.con = duckdb.connect(config=config)
+        self.con.execute("SET parquet_metadata_cache = true")
+        self._row_groups: Optional[RowGroups] = None
+
+    @property
+    def files(self) -> List[str]:
+        return sorted(p.as_posix() for p in self.path.glob("*.parquet"))
+
+    @property
+    def row_groups(self) -> RowGroups:
+        """Build the canonical ID range index of all row groups from the footers
+        of the Parquet files."""
+        if self._row_groups is None:
+            self._row_groups = {}
+            files = self.files
+            if len(files):
+                q = """
+                    SELECT file_name, stats_min_value, stats_max_value
+                    FROM parquet_metadata(?)
+                    WHERE path_in_schema = 'canonical_id'
+                    ORDER BY file_name, row_group_id
+                """
+                for file_name, min_id, max_id in self.con.execute(
+                    q, [files]
+                ).fetchall():
+                    mins, maxs = self._row_groups.setdefault(file_name, ([], []))
+                    mins.append(min_id)
+                    maxs.append(max_id)
+            log.info(
+                "Indexed %d Parquet files at: %s", len(self._row_groups), self.path
+            )
+        return self._row_groups
+
+    def files_for(self, ids: Iterable[str]) -> List[str]:
+        """Select the files which have a row group that may contain any of the
+        given canonical IDs."""
+        files: List[str] = []
+        for file_name, (mins, maxs) in self.row_groups.items():
+            for id in ids:
+                idx = bisect_right(mins, id) - 1
+                if idx >= 0 and id <= maxs[idx]:
+                    files.append(file_name)
+                    break
+        return files
+
+    def writer(self) -> Writer[DS, SE]:
+        return ParquetWriter(self)
+
+    def view(self, scope: DS, external: bool = False) -> View[DS, SE]:
+        return ParquetView(self, scope, external=external)
+
+    def update(self, id: StrIdent) -> None:
+        # Canonical IDs are applied on read, so only the caches go stale.
+        for cache in self._caches:
+            cache.clear()
+
+    def close(self) -> None:
+        self.con.close()
+
+
+class ParquetWriter(Writer[DS, SE]):
+    BATCH_STATEMENTS = 1_000_000
+
+    def __init__(self, store: ParquetStore[DS, SE]):
+        super().__init__(store)
+        self.store: ParquetStore[DS, SE] = store
+        self.batch: List[List[Any]] = []
+
+    def add_statement(self, stmt: Statement) -> None:
+        if stmt.entity_id is None:
+            return
+        stmt.canonical_id = self.store.linker.get_canonical(stmt.entity_id)
+        self._touch(stmt.canonical_id)
+        self.batch.append(pack_row(stmt))
+        if len(self.batch) >= self.BATCH_STATEMENTS:
+            self.flush()
+
+    def flush(self) -> None:
+        if not len(self.batch):
+            return
+        number = self._next_part()
+        path = self.store.path / f"part-{number:05d}.parquet"
+        csv_path = self.store.path / f"part-{number:05d}.csv"
+        with open(csv_path, "w", encoding="utf-8") as fh:
+            csv.writer(fh).writerows(self.batch)
+        self.store.con.execute(
+            f"""
+            COPY (
+                SELECT {ROW_COLUMNS} FROM read_csv(?,
+                    HEADER=FALSE,
+                    QUOTE='"',
+                    DELIM=',',
+                    ENCODING='utf-8',
+                    COLUMNS=?
+                )
+                ORDER BY canonical_id, id
+            ) TO '{path.as_posix()}'
+                (FORMAT parquet, COMPRESSION zstd, ROW_GROUP_SIZE {self.store.ROW_GROUP_SIZE})
+            """,
+            [csv_path.as_posix(), ROW_TYPES],
+        )
+        csv_path.unlink(missing_ok=True)
+        log.info("Wrote %d statements to: %s", len(self.batch), path)
+        self.batch = []
+        self.store._row_groups = None
+        self._flush_touched()
+
+    def _next_part(self) -> int:
+        # Follow the highest part number, so that no existing part is replaced
+        # if some are missing from the sequence:
+        number = -1
+        for path in self.store.path.glob("part-*.parquet"):
+            try:
+                number = max(number, int(path.stem.split("-", 1)[1]))
+            except ValueError:
+                continue
+        return number + 1
+
+    def pop(self, entity_id: str) -> List[Statement]:
+        raise NotImplementedError()
+
+
+class ParquetView(View[DS, SE]):
+    def __init__(
+        self, store: ParquetStore[DS, SE], scope: DS, external: bool = False
+    ) -> None:
+        super().__init__(store, scope, external=external)
+        self.store: ParquetStore[DS, SE] = store
+        self.datasets = sorted(self.dataset_names)
+        self.where = f"dataset IN ({placeholders(self.datasets)})"
+        if not self.external:
+            self.where += " AND NOT external"
+
+    def _query(
+        self, files: List[str], where: str, params: List[Any], order: bool = False
+    ) -> Generator[Row, None, None]:
+        if not len(files) or not len(self.datasets):
+            return
+        q = f"SELECT {ROW_COLUMNS} FROM read_parquet(?) WHERE {self.where} AND {where}"
+        if order:
+            q += " ORDER BY canonical_id"
+        cursor = self.store.con.cursor()
+        try:
+            result = cursor.execute(q, [files, *self.datasets, *params])
+            while batch := result.fetchmany(10_000):
+                yield from batch
+        finally:
+            cursor.close()
+
+    def _get_rows(self, id: str) -> List[Row]:
+        ids = [i.id for i in self.store.linker.connected(Identifier.get(id))]
+        files = self.store.files_for(ids)
+        where = f"canonical_id IN ({placeholders(ids)})"
+        return list(self._query(files, where, ids))
+
+    def _build_entity(self, rows: Iterable[Row]) -> Optional[SE]:
+        statements: List[Statement] = []
+        for row in rows:
+            stmt = unpack_row(row)
+            stmt.canonical_id = self.store.linker.get_canonical(stmt.entity_id)
+            statements.append(stmt)
+        return self.store.assemble(statements)
+
+    def has_entity(self, id: str) -> bool:
+        return len(self._get_rows(id)) > 0
+
+    def get_entity(self, id: str) -> Optional[SE]:
+        return self._build_entity(self._get_rows(id))
+
+    def get_inverted(self, id: str) -> Generator[Tuple[Property, SE], None, None]:
+        # References are not sorted, so this scans the `value` column of all files.
+        ids = [i.id for i in self.store.linker.connected(Identifier.get(id))]
+        where = f"prop_type = ? AND value IN ({placeholders(ids)})"
+        params = [registry.entity.name, *ids]
+        refs: Set[str] = set()
+        for row in self._query(self.store.files, where, params):
+            refs.add(self.store.linker.get_canonical(row[1]))
+        for ref in sorted(refs):
+            entity = self.get_entity(ref)
+            if entity is None:
+                continue
+            for prop, value in entity.itervalues():
+                if value == id and prop.reverse is not None:
+                    yield prop.reverse, entity
+
+    def entities(
+        self, include_schemata: Optional[List[Schema]] = None
+    ) -> Generator[SE, None, None]:
+        where = "TRUE"
+        params: List[str] = []
+        if include_schemata is not None:
+            names = [s.name for s in include_schemata]
+            where = f"""canonical_id IN (
+                SELECT canonical_id FROM read_parquet(?)
+                WHERE schema IN ({placeholders(names)}))"""
+            params = [*names]
+
+        # Each file is sorted by canonical ID, so the per-file streams can be
+        # merged into a single sorted stream. The sort in each query doesn't rely
+        # on the scan order of DuckDB, and is cheap on sorted input:
+        streams: List[Iterable[Row]] = []
+        for file_name in self.store.files:
+            file_params: List[Any] = params
+            if include_schemata is not None:
+                file_params = [[file_name], *params]
+            stream = self._query([file_name], where, file_params, order=True)
+            streams.append(stream)
+
+        # Only IDs of clusters with more than one member are tracked, see
+        # `VersionedRedisView.entities()`.
+        seen: Set[str] = set()
+        current_id: Optional[str] = None
+        rows: List[Row] = []
+        for row in heapq.merge(*streams, key=itemgetter(0)):
+            if row[0] != current_id:
+                yield from self._emit(current_id, rows, seen, include_schemata)
+                current_id = row[0]
+                rows = []
+            rows.append(row)
+        yield from self._emit(current_id, rows, seen, include_schemata)
+
+    def _emit(
+        self,
+        group_id: Optional[str],
+        rows: List[Row],
+        seen: Set[str],
+        include_schemata: Optional[List[Schema]],
+    ) -> Generator[SE, None, None]:
+        if group_id is None or not len(rows):
+            return
+        connected = self.store.linker.connected(Identifier.get(group_id))
+        if len(connected) > 1:
+            # The statements of a merged entity may be spread over several
+            # groups (or files), so it's loaded using a point lookup.
+            canonical_id = self.store.linker.get_canonical(group_id)
+            if canonical_id in seen:
+                return
+            seen.add(canonical_id)
+            entity = self.get_entity(canonical_id)
+        else:
+            entity = self._build_entity(rows)
+        if entity is None:
+            return
+        if include_schemata is not None and entity.schema not in include_schemata:
+            return
+        yield entity
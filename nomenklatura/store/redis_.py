@@ -34,6 +34,7 @@ class RedisWriter(Writer[DS, SE]):
     BATCH_STATEMENTS = 100_000
 
     def __init__(self, store: RedisStore[DS, SE]):
+        super().__init__(store)
         self.store: RedisStore[DS, SE] = store
         self.pipeline: Optional["Pipeline[bytes]"] = None
         self.batch_size = 0
@@ -43,6 +44,7 @@ class RedisWriter(Writer[DS, SE]):
             self.pipeline.execute()
         self.pipeline = None
         self.batch_size = 0
+        self._flush_touched()
 
     def add_statement(self, stmt: Statement) -> None:
         if stmt.entity_id is None:
@@ -53,6 +55,7 @@ class RedisWriter(Writer[DS, SE]):
             self.pipeline = self.store.db.pipeline()
         canonical_id = self.store.linker.get_canonical(stmt.entity_id)
         stmt.canonical_id = canonical_id
+        self._touch(canonical_id)
 
         self.pipeline.sadd(b(f"ds:{stmt.dataset}"), b(canonical_id))
         key = f"x:{canonical_id}" if stmt.external else f"s:{canonical_id}"
@@ -64,6 +67,7 @@ class RedisWriter(Writer[DS, SE]):
         self.batch_size += 1
 
     def pop(self, entity_id: str) -> List[Statement]:
+        self.store.invalidate(entity_id)
         if self.batch_size >= self.BATCH_STATEMENTS:
             self.flush()
         if self.pipeline is None:
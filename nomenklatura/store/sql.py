@@ -1,9 +1,9 @@
 from types import TracebackType
-from typing import Any, Generator, List, Optional, Set, Tuple, Type
+from typing import Any, Dict, Generator, List, Optional, Set, Tuple, Type
 
 from followthemoney import DS, SE, Property, Schema, Statement
-from sqlalchemy import Table, delete, func, select
-from sqlalchemy.engine import Engine, Transaction
+from sqlalchemy import Table, bindparam, delete, select
+from sqlalchemy.engine import Connection, Engine, Transaction
 from sqlalchemy.dialects.postgresql import insert as psql_insert
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.sql.selectable import Select
@@ -12,9 +12,11 @@ from nomenklatura import settings
 from nomenklatura.db import (
     SQLITE_MAX_VARS,
     close_db,
+    copy_statements,
     get_engine,
     get_metadata,
     make_statement_table,
+    supports_copy,
 )
 from nomenklatura.resolver import Linker, Identifier
 from nomenklatura.store import Store, View, Writer
@@ -49,36 +51,55 @@ class SQLStore(Store[DS, SE]):
         return SQLView(self, scope, external=external)
 
     def _execute(
-        self, q: Select[Any], stream: bool = True
+        self,
+        q: Select[Any],
+        stream: bool = True,
+        conn: Optional[Connection] = None,
+        params: Optional[Dict[str, Any]] = None,
     ) -> Generator[Any, None, None]:
         # execute any read query against sql backend
+        if conn is not None:
+            cursor = conn.execute(q, params)
+            while rows := cursor.fetchmany(10_000):
+                yield from rows
+            return
         with self.engine.connect() as conn:
             if stream:
                 conn = conn.execution_options(stream_results=True)
-            cursor = conn.execute(q)
+            cursor = conn.execute(q, params)
             while rows := cursor.fetchmany(10_000):
                 yield from rows
 
     def _iterate_stmts(
-        self, q: Select[Any], stream: bool = True
+        self,
+        q: Select[Any],
+        stream: bool = True,
+        conn: Optional[Connection] = None,
+        params: Optional[Dict[str, Any]] = None,
     ) -> Generator[Statement, None, None]:
-        for row in self._execute(q, stream=stream):
+        for row in self._execute(q, stream=stream, conn=conn, params=params):
             yield Statement.from_db_row(row)
 
     def _iterate(
-        self, q: Select[Any], stream: bool = True
+        self,
+        q: Select[Any],
+        stream: bool = True,
+        conn: Optional[Connection] = None,
+        params: Optional[Dict[str, Any]] = None,
     ) -> Generator[SE, None, None]:
+        # The query must be ordered by canonical ID
         current_id = None
         current_stmts: list[Statement] = []
-        for stmt in self._iterate_stmts(q, stream=stream):
-            entity_id = stmt.entity_id
+        stmts = self._iterate_stmts(q, stream=stream, conn=conn, params=params)
+        for stmt in stmts:
+            canonical_id = stmt.canonical_id
             if current_id is None:
-                current_id = entity_id
-            if current_id != entity_id:
+                current_id = canonical_id
+            if current_id != canonical_id:
                 proxy = self.assemble(current_stmts)
                 if proxy is not None:
                     yield proxy
-                current_id = entity_id
+                current_id = canonical_id
                 current_stmts = []
             current_stmts.append(stmt)
         if len(current_stmts):
@@ -89,6 +110,7 @@ class SQLStore(Store[DS, SE]):
 
 class SQLWriter(Writer[DS, SE]):
     def __init__(self, store: SQLStore[DS, SE]):
+        super().__init__(store)
         self.store: SQLStore[DS, SE] = store
         self.batch: Set[Statement] = set()
         self.conn = self.store.engine.connect()
@@ -117,9 +139,13 @@ class SQLWriter(Writer[DS, SE]):
     def _upsert_batch(self) -> None:
         if not len(self.batch):
             return
-        values = [s.to_db_row() for s in self.batch]
         if self.tx is None:
             self.tx = self.conn.begin()
+        if supports_copy(self.store.engine.dialect):
+            copy_statements(self.conn, self.store.table, self.batch, update=True)
+            self.batch = set()
+            return
+        values = [s.to_db_row() for s in self.batch]
         if self.store.engine.dialect.name == "sqlite":
             ilstmt = sqlite_insert(self.store.table).values(values)
             lstmt = ilstmt.on_conflict_do_update(
@@ -159,17 +185,20 @@ class SQLWriter(Writer[DS, SE]):
         if self.tx is not None:
             self.tx.commit()
             self.tx = None
+        self._flush_touched()
 
     def add_statement(self, stmt: Statement) -> None:
         if stmt.entity_id is None:
             return
         canonical_id = self.store.linker.get_canonical(stmt.entity_id)
         stmt.canonical_id = canonical_id
+        self._touch(canonical_id)
         self.batch.add(stmt)
         if len(self.batch) >= self.batch_limit:
             self._upsert_batch()
 
     def pop(self, entity_id: str) -> List[Statement]:
+        self.store.invalidate(entity_id)
         if self.tx is None:
             self.tx = self.conn.begin()
 
@@ -193,48 +222,76 @@ class SQLView(View[DS, SE]):
     ) -> None:
         super().__init__(store, scope, external=external)
         self.store: SQLStore[DS, SE] = store
+        self._conn: Optional[Connection] = None
 
-    def get_entity(self, id: str) -> Optional[SE]:
+        # The lookup queries are built once and then executed with parameters,
+        # so that SQLAlchemy can re-use their compiled form:
         table = self.store.table
+        in_scope = table.c.dataset.in_(self.dataset_names)
         q = select(table)
-        q = q.where(table.c.canonical_id == id)
-        q = q.where(table.c.dataset.in_(self.dataset_names))
-        for proxy in self.store._iterate(q, stream=False):
+        q = q.where(table.c.canonical_id == bindparam("id"))
+        self._q_entity = q.where(in_scope)
+        q = select(table.c.id)
+        q = q.where(table.c.canonical_id == bindparam("id"))
+        self._q_has = q.where(in_scope).limit(1)
+        refs = select(table.c.canonical_id)
+        refs = refs.where(table.c.prop_type == "entity")
+        refs = refs.where(table.c.value.in_(bindparam("ids", expanding=True)))
+        refs = refs.where(in_scope)
+        q = select(table)
+        q = q.where(table.c.canonical_id.in_(refs))
+        q = q.where(in_scope)
+        self._q_inverted = q.order_by(table.c.canonical_id)
+
+    @property
+    def conn(self) -> Connection:
+        """The connection used by the view for lookups. It is checked out of
+        the pool on first use and held until the view is closed."""
+        if self._conn is None or self._conn.closed:
+            conn = self.store.engine.connect()
+            # Don't hold a transaction open between lookups:
+            self._conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        return self._conn
+
+    def close(self) -> None:
+        """Return the connection held by the view to the pool."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "SQLView[DS, SE]":
+        return self
+
+    def __exit__(
+        self,
+        type: Optional[Type[BaseException]],
+        value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def get_entity(self, id: str) -> Optional[SE]:
+        params = {"id": id}
+        for proxy in self.store._iterate(self._q_entity, conn=self.conn, params=params):
             return proxy
         return None
 
     def has_entity(self, id: str) -> bool:
-        table = self.store.table
-        q = select(func.count(table.c.id))
-        q = q.where(table.c.canonical_id == id)
-        q = q.where(table.c.dataset.in_(self.dataset_names))
-        with self.store.engine.connect() as conn:
-            cursor = conn.execute(q)
-            count = cursor.scalar()
-            if count is not None and count > 0:
-                return True
-            else:
-                return False
+        cursor = self.conn.execute(self._q_has, {"id": id})
+        return cursor.first() is not None
 
     def get_inverted(self, id: str) -> Generator[Tuple[Property, SE], None, None]:
-        table = self.store.table
         id_ = Identifier.get(id)
         ids = [i.id for i in self.store.linker.connected(id_)]
-        q = select(table.c.canonical_id)
-        q = q.where(table.c.prop_type == "entity")
-        q = q.where(table.c.value.in_(ids))
-        q = q.where(table.c.dataset.in_(self.dataset_names))
-        q = q.group_by(table.c.canonical_id)
-        with self.store.engine.connect() as conn:
-            cursor = conn.execute(q)
-            for (canonical_id,) in cursor.fetchall():
-                if canonical_id is None:
-                    continue
-                entity = self.get_entity(canonical_id)
-                if entity is not None:
-                    for prop, value in entity.itervalues():
-                        if value == id and prop.reverse is not None:
-                            yield prop.reverse, entity
+        # Load all referencing entities in one query, and materialise them
+        # so that callers can use the connection while iterating:
+        params = {"ids": ids}
+        q = self._q_inverted
+        entities = list(self.store._iterate(q, conn=self.conn, params=params))
+        for entity in entities:
+            for prop, value in entity.itervalues():
+                if value == id and prop.reverse is not None:
+                    yield prop.reverse, entity
 
     def entities(
         self, include_schemata: Optional[List[Schema]] = None
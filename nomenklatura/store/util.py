@@ -1,8 +1,19 @@
 import orjson
+from typing import Any, List, Optional, Sequence, Sized
 
 from followthemoney import Statement
+from followthemoney.statement.serialize import CSV_COLUMNS
 from followthemoney.statement.util import pack_prop, unpack_prop
 
+# Column types of statement tables in DuckDB, following the statement CSV format:
+ROW_TYPES = {c: "BOOLEAN" if c == "external" else "VARCHAR" for c in CSV_COLUMNS}
+ROW_COLUMNS = ", ".join(f'"{c}"' for c in CSV_COLUMNS)
+
+
+def placeholders(values: Sized) -> str:
+    """A list of `?` query parameter placeholders, one for each value."""
+    return ", ".join("?" * len(values))
+
 
 def pack_statement(stmt: Statement) -> bytes:
     values = (
@@ -46,3 +57,45 @@ def unpack_statement(data: bytes, canonical_id: str, external: bool) -> Statemen
         canonical_id=canonical_id,
         external=external,
     )
+
+
+def pack_row(stmt: Statement) -> List[Optional[str]]:
+    """Serialise a statement to a CSV row that DuckDB reads using `ROW_TYPES`."""
+    row = stmt.to_csv_row()
+    row["external"] = "true" if stmt.external else "false"
+    return [row[c] for c in CSV_COLUMNS]
+
+
+def unpack_row(row: Sequence[Any]) -> Statement:
+    """Build a statement from a row selected using `ROW_COLUMNS`."""
+    (
+        canonical_id,
+        entity_id,
+        prop,
+        _,
+        schema,
+        value,
+        dataset,
+        origin,
+        lang,
+        original_value,
+        external,
+        first_seen,
+        last_seen,
+        id,
+    ) = row
+    return Statement(
+        id=id,
+        entity_id=entity_id,
+        prop=prop,
+        schema=schema,
+        value=value,
+        lang=lang,
+        dataset=dataset,
+        original_value=original_value,
+        origin=origin,
+        first_seen=first_seen,
+        last_seen=last_seen,
+        canonical_id=canonical_id,
+        external=bool(external),
+    )
@@ -1,14 +1,18 @@
 import orjson
 import logging
+from hashlib import sha1
+from threading import Thread
 from redis.client import Redis
-from typing import Generator, List, Optional, Set, Tuple, Dict
+from typing import Generator, Iterable, List, Optional, Set, Tuple, Dict
 from followthemoney import DS, SE, Schema, registry, Property, Statement
 from followthemoney.statement.util import pack_prop, unpack_prop
 from followthemoney.dataset.versions import Version
 
+from nomenklatura.delta import ADD, DEL, MOD
 from nomenklatura.kv import b, bv, get_redis, close_redis
 from nomenklatura.resolver import Linker, Identifier, StrIdent
 from nomenklatura.store.base import Store, View, Writer
+from nomenklatura.util import chunked
 
 log = logging.getLogger(__name__)
 
@@ -59,7 +63,16 @@ def _unpack_statement(data: bytes, canonical_id: Optional[str] = None) -> Statem
     )
 
 
+def _stmt_digest(stmt_id: str) -> int:
+    # Summing these per entity gives an order-independent fingerprint of the
+    # set of statements, which can be built up incrementally using HINCRBY.
+    return int.from_bytes(sha1(b(stmt_id)).digest()[:5], "big")
+
+
 class VersionedRedisStore(Store[DS, SE]):
+    BATCH_DIFF = 500
+    BATCH_DROP = 10_000
+
     def __init__(
         self,
         dataset: DS,
@@ -122,24 +135,51 @@ class VersionedRedisStore(Store[DS, SE]):
             self.db.set(b(f"ds:{dataset}:latest"), latest)
         log.info("Released store version: %s (%s)", dataset, version)
 
-    def drop_version(self, dataset: str, version: str) -> None:
-        """Delete all data associated with a specific version of a dataset."""
-        pipeline = self.db.pipeline()
-        cmds = 0
-        for prefix in ["stmt", "ents", "inv"]:
-            query = f"{prefix}:{dataset}:{version}*"
-            for key in self.db.scan_iter(query):
-                pipeline.delete(key)
-                cmds += 1
-                if cmds > 1_000:
-                    pipeline.execute()
-                    pipeline = self.db.pipeline()
-                    cmds = 0
-        if cmds > 0:
-            pipeline.execute()
-
+    def drop_version(
+        self, dataset: str, version: str, background: bool = False
+    ) -> Optional[Thread]:
+        """Delete all data associated with a specific version of a dataset.
+
+        The version is removed from the dataset history right away, and then its
+        keys are unlinked in batches. If `background` is set, the deletion runs
+        in a thread which is returned to the caller. An interrupted drop is
+        recorded in the store and can be completed using `resume_drops()`."""
+        # The drop is recorded in the same transaction which removes the version
+        # from the history, so a version can't leave the history without its
+        # keys being purged eventually.
         # TODO: do we even want to remove the version from the history list?
-        self.db.lrem(f"ds:{dataset}:history", 0, b(version))
+        pipeline = self.db.pipeline(transaction=True)
+        pipeline.hsetnx(b"drops", b(f"{dataset}:{version}"), 0)
+        pipeline.lrem(f"ds:{dataset}:history", 0, b(version))
+        pipeline.execute()
+        self._unset_latest(dataset, version)
+        if background:
+            thread = Thread(
+                target=self._purge_version,
+                args=(dataset, version),
+                name=f"drop:{dataset}:{version}",
+            )
+            thread.start()
+            return thread
+        self._purge_version(dataset, version)
+        return None
+
+    def get_drops(self) -> Dict[str, int]:
+        """List the version drops which have not been completed, with the number
+        of keys deleted so far."""
+        drops = self.db.hgetall(b"drops")
+        return {k.decode("utf-8"): int(v) for k, v in drops.items()}
+
+    def resume_drops(self) -> None:
+        """Complete any version drops which have been interrupted."""
+        for ver in self.get_drops().keys():
+            dataset, version = ver.split(":", 1)
+            self.db.lrem(f"ds:{dataset}:history", 0, b(version))
+            self._unset_latest(dataset, version)
+            self._purge_version(dataset, version)
+
+    def _unset_latest(self, dataset: str, version: str) -> None:
+        # If the dropped version is the latest, fall back to the one before it:
         latest_key = f"ds:{dataset}:latest"
         if b(version) == self.db.get(latest_key):
             previous = self.db.lindex(b(f"ds:{dataset}:history"), 0)
@@ -147,8 +187,94 @@ class VersionedRedisStore(Store[DS, SE]):
                 self.db.set(latest_key, previous)
             else:
                 self.db.delete(latest_key)
+
+    def _purge_version(self, dataset: str, version: str) -> None:
+        ver = f"{dataset}:{version}"
+        # The statement keys of a version are listed by its entity set, and the
+        # inverted keys by the set of referenced IDs. Each batch of keys is
+        # unlinked along with its registry entries, so that an interrupted drop
+        # can pick up where it stopped.
+        registries = [("ents", "stmt"), ("refs", "inv")]
+        if not self.db.hexists(b(f"meta:{ver}"), b"registry"):
+            log.warning("Version has no key registry, scanning: %s", ver)
+            self._unlink_keys(ver, (k for k in self.db.scan_iter(f"inv:{ver}:*")))
+            registries = [("ents", "stmt")]
+        for registry_, prefix in registries:
+            registry_key = b(f"{registry_}:{ver}")
+            scan = self.db.sscan_iter(registry_key, count=self.BATCH_DROP)
+            for ids in chunked(scan, self.BATCH_DROP):
+                keys = [b"%s:%s:%s" % (b(prefix), b(ver), id) for id in ids]
+                pipeline = self.db.pipeline(transaction=True)
+                pipeline.unlink(*keys)
+                pipeline.srem(registry_key, *ids)
+                pipeline.hincrby(b"drops", b(ver), len(keys))
+                pipeline.execute()
+                log.info("Dropping store version: %s (%d keys)", ver, len(keys))
+        fixed = ["ents", "refs", "seen", "digest", "meta"]
+        self.db.unlink(*[b(f"{prefix}:{ver}") for prefix in fixed])
+        self.db.hdel(b"drops", b(ver))
         log.info("Dropped store version: %s (%s)", dataset, version)
 
+    def _unlink_keys(self, ver: str, keys: Iterable[bytes]) -> None:
+        for batch in chunked(keys, self.BATCH_DROP):
+            pipeline = self.db.pipeline(transaction=False)
+            pipeline.unlink(*batch)
+            pipeline.hincrby(b"drops", b(ver), len(batch))
+            pipeline.execute()
+
+    def diff(
+        self, dataset: str, old_version: str, new_version: str
+    ) -> Generator[Tuple[str, str, Optional[SE]], None, None]:
+        """Compare two versions of a dataset and generate entity-level changes.
+
+        Yields tuples of the operation (`ADD`, `MOD` or `DEL`, see
+        `nomenklatura.delta`), the entity ID and - for added and modified
+        entities - the entity as of the new version. Entities are compared by
+        the IDs of their statements, so a change in timestamps alone is not
+        considered a modification. Only changed entities are decoded when both
+        versions were written with statement digests."""
+        old_ver = f"{dataset}:{old_version}"
+        new_ver = f"{dataset}:{new_version}"
+        old_ents = b(f"ents:{old_ver}")
+        new_ents = b(f"ents:{new_ver}")
+        old_digest = b(f"digest:{old_ver}")
+        new_digest = b(f"digest:{new_ver}")
+        digests = self.db.exists(old_digest, new_digest) == 2
+
+        added = {bv(v) for v in self.db.sdiff(new_ents, old_ents)}
+        for ids in chunked(added, self.BATCH_DIFF):
+            pipeline = self.db.pipeline(transaction=False)
+            for id in ids:
+                pipeline.smembers(b"stmt:%s:%s" % (b(new_ver), id))
+            for id, values in zip(ids, pipeline.execute()):
+                stmts = [_unpack_statement(bv(v)) for v in values]
+                yield ADD, id.decode("utf-8"), self.assemble(stmts)
+
+        for ids in chunked(self.db.sscan_iter(new_ents), self.BATCH_DIFF):
+            common = [id for id in ids if id not in added]
+            if digests and len(common):
+                pipeline = self.db.pipeline(transaction=False)
+                pipeline.hmget(old_digest, common)
+                pipeline.hmget(new_digest, common)
+                old_sums, new_sums = pipeline.execute()
+                common = [i for i, o, n in zip(common, old_sums, new_sums) if o != n]
+            if len(common) == 0:
+                continue
+            pipeline = self.db.pipeline(transaction=False)
+            for id in common:
+                pipeline.smembers(b"stmt:%s:%s" % (b(old_ver), id))
+                pipeline.smembers(b"stmt:%s:%s" % (b(new_ver), id))
+            results = pipeline.execute()
+            for idx, id in enumerate(common):
+                old_values, new_values = results[idx * 2], results[idx * 2 + 1]
+                old_ids = {orjson.loads(v)[0] for v in old_values}
+                stmts = [_unpack_statement(bv(v)) for v in new_values]
+                if old_ids != {s.id for s in stmts}:
+                    yield MOD, id.decode("utf-8"), self.assemble(stmts)
+
+        for v in self.db.sdiff(old_ents, new_ents):
+            yield DEL, bv(v).decode("utf-8"), None
+
     def close(self) -> None:
         close_redis()
 
@@ -169,6 +295,8 @@ class VersionedRedisWriter(Writer[DS, SE]):
         self.ver = f"{dataset.name}:{version}"
         self.store: VersionedRedisStore[DS, SE] = store
         self.prev = store.get_latest(dataset.name)
+        self.prev_ver = f"{dataset.name}:{self.prev}"
+        self.prev_seen: Optional[bool] = None
         self.buffer: List[Statement] = []
 
     def __enter__(self) -> "VersionedRedisWriter[DS, SE]":
@@ -187,29 +315,93 @@ class VersionedRedisWriter(Writer[DS, SE]):
         if len(statements) == 0:
             return
 
+        # Mark the version as keeping a registry of its keys (see drop_version):
+        pipeline.hset(b(f"meta:{self.ver}"), b"registry", 1)
+
         # Merge with previous version to get accurate first_seen timestamps
         if self.timestamps and self.prev:
-            keys = [b(f"stmt:{self.prev}:{e}") for e in statements.keys()]
-            for v in db.sunion(keys):
-                pstmt = _unpack_statement(bv(v))
-                for stmt in self.buffer:
-                    if pstmt.id == stmt.id:
-                        stmt.first_seen = pstmt.first_seen
-                        break
+            self._merge_first_seen(statements)
+
+        # Statements already written to the version by an earlier flush are
+        # not added to the entity digests again:
+        written = self._written_ids(list(statements.keys()))
 
         for entity_id, stmts in statements.items():
             b_entity_id = b(entity_id)
             pipeline.sadd(b(f"ents:{self.ver}"), b_entity_id)
             values = [_pack_statement(s) for s in stmts]
             pipeline.sadd(f"stmt:{self.ver}:{entity_id}", *values)
+            ids = {s.id for s in stmts if s.id is not None}
+            ids.difference_update(written.get(entity_id, ()))
+            digest = sum(_stmt_digest(i) for i in ids)
+            pipeline.hincrby(b(f"digest:{self.ver}"), b_entity_id, digest)
+            if self.timestamps:
+                seen = {s.id: s.first_seen for s in stmts if s.first_seen is not None}
+                if len(seen):
+                    pipeline.hset(b(f"seen:{self.ver}"), mapping=seen)  # type: ignore
 
             for stmt in stmts:
                 if stmt.prop_type == registry.entity.name:
                     pipeline.sadd(b(f"inv:{self.ver}:{stmt.value}"), b_entity_id)
+                    pipeline.sadd(b(f"refs:{self.ver}"), b(stmt.value))
 
         pipeline.execute()
         self.buffer = []
 
+    def _written_ids(self, entity_ids: List[str]) -> Dict[str, Set[str]]:
+        """Get the IDs of the statements already written to this version for
+        each of the given entities which are part of it."""
+        db = self.store.db
+        written: Dict[str, Set[str]] = {}
+        keys = [b(e) for e in entity_ids]
+        present = db.smismember(b(f"ents:{self.ver}"), keys)  # type: ignore
+        existing = [e for e, p in zip(entity_ids, present) if p]
+        if len(existing) == 0:
+            return written
+        pipeline = db.pipeline(transaction=False)
+        for entity_id in existing:
+            pipeline.smembers(b(f"stmt:{self.ver}:{entity_id}"))
+        for entity_id, members in zip(existing, pipeline.execute()):
+            written[entity_id] = {orjson.loads(v)[0] for v in members}
+        return written
+
+    def _merge_first_seen(self, statements: Dict[str, Set[Statement]]) -> None:
+        """Carry over the first_seen timestamps of statements that were already
+        part of the previous version of the dataset."""
+        by_id: Dict[str, Statement] = {}
+        for stmts in statements.values():
+            for stmt in stmts:
+                if stmt.id is not None:
+                    by_id[stmt.id] = stmt
+        if len(by_id) == 0:
+            return
+
+        db = self.store.db
+        if self.prev_seen is None:
+            self.prev_seen = db.exists(b(f"seen:{self.prev_ver}")) > 0
+
+        # Versions written with timestamps keep a compact statement ID ->
+        # first_seen hash, which saves decoding the previous statements:
+        if self.prev_seen:
+            ids = list(by_id.keys())
+            values = db.hmget(b(f"seen:{self.prev_ver}"), ids)
+            for stmt_id, value in zip(ids, values):
+                if value is not None:
+                    by_id[stmt_id].first_seen = value.decode("utf-8")
+            return
+
+        pipeline = db.pipeline(transaction=False)
+        for entity_id in statements.keys():
+            pipeline.smembers(b(f"stmt:{self.prev_ver}:{entity_id}"))
+        for members in pipeline.execute():
+            for v in members:
+                pstmt = _unpack_statement(bv(v))
+                if pstmt.id is None or pstmt.first_seen is None:
+                    continue
+                current = by_id.get(pstmt.id)
+                if current is not None:
+                    current.first_seen = pstmt.first_seen
+
     def release(self) -> None:
         """Release the current version of the dataset (i.e. tag it as the latest
         version in the relevant lookup key)."""
@@ -231,6 +423,8 @@ class VersionedRedisWriter(Writer[DS, SE]):
 
 
 class VersionedRedisView(View[DS, SE]):
+    BATCH_ENTITIES = 500
+
     def __init__(
         self,
         store: VersionedRedisStore[DS, SE],
@@ -285,9 +479,9 @@ class VersionedRedisView(View[DS, SE]):
                 timestamps[stmt.id] = stmt.first_seen
         return timestamps
 
-    def get_entity(self, id: str) -> Optional[SE]:
+    def _build_entity(self, stmts: Iterable[Statement]) -> Optional[SE]:
         statements: List[Statement] = []
-        for stmt in self._get_statements(id):
+        for stmt in stmts:
             if not stmt.external or self.external:
                 stmt.canonical_id = self.store.linker.get_canonical(stmt.entity_id)
                 if stmt.prop_type == registry.entity.name:
@@ -295,6 +489,9 @@ class VersionedRedisView(View[DS, SE]):
                 statements.append(stmt)
         return self.store.assemble(statements)
 
+    def get_entity(self, id: str) -> Optional[SE]:
+        return self._build_entity(self._get_statements(id))
+
     def get_inverted(self, id: str) -> Generator[Tuple[Property, SE], None, None]:
         keys: List[str] = []
         ident = Identifier.get(id)
@@ -324,16 +521,20 @@ class VersionedRedisView(View[DS, SE]):
         NOTE: The `external` flag of the view will be used to filter statements, too.
         """
         for ds, ver in self.vers:
-            for id in self.store.db.sscan_iter(b(f"ents:{ds}:{ver}")):
-                entity_id = id.decode("utf-8")
-                stmt_key = f"stmt:{ds}:{ver}:{entity_id}"
-                for stmt_text in self.store.db.smembers(b(stmt_key)):
-                    stmt = _unpack_statement(stmt_text, entity_id)
-                    if stmt.external and not self.external:
-                        continue
-                    if resolve:
-                        stmt = self.store.linker.apply_statement(stmt)
-                    yield stmt
+            scan = self.store.db.sscan_iter(b(f"ents:{ds}:{ver}"))
+            for ids in chunked(scan, self.BATCH_ENTITIES):
+                pipeline = self.store.db.pipeline(transaction=False)
+                for id in ids:
+                    pipeline.smembers(b"stmt:%s:%s:%s" % (b(ds), b(ver), id))
+                for id, values in zip(ids, pipeline.execute()):
+                    entity_id = id.decode("utf-8")
+                    for stmt_text in values:
+                        stmt = _unpack_statement(stmt_text, entity_id)
+                        if stmt.external and not self.external:
+                            continue
+                        if resolve:
+                            stmt = self.store.linker.apply_statement(stmt)
+                        yield stmt
 
     def entities(
         self, include_schemata: Optional[List[Schema]] = None
@@ -354,23 +555,39 @@ class VersionedRedisView(View[DS, SE]):
         # that are part of a cluster with more than one ID.
         try:
             seen: Set[str] = set()
-            for id in self.store.db.sscan_iter(scope_name):
-                entity_id = id.decode("utf-8")
-                ident = Identifier.get(entity_id)
-                connected = self.store.linker.connected(ident)
-                if len(connected) > 1:
-                    canonical_id = max(connected).id
-                    if canonical_id in seen:
-                        continue
-                    seen.add(canonical_id)
-                entity = self.get_entity(entity_id)
-                if entity is not None:
-                    if (
-                        include_schemata is not None
-                        and entity.schema not in include_schemata
-                    ):
-                        continue
-                    yield entity
+            scan = self.store.db.sscan_iter(scope_name)
+            for ids in chunked(scan, self.BATCH_ENTITIES):
+                # Fetch the statements for a chunk of entities in one round
+                # trip, then assemble them in scan order:
+                entity_ids: List[str] = []
+                pipeline = self.store.db.pipeline(transaction=False)
+                for id in ids:
+                    entity_id = id.decode("utf-8")
+                    ident = Identifier.get(entity_id)
+                    connected = self.store.linker.connected(ident)
+                    if len(connected) > 1:
+                        canonical_id = max(connected).id
+                        if canonical_id in seen:
+                            continue
+                        seen.add(canonical_id)
+                    keys = self._get_stmt_keys(entity_id)
+                    if len(keys) == 1:
+                        pipeline.smembers(keys[0])
+                    else:
+                        pipeline.sunion(keys)
+                    entity_ids.append(entity_id)
+                if len(entity_ids) == 0:
+                    continue
+                for entity_id, values in zip(entity_ids, pipeline.execute()):
+                    stmts = (_unpack_statement(bv(v), entity_id) for v in values)
+                    entity = self._build_entity(stmts)
+                    if entity is not None:
+                        if (
+                            include_schemata is not None
+                            and entity.schema not in include_schemata
+                        ):
+                            continue
+                        yield entity
         finally:
             if len(self.vers) > 1:
                 self.store.db.delete(scope_name)
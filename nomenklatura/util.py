@@ -2,7 +2,7 @@ import re
 import os
 from pathlib import Path
 from collections.abc import Mapping
-from typing import Iterable, TypeVar, List, Union, Optional
+from typing import Generator, Iterable, TypeVar, List, Union, Optional
 
 T = TypeVar("T")
 DATA_PATH = Path(os.path.join(os.path.dirname(__file__), "data")).resolve()
@@ -15,3 +15,15 @@ def unroll(values: Iterable[Iterable[T]]) -> List[T]:
     for sub in values:
         unrolled.extend(sub)
     return unrolled
+
+
+def chunked(values: Iterable[T], size: int) -> Generator[List[T], None, None]:
+    """Split an iterable into lists of at most `size` items."""
+    chunk: List[T] = []
+    for value in values:
+        chunk.append(value)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if len(chunk):
+        yield chunk
@@ -1,9 +1,9 @@
 import json
 import time
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 from functools import lru_cache
-from typing import Any, List, Optional, Set
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, List, Optional, Set, Tuple
 from requests import Session
 from normality import squash_spaces
 from rigour.time import utc_now
@@ -14,9 +14,12 @@ from followthemoney import StatementEntity, registry
 from nomenklatura.cache import Cache
 from nomenklatura.wikidata.util import make_session
 from nomenklatura.wikidata.lang import LangText
-from nomenklatura.wikidata.model import Item
+from nomenklatura.wikidata.model import Item, TypeParents, ends_before
 from nomenklatura.wikidata.query import SparqlResponse
 
+if TYPE_CHECKING:
+    from nomenklatura.wikidata.dump import WikidataDump
+
 log = logging.getLogger(__name__)
 
 
@@ -26,7 +29,8 @@ class WikidataClient(object):
     Responses are cached in a SQL-backed `Cache` so that crawlers and enrichers
     can re-run without fetching the same data again, and requests carry a
     descriptive user agent and retry handling to stay within Wikidata's API
-    etiquette."""
+    etiquette. Given a `WikidataDump`, items and labels imported from the
+    Wikidata JSON dump are read locally before the API is called."""
 
     WD_API = "https://www.wikidata.org/w/api.php"
     QUERY_API = "https://query.wikidata.org/sparql"
@@ -42,14 +46,23 @@ class WikidataClient(object):
     LABEL_PREFIX = "wd:lb:"
     LABEL_CACHE_DAYS = 100
 
+    TYPES_PREFIX = "wd:ty:"
+    TYPES_CACHE_DAYS = 100
+    # How many levels of `instance of`/`subclass of` are expanded above an item:
+    TYPES_DEPTH = 6
+
     def __init__(
         self,
         cache: Cache,
         session: Optional[Session] = None,
         cache_days: int = 14,
         reference_time: Optional[datetime] = None,
+        dump: Optional["WikidataDump"] = None,
     ) -> None:
         self.cache = cache
+        # Items imported from the Wikidata JSON dump are read from this local
+        # store before the API is called (see `nomenklatura.wikidata.dump`).
+        self.dump = dump
         # A bare session gets 403'd (default UA) and throttled by Wikidata, so
         # default to a configured session with a descriptive UA and retries.
         self.session = session or make_session()
@@ -61,6 +74,8 @@ class WikidataClient(object):
             reference_time if reference_time is not None else utc_now()
         )
         # self.cache.preload(f"{self.LABEL_PREFIX}%")
+        self._type_parents: Dict[str, TypeParents] = {}
+        self._types: Dict[Tuple[str, int, datetime], FrozenSet[str]] = {}
 
     @lru_cache(maxsize=MEMO_SMALL)
     def fetch_item(
@@ -76,6 +91,9 @@ class WikidataClient(object):
         # cache entries stored before that timestamp. This lets callers pin a
         # fixed `cache_days` while still refetching items known to have changed
         # upstream since the cached copy was written.
+        dumped = self._read_dump(qid, modified_at=modified_at)
+        if dumped is not None:
+            return Item(self, dumped)
         params = {
             "format": "json",
             "ids": qid,
@@ -128,6 +146,28 @@ class WikidataClient(object):
             )
         return item
 
+    def _read_dump(
+        self, qid: str, modified_at: Optional[datetime] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Read an item record from the local dump store, unless there is none
+        or it is older than `modified_at` (the dump is a snapshot, so callers
+        who know an item changed since then get it from the API instead)."""
+        if self.dump is None:
+            return None
+        data = self.dump.get(qid)
+        if data is None:
+            return None
+        if modified_at is not None and data.get("modified") is not None:
+            modified = datetime.fromisoformat(data["modified"])
+            if modified.tzinfo is not None:
+                modified = modified.astimezone(timezone.utc).replace(tzinfo=None)
+            if modified_at.tzinfo is not None:
+                modified_at = modified_at.astimezone(timezone.utc)
+                modified_at = modified_at.replace(tzinfo=None)
+            if modified < modified_at:
+                return None
+        return data
+
     def _fetch_entities(self, url: str) -> Optional[str]:
         """GET a wbgetentities URL, retrying the transient errors Wikidata hides
         in HTTP 200 bodies (DB lag, rate limits, internal errors).
@@ -164,6 +204,9 @@ class WikidataClient(object):
 
     @lru_cache(maxsize=100000)
     def get_label(self, qid: str) -> LangText:
+        dumped = self._read_dump(qid)
+        if dumped is not None:
+            return self._pick_label(qid, dumped)
         cache_key = f"{self.LABEL_PREFIX}{qid}"
         cached = self.cache.get_json(cache_key, max_age=self.LABEL_CACHE_DAYS)
         if cached is not None:
@@ -186,14 +229,81 @@ class WikidataClient(object):
         entity = entities.get(qid)
         if entity is None or "missing" in entity:
             return LangText(None)
+        label = self._pick_label(qid, entity)
+        self.cache.set_json(cache_key, label.pack())
+        return label
+
+    def _pick_label(self, qid: str, entity: Dict[str, Any]) -> LangText:
         labels = LangText.from_dict(entity.get("labels", {}))
         label = LangText.pick(labels)
         if label is None:
             label = LangText(qid)
         label.original = qid
-        self.cache.set_json(cache_key, label.pack())
         return label
 
+    def get_types(
+        self, qid: str, depth: Optional[int] = None, item: Optional[Item] = None
+    ) -> FrozenSet[str]:
+        """Get the QID and all the `instance of` and `subclass of` types above
+        it, up to `depth` levels (default: `TYPES_DEPTH`).
+
+        The closure of an item is built bottom-up from the closures of its
+        parent types, which are shared by many items (e.g. "public office").
+        The parent types of each ancestor are kept in memory and in the cache
+        for `TYPES_CACHE_DAYS`, together with the end dates of their claims,
+        and the closures of ancestors are kept in memory. So a type check on a
+        warm client is a lookup per parent type. Pass `item` if it has already
+        been fetched.
+
+        Types from claims which ended before the client's `reference_time` are
+        left out (see `Item.parent_types`). The end dates are checked when the
+        closure is built, so cached parent types hold for any reference time."""
+        depth = self.TYPES_DEPTH if depth is None else depth
+        if depth < 1:
+            return frozenset([qid])
+        # Only the types of ancestors are stored: the items whose types are
+        # checked (e.g. millions of persons) are a union of those.
+        stored = depth < self.TYPES_DEPTH
+        key = (qid, depth, self.reference_time)
+        if stored:
+            types = self._types.get(key)
+            if types is not None:
+                return types
+        collected = set([qid])
+        for parent, ends in self._get_type_parents(qid, item=item, stored=stored):
+            if not ends_before(ends, self.reference_time):
+                collected.update(self.get_types(parent, depth=depth - 1))
+        types = frozenset(collected)
+        if stored:
+            self._types[key] = types
+        return types
+
+    def _get_type_parents(
+        self, qid: str, item: Optional[Item] = None, stored: bool = True
+    ) -> TypeParents:
+        cache_key = f"{self.TYPES_PREFIX}{qid}"
+        if stored:
+            parents = self._type_parents.get(qid)
+            if parents is not None:
+                return parents
+            cached = self.cache.get_json(cache_key, max_age=self.TYPES_CACHE_DAYS)
+            if cached is not None:
+                parents = [(parent, ends) for parent, ends in cached]
+                self._type_parents[qid] = parents
+                return parents
+        if item is None:
+            item = self.fetch_item(qid)
+        if item is None:
+            # A deleted P31/P279 ancestor shouldn't break type expansion:
+            log.warning("Missing type ancestor item: %s", qid)
+            self._type_parents[qid] = []
+            return []
+        parents = item.type_parents
+        if stored:
+            self._type_parents[qid] = parents
+            self.cache.set_json(cache_key, parents)
+        return parents
+
     def query(
         self, query_text: str, cache_days: Optional[int] = None
     ) -> SparqlResponse:
@@ -0,0 +1,228 @@
+import bz2
+import gzip
+import logging
+import orjson
+import plyvel  # type: ignore
+from io import BufferedIOBase
+from pathlib import Path
+from functools import cache
+from urllib.parse import quote
+from typing import Any, Dict, Generator, Iterable, List, Optional, Set
+
+from nomenklatura import settings
+from nomenklatura.wikidata.lang import MULTI_LANG, LangText
+
+log = logging.getLogger(__name__)
+E = "utf-8"
+
+# Items which are an instance of one of these types are imported from the dump.
+# Class items (anything with a `subclass of` claim) and properties are always
+# imported, so that `Item.types` and property labels resolve locally.
+DUMP_TYPES = frozenset(
+    [
+        "Q5",  # human
+        "Q4164871",  # position
+        "Q294414",  # public office
+        "Q6256",  # country
+        "Q3624078",  # sovereign state
+        "Q3024240",  # historical country
+        "Q7275",  # state
+    ]
+)
+# Reference snaks kept in the item records (reference URL):
+REFERENCE_PROPS = ("P854",)
+# Wikimedia projects which use the `*wiki` site code but aren't a Wikipedia:
+NON_WIKIPEDIA_SITES = (
+    "commonswiki",
+    "specieswiki",
+    "metawiki",
+    "mediawikiwiki",
+    "wikidatawiki",
+    "sourceswiki",
+    "incubatorwiki",
+    "outreachwiki",
+    "wikimaniawiki",
+    "wikifunctionswiki",
+)
+
+
+def _open_dump(path: Path) -> BufferedIOBase:
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    if path.suffix == ".bz2":
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def _type_qids(data: Dict[str, Any], prop: str) -> Set[str]:
+    qids: Set[str] = set()
+    for claim in data.get("claims", {}).get(prop, []):
+        if claim.get("rank") == "deprecated":
+            continue
+        value = claim.get("mainsnak", {}).get("datavalue", {}).get("value")
+        if isinstance(value, dict) and "id" in value:
+            qids.add(value["id"])
+    return qids
+
+
+def read_dump(
+    path: Path, types: Iterable[str] = DUMP_TYPES
+) -> Generator[Dict[str, Any], None, None]:
+    """Stream the entities of a Wikidata JSON dump (`latest-all.json.gz`) which
+    are properties, classes or an instance of one of `types`.
+
+    The dump is a JSON array with one entity per line, so it is read line by
+    line. Lines which can't contain any of the wanted claims are skipped with a
+    substring test before they are parsed."""
+    types = frozenset(types)
+    markers = [f'"{qid}"'.encode(E) for qid in types]
+    markers.append(b'"P279"')
+    with _open_dump(path) as fh:
+        for line in fh:
+            line = line.strip().rstrip(b",")
+            if len(line) < 3:
+                # The opening and closing brackets of the array:
+                continue
+            # The entity type comes first, before any "property" snak key:
+            is_property = b'"property"' in line[:32]
+            if not is_property and not any(m in line for m in markers):
+                continue
+            data: Dict[str, Any] = orjson.loads(line)
+            if is_property or data.get("type") == "property":
+                yield data
+            elif len(_type_qids(data, "P279")):
+                yield data
+            elif not _type_qids(data, "P31").isdisjoint(types):
+                yield data
+
+
+@cache
+def _keep_lang(lang: str) -> bool:
+    return LangText("x", lang).text is not None or lang == MULTI_LANG
+
+
+def _compact_texts(texts: Dict[str, Any]) -> Dict[str, Any]:
+    return {lang: value for lang, value in texts.items() if _keep_lang(lang)}
+
+
+def _compact_snak(snak: Dict[str, Any]) -> Dict[str, Any]:
+    snak.pop("hash", None)
+    return snak
+
+
+def _compact_claim(claim: Dict[str, Any]) -> Dict[str, Any]:
+    compact: Dict[str, Any] = {
+        "id": claim["id"],
+        "rank": claim["rank"],
+        "mainsnak": _compact_snak(claim["mainsnak"]),
+    }
+    qualifiers = claim.get("qualifiers", {})
+    if len(qualifiers):
+        compact["qualifiers"] = {
+            prop: [_compact_snak(s) for s in snaks]
+            for prop, snaks in qualifiers.items()
+        }
+    references: List[Dict[str, Any]] = []
+    for ref in claim.get("references", []):
+        snaks = ref.get("snaks", {})
+        kept = {
+            p: [_compact_snak(s) for s in snaks[p]]
+            for p in REFERENCE_PROPS
+            if p in snaks
+        }
+        if len(kept):
+            references.append({"snaks": kept})
+    if len(references):
+        compact["references"] = references
+    return compact
+
+
+def _sitelink_url(site: str, title: str) -> Optional[str]:
+    if not site.endswith("wiki") or site in NON_WIKIPEDIA_SITES:
+        return None
+    host = site[:-4].replace("_", "-")
+    return f"https://{host}.wikipedia.org/wiki/{quote(title.replace(' ', '_'))}"
+
+
+def compact_item(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a dump entity to the parts read by `Item`: labels and aliases in
+    languages `LangText` accepts, the picked description, all claims with their
+    qualifiers but only the reference URLs, and the sitelinks. Dumps don't have
+    sitelink URLs like the API does, so they're added for Wikipedia links."""
+    item: Dict[str, Any] = {"id": data["id"], "modified": data.get("modified")}
+    item["labels"] = _compact_texts(data.get("labels", {}))
+    item["aliases"] = _compact_texts(data.get("aliases", {}))
+    descriptions: Dict[LangText, str] = {}
+    for lang, value in data.get("descriptions", {}).items():
+        text = LangText(value["value"], value["language"])
+        if text.text is not None:
+            descriptions[text] = lang
+    description = LangText.pick(descriptions.keys())
+    if description is not None:
+        lang = descriptions[description]
+        item["descriptions"] = {lang: data["descriptions"][lang]}
+    claims: Dict[str, Any] = {}
+    for prop, values in data.get("claims", {}).items():
+        claims[prop] = [_compact_claim(c) for c in values]
+    item["claims"] = claims
+    sitelinks: Dict[str, Any] = {}
+    for site, link in data.get("sitelinks", {}).items():
+        url = _sitelink_url(site, link["title"])
+        if url is not None and "url" not in link:
+            link["url"] = url
+        sitelinks[site] = link
+    item["sitelinks"] = sitelinks
+    return item
+
+
+class WikidataDump(object):
+    """A local LevelDB store of compact Wikidata item records, imported from
+    the JSON dump. `WikidataClient` reads items and labels from it before it
+    calls the API, which makes reconciling large person lists feasible without
+    fetching millions of items one at a time."""
+
+    PREFIX = b"i:"
+    BATCH_ITEMS = 10_000
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.buffer_size = settings.LEVELDB_BUFFER * 1024 * 1024
+        self.db = plyvel.DB(
+            path.as_posix(),
+            create_if_missing=True,
+            max_open_files=settings.LEVELDB_MAX_FILES,
+            write_buffer_size=self.buffer_size,
+            lru_cache_size=self.buffer_size,
+        )
+
+    def load(self, path: Path, types: Iterable[str] = DUMP_TYPES) -> int:
+        """Import the wanted entities of a Wikidata JSON dump file, replacing
+        any earlier record of the same item. Returns the number of items."""
+        count = 0
+        batch = self.db.write_batch()
+        for data in read_dump(path, types=types):
+            item = compact_item(data)
+            batch.put(self.PREFIX + item["id"].encode(E), orjson.dumps(item))
+            count += 1
+            if count % self.BATCH_ITEMS == 0:
+                batch.write()
+                batch = self.db.write_batch()
+                log.info("Imported %d items from dump: %s", count, path)
+        batch.write()
+        self.db.compact_range()
+        log.info("Imported %d items from dump: %s", count, path)
+        return count
+
+    def get(self, qid: str) -> Optional[Dict[str, Any]]:
+        """Get the raw item record for a QID (or property ID), if imported."""
+        raw = self.db.get(self.PREFIX + qid.encode(E))
+        if raw is None:
+            return None
+        data: Dict[str, Any] = orjson.loads(raw)
+        return data
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __repr__(self) -> str:
+        return f"<WikidataDump({self.path.as_posix()!r})>"
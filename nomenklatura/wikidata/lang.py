@@ -1,4 +1,5 @@
 import logging
+from functools import cache
 from rigour.langs import PREFERRED_LANGS
 from typing import Callable, Dict, Iterable, List, Optional, Any, Set
 from followthemoney import registry, StatementEntity
@@ -79,6 +80,23 @@ class LangText(object):
             return lt
         return None
 
+    @classmethod
+    def pick_dict(cls, data: Dict[str, Any]) -> Optional["LangText"]:
+        """Pick a text from a Wikidata language map (like `pick` on the result
+        of `from_dict`), only parsing the values until one is usable."""
+        objs: List[Dict[str, str]] = []
+        for values in data.values():
+            objs.extend(values if isinstance(values, list) else [values])
+        objs.sort(key=lambda obj: _lang_rank(obj["language"]))
+        for obj in objs:
+            value = obj["value"]
+            if value is None:
+                continue
+            lt = LangText(value, obj["language"], original=value)
+            if lt.text is not None:
+                return lt
+        return None
+
     @classmethod
     def sorted(cls, texts: Iterable["LangText"]) -> List["LangText"]:
         def sort_key(lt: LangText) -> Any:
@@ -120,3 +138,13 @@ class LangText(object):
 
     def __repr__(self) -> str:
         return f"<LangText({self.text!r}, {self.lang!r}, {self.original!r})>"
+
+
+@cache
+def _lang_rank(lang: str) -> int:
+    """The position of a Wikidata language code in the preferred languages."""
+    if lang != MULTI_LANG:
+        lang = registry.language.clean_text(lang) or lang
+    if lang in PREFERRED_WD_LANGS:
+        return PREFERRED_WD_LANGS.index(lang)
+    return len(PREFERRED_WD_LANGS)
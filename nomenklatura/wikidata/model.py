@@ -1,9 +1,10 @@
 import logging
 from datetime import datetime
-from functools import lru_cache
+from functools import cached_property
 
 from normality import stringify
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
+from typing import TYPE_CHECKING, Any, Container, Dict, Generator, Iterable, List
+from typing import Optional, Set, Tuple
 from rigour.dates import ended_before
 from rigour.langs import iso_639_alpha3
 
@@ -14,6 +15,22 @@ if TYPE_CHECKING:
     from nomenklatura.wikidata.client import WikidataClient
 
 log = logging.getLogger(__name__)
+# The `instance of`/`subclass of` types of an item, each with its end dates:
+TypeParents = List[Tuple[str, List[Optional[str]]]]
+
+
+def ends_before(ends: Iterable[Optional[str]], reference_time: datetime) -> bool:
+    """Whether any of the end dates of a claim (see `Claim.end_dates`) is
+    before `reference_time`. An end at an unknown date (`None`) always is."""
+    for end in ends:
+        if end is None:
+            return True
+        try:
+            if ended_before(end, reference_time):
+                return True
+        except ValueError:
+            return True
+    return False
 
 
 class Snak(object):
@@ -79,32 +96,30 @@ class Claim(Snak):
     def get_qualifier(self, prop: str) -> List[Snak]:
         return self.qualifiers.get(prop, [])
 
+    @property
+    def end_dates(self) -> List[Optional[str]]:
+        """The end times (P582) of the claim's validity period. An end at an
+        unknown date, or one which didn't convert, is `None`. A "no value" end
+        time is Wikidata's way of asserting a claim is current, and left out."""
+        ends: List[Optional[str]] = []
+        for snak in self.qualifiers.get("P582", []):
+            if snak.snaktype == "novalue":
+                continue
+            if snak.snaktype == "somevalue":
+                ends.append(None)
+                continue
+            ends.append(snak.text.text)
+        return ends
+
     def is_ended(self, reference_time: Optional[datetime] = None) -> bool:
         """Whether the claim's validity period (P582) ended before
         `reference_time`, defaulting to the client's run reference time.
 
-        A "no value" end time is Wikidata's way of asserting a claim is
-        current, and an imprecise end date only counts once its whole span
-        has elapsed — so a year-precision end in the current year is not
-        yet ended."""
+        An imprecise end date only counts once its whole span has elapsed —
+        so a year-precision end in the current year is not yet ended."""
         if reference_time is None:
             reference_time = self.client.reference_time
-        for snak in self.qualifiers.get("P582", []):
-            if snak.snaktype == "novalue":
-                continue
-            if snak.snaktype == "somevalue":
-                # Ended at an unknown date:
-                return True
-            text = snak.text.text
-            if text is None:
-                # An end is asserted, but the date didn't convert:
-                return True
-            try:
-                if ended_before(text, reference_time):
-                    return True
-            except ValueError:
-                return True
-        return False
+        return ends_before(self.end_dates, reference_time)
 
     def __repr__(self) -> str:
         return f"<Claim({self.qid}, {self.property}, {self.value_type})>"
@@ -137,29 +152,24 @@ class SiteLink(object):
 
 
 class Item(object):
-    """A wikidata item (or entity)."""
+    """A wikidata item (or entity).
+
+    The item keeps the raw labels, claims and sitelinks of the API response
+    and only parses them when they are first read: claims are parsed one
+    property at a time (see `get_claims`), and `label` and `description`
+    pick a preferred language without parsing the others."""
 
     def __init__(self, client: "WikidataClient", data: Dict[str, Any]) -> None:
         self.client = client
         self.id: str = data.pop("id")
         self.modified: Optional[str] = data.pop("modified", None)
 
-        self.labels: Set[LangText] = LangText.from_dict(data.pop("labels", {}))
-        self.aliases: Set[LangText] = LangText.from_dict(data.pop("aliases", {}))
-
-        descriptions = LangText.from_dict(data.pop("descriptions", {}))
-        self.description = LangText.pick(descriptions)
-
-        self.claims: List[Claim] = []
-        self.deprecated: List[Claim] = []
-        claims: Dict[str, List[Dict[str, Any]]] = data.pop("claims", {})
-        for prop, values in claims.items():
-            for value in values:
-                claim = Claim(client, value, prop)
-                if claim.deprecated:
-                    self.deprecated.append(claim)
-                else:
-                    self.claims.append(claim)
+        self._labels: Dict[str, Any] = data.pop("labels", {})
+        self._aliases: Dict[str, Any] = data.pop("aliases", {})
+        self._descriptions: Dict[str, Any] = data.pop("descriptions", {})
+        self._claims: Dict[str, List[Dict[str, Any]]] = data.pop("claims", {})
+        self._parsed: Dict[str, Tuple[List[Claim], List[Claim]]] = {}
+        self._sitelinks: Dict[str, Dict[str, Any]] = data.pop("sitelinks", {})
 
         # Merged pages handling:
         redirects = data.pop("redirects", {})
@@ -167,16 +177,75 @@ class Item(object):
         if self.redirect_id is not None:
             self.id = self.redirect_id
 
-        self.sitelinks: List[SiteLink] = []
-        for data in data.pop("sitelinks", {}).values():
-            self.sitelinks.append(SiteLink(self.id, data))
+    @cached_property
+    def labels(self) -> Set[LangText]:
+        return LangText.from_dict(self._labels)
 
-    @property
+    @cached_property
+    def aliases(self) -> Set[LangText]:
+        return LangText.from_dict(self._aliases)
+
+    @cached_property
+    def description(self) -> Optional[LangText]:
+        return LangText.pick_dict(self._descriptions)
+
+    @cached_property
     def label(self) -> Optional[LangText]:
-        label = LangText.pick(self.labels)
+        label = LangText.pick_dict(self._labels)
         if label is not None:
             return label
-        return LangText.pick(self.aliases)
+        return LangText.pick_dict(self._aliases)
+
+    @property
+    def properties(self) -> List[str]:
+        """The IDs of the properties the item has claims for."""
+        return list(self._claims.keys())
+
+    def _parse_claims(self, prop: str) -> Tuple[List[Claim], List[Claim]]:
+        parsed = self._parsed.get(prop)
+        if parsed is None:
+            claims: List[Claim] = []
+            deprecated: List[Claim] = []
+            for value in self._claims.get(prop, []):
+                claim = Claim(self.client, value, prop)
+                if claim.deprecated:
+                    deprecated.append(claim)
+                else:
+                    claims.append(claim)
+            parsed = (claims, deprecated)
+            self._parsed[prop] = parsed
+        return parsed
+
+    def get_claims(self, prop: str) -> List[Claim]:
+        """Get the claims of the item for one property, except deprecated ones."""
+        return self._parse_claims(prop)[0]
+
+    def filter_claims(self, props: Container[str]) -> Generator[Claim, None, None]:
+        """Iterate over the claims of the given properties, in item order,
+        except deprecated ones. Only these properties are parsed."""
+        for prop in self._claims.keys():
+            if prop in props:
+                yield from self._parse_claims(prop)[0]
+
+    @property
+    def claims(self) -> List[Claim]:
+        """All claims of the item, except deprecated ones."""
+        claims: List[Claim] = []
+        for prop in self._claims.keys():
+            claims.extend(self._parse_claims(prop)[0])
+        return claims
+
+    @property
+    def deprecated(self) -> List[Claim]:
+        """All claims of the item which are ranked as deprecated."""
+        claims: List[Claim] = []
+        for prop in self._claims.keys():
+            claims.extend(self._parse_claims(prop)[1])
+        return claims
+
+    @cached_property
+    def sitelinks(self) -> List[SiteLink]:
+        return [SiteLink(self.id, data) for data in self._sitelinks.values()]
 
     @property
     def sorted_labels(self) -> List[LangText]:
@@ -193,46 +262,38 @@ class Item(object):
         return [s for s in wikilinks if s.site != "commonswiki"]
 
     def is_instance(self, qid: str) -> bool:
-        for claim in self.claims:
-            if claim.property == "P31" and claim.qid == qid:
+        for claim in self.get_claims("P31"):
+            if claim.qid == qid:
                 return True
         return False
 
-    def _types(self, path: List[str]) -> Set[str]:
-        qid = path[-1]
-        types = set([qid])
-        if len(path) > 6:
-            return types
-
-        item = self if qid == self.id else self.client.fetch_item(qid)
-        if item is None:
-            # A deleted P31/P279 ancestor shouldn't break type expansion:
-            log.warning("Missing type ancestor item: %s (path: %r)", qid, path)
-            return types
-        for type_ in _type_props(item):
-            if type_ not in path:
-                types.update(self._types(path + [type_]))
-        return types
+    @property
+    def type_parents(self) -> TypeParents:
+        """The `instance of` and `subclass of` types of the item, each with the
+        end dates of its claim (see `Claim.end_dates`). Unlike `parent_types`,
+        these don't depend on the client's reference time."""
+        parents: TypeParents = []
+        for claim in self.filter_claims(("P31", "P279")):
+            if claim.qid is None:
+                continue
+            # historical countries are always historical:
+            ends = [] if claim.qid == "Q3024240" else claim.end_dates
+            parents.append((claim.qid, ends))
+        return parents
+
+    @property
+    def parent_types(self) -> List[str]:
+        """The current `instance of` and `subclass of` types of the item."""
+        time = self.client.reference_time
+        return [qid for qid, ends in self.type_parents if not ends_before(ends, time)]
 
     @property
     def types(self) -> Set[str]:
         """Get all the `instance of` and `subclass of` types for an item."""
-        return self._types([self.id])
+        return set(self.client.get_types(self.id, item=self))
 
     def __repr__(self) -> str:
         return f"<Item({self.id})>"
 
     def __hash__(self) -> int:
         return hash(self.id)
-
-
-def _type_props(item: Item) -> List[str]:
-    types: List[str] = []
-    for claim in item.claims:
-        # historical countries are always historical:
-        ended = claim.is_ended() and claim.qid != "Q3024240"
-        if ended or claim.qid is None:
-            continue
-        if claim.property in ("P31", "P279"):
-            types.append(claim.qid)
-    return types
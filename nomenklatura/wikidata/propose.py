@@ -58,7 +58,7 @@ class _Known:
 
 def _known_from_item(item: Item) -> _Known:
     known = _Known()
-    for claim in item.claims:
+    for claim in item.filter_claims(("P31", "P569", "P21", "P27", "P39")):
         if claim.property == "P31" and claim.qid == "Q5":
             known.is_human = True
         elif claim.property == "P569":
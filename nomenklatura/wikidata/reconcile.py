@@ -49,6 +49,9 @@ def candidate_proxy(dataset: Dataset, item: Item) -> Optional[StatementEntity]:
     """
     if item.modified is None:
         return None
+    if not item.is_instance("Q5"):
+        log.debug("Item is not a human [%s]: %s", item.id, item.label)
+        return None
     proxy = StatementEntity.from_data(dataset, {"schema": "Person", "id": item.id})
     proxy.add("wikidataId", item.id)
     names: Set[str] = set()
@@ -74,12 +77,8 @@ def candidate_proxy(dataset: Dataset, item: Item) -> Optional[StatementEntity]:
         else:
             alias.apply(proxy, "weakAlias", clean=clean_wikidata_name)
 
-    if not item.is_instance("Q5"):
-        log.debug("Item is not a human [%s]: %s", item.id, item.labels)
-        return None
-
     names_concat = " ".join(names)
-    for claim in item.claims:
+    for claim in item.filter_claims(PROPS_DIRECT):
         if claim.property is None:
             continue
         ftm_prop = PROPS_DIRECT.get(claim.property)
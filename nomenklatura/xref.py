@@ -59,22 +59,23 @@ def xref(
     if config is None:
         config = ScoringConfig.defaults()
     view = store.default_view(external=external)
-    index = Index(view, index_dir, options=blocker_options or {})
+    resolver.load_into_memory()
+    # Release the load transaction before the index build and in-memory scan.
+    session.checkpoint()
+    index = Index(view, index_dir, options=blocker_options or {}, linker=resolver)
     index.build()
     max_pairs = limit * limit_factor
     # Patience is measured over scored pairs, not raw blocker ranks: pairs
-    # skipped as already-decided are nearly free to pass over, and in mature
-    # scopes hundreds of thousands of them can sit at the top of the ranking.
+    # skipped as already-decided are nearly free to pass over. The blocker
+    # already leaves out the pairs decided before this run, but pairs can
+    # become decided by the merges made during it.
     last_suggested = 0
 
     try:
         scores: List[float] = []
         suggested = 0
         idx = 0
-        resolver.load_into_memory()
-        # Release the load transaction before the in-memory scan.
-        session.checkpoint()
-        pairs = index.pairs(max_pairs=max_pairs)
+        pairs = index.pairs(max_pairs=max_pairs, resolver=resolver)
         for idx, ((left_id_, right_id_), score) in enumerate(pairs):
             if idx % 1000 == 0 and idx > 0:
                 _print_stats(idx, suggested, scores)
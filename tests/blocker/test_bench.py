@@ -0,0 +1,59 @@
+import json
+from pathlib import Path
+from click.testing import CliRunner
+
+from nomenklatura.cli import cli
+from nomenklatura.judgement import Judgement
+from nomenklatura.resolver import Edge
+from nomenklatura.blocker.bench import bench_blocker
+
+JOHANNA_QUANDT = "9add84cbb7bb48c7552f8ec7ae54de54eed1e361"
+FRAU_JOHANNA_QUANDT = "2d3e50433e36ebe16f3d906b684c9d5124c46d76"
+DAIMLER = "66ce9f62af8c7d329506da41cb7c36ba058b3d28"
+
+
+def write_dump(path: Path) -> Path:
+    edges = [
+        (JOHANNA_QUANDT, FRAU_JOHANNA_QUANDT, Judgement.POSITIVE),
+        (JOHANNA_QUANDT, DAIMLER, Judgement.NEGATIVE),
+        # Not in the entity file:
+        ("missing-a", "missing-b", Judgement.POSITIVE),
+    ]
+    with open(path, "w") as fh:
+        for left, right, judgement in edges:
+            created_at = "2024-01-01T00:00:00"
+            edge = Edge(left, right, judgement, user="test", created_at=created_at)
+            fh.write(edge.to_line())
+    return path
+
+
+def test_bench_blocker(donations_path: Path, tmp_path: Path):
+    dump = write_dump(tmp_path / "resolver.ijson")
+    result = bench_blocker(donations_path, dump, cutoffs=[100, 10, 100])
+    assert result["entities"] == 184
+    assert result["positive_edges"] == 1
+    assert [c["max_pairs"] for c in result["cutoffs"]] == [10, 100]
+    top = result["cutoffs"][-1]
+    assert top["pairs"] == 100
+    assert top["recall"] == 1.0
+    assert top["positive_pairs"] >= 1
+    assert top["positive_pairs"] + top["negative_pairs"] + top["unjudged_pairs"] == 100
+    assert result["ranks"]["found"] == 1
+    assert result["ranks"]["min"] == result["ranks"]["max"] <= 100
+    assert result["pair_cost"]["term_rows"] > 0
+    assert result["time"]["build"] > 0
+    assert result["memory"]["max_rss_bytes"] > 0
+
+
+def test_bench_blocker_cli(donations_path: Path, tmp_path: Path):
+    dump = write_dump(tmp_path / "resolver.ijson")
+    outpath = tmp_path / "bench.json"
+    runner = CliRunner()
+    args = ["bench-blocker", str(donations_path), str(dump), "-o", str(outpath)]
+    args.extend(["-m", "50", "-b", "max_bucket_size", "20"])
+    res = runner.invoke(cli, args)
+    assert res.exit_code == 0, res.output
+    with open(outpath, "r") as fh:
+        result = json.load(fh)
+    assert result["options"] == {"max_bucket_size": "20"}
+    assert [c["max_pairs"] for c in result["cutoffs"]] == [50]
@@ -4,7 +4,9 @@ from pathlib import Path
 from followthemoney import Dataset, StatementEntity
 
 from nomenklatura.blocker.index import DEFAULT_MAX_BUCKET_SIZE, Index
-from nomenklatura.blocker.tokenizer import tokenize_entity
+from nomenklatura.blocker.tokenizer import MINHASH_FIELD, MinHasher, tokenize_entity
+from nomenklatura.judgement import Judgement
+from nomenklatura.resolver import Resolver
 from nomenklatura.resolver.identifier import Identifier
 from nomenklatura.resolver.linker import Linker
 from nomenklatura.store import SimpleMemoryStore
@@ -44,6 +46,17 @@ def make_manual_index(
     return index
 
 
+def count_token_rows(index: Index, table: str, token: str) -> int:
+    """Count the rows of an integer-keyed term frequency table with a token."""
+    q = f"""
+        SELECT COUNT(*) FROM {table} AS tf
+        JOIN tokens AS t ON t.key = tf.token
+        WHERE t.token = ?
+    """
+    res = index.con.execute(q, [token]).fetchone()
+    return res[0] if res is not None else 0
+
+
 def run_matching(
     index: Index,
     matching_rows: list[tuple[str, str, str, str, int]],
@@ -127,6 +140,181 @@ def test_index_build(index_path: Path, dstore: SimpleMemoryStore):
     assert not index._has_table("entries_filtered")
 
 
+def test_minhash_tokens(test_dataset: Dataset):
+    def make(name: str) -> StatementEntity:
+        data = {"id": name, "schema": "Person", "properties": {"name": [name]}}
+        return StatementEntity.from_data(test_dataset, data)
+
+    def bands(entity: StatementEntity, minhash: MinHasher | None) -> set[str]:
+        tokens = tokenize_entity(entity, minhash=minhash)
+        return {token for field, token in tokens if field == MINHASH_FIELD}
+
+    minhash = MinHasher(16, rows=2)
+    putin = bands(make("Vladimir Putin"), minhash)
+    assert len(putin) == 16
+    assert putin == bands(make("Putin, Vladimir"), minhash)
+    assert putin == bands(make("Putin, Vladimir"), MinHasher(16, rows=2))
+    assert len(putin.intersection(bands(make("Wladimir Poutin"), minhash))) > 0
+    assert not putin.intersection(bands(make("Angela Merkel"), minhash))
+    assert not bands(make("Vladimir Putin"), None)
+    with pytest.raises(ValueError):
+        MinHasher(0)
+
+
+def test_index_minhash(index_path: Path, dstore: SimpleMemoryStore):
+    options = {"minhash_bands": 8}
+    index = Index(dstore.default_view(), index_path, options=options)
+    try:
+        index.build()
+        q = "SELECT count(*) FROM entries WHERE field = ?"
+        res = index.con.execute(q, [MINHASH_FIELD]).fetchone()
+        assert res is not None and res[0] > 0
+        boost = index.con.execute(
+            "SELECT boost FROM boosts WHERE field = ?", [MINHASH_FIELD]
+        ).fetchone()
+        assert boost == (Index.BOOSTS[MINHASH_FIELD],)
+        assert len(list(index.pairs(max_pairs=100))) == 100
+    finally:
+        index.close()
+
+
+def test_index_query(dindex: Index, test_dataset: Dataset):
+    entity = StatementEntity.from_data(test_dataset, VERBAND_BADEN_DATA)
+    matches = dindex.query(entity, limit=5)
+    assert dindex._has_table("postings")
+    assert 0 < len(matches) <= 5
+    assert matches[0][0].id == VERBAND_BADEN_ID, matches
+
+    # The same candidates and scores as in bulk matching:
+    dindex.max_candidates = 5
+    bulk = dict(dindex.match_entities([entity]))[Identifier.get("bla")]
+    assert [i.id for i, _ in matches] == [i.id for i, _ in bulk]
+    for (_, score), (_, expected) in zip(matches, bulk):
+        assert math.isclose(score, expected)
+
+    # An indexed entity isn't returned as its own candidate:
+    indexed = dindex.view.get_entity(VERBAND_BADEN_ID)
+    assert indexed is not None
+    assert VERBAND_BADEN_ID not in {i.id for i, _ in dindex.query(indexed)}
+
+    empty = StatementEntity.from_data(test_dataset, {"id": "x", "schema": "Person"})
+    assert dindex.query(empty) == []
+
+
+def test_index_linker_collapses_clusters(
+    index_path: Path, dstore: SimpleMemoryStore, dindex: Index
+):
+    (left, right), _ = next(iter(dindex.pairs(max_pairs=1)))
+    q = "SELECT count(*) FROM entries WHERE id IN (?, ?)"
+    res = dindex.con.execute(q, [left.id, right.id]).fetchone()
+    assert res is not None
+    separate_rows = res[0]
+    dindex.close()
+
+    linker = Linker[StatementEntity]({})
+    canonical = linker.add(left.id, right.id)
+    index = Index(dstore.default_view(), index_path, linker=linker)
+    try:
+        index.build()
+        assert index.entity_count("entries") == 183
+        q = "SELECT count(*), count(DISTINCT schema) FROM entries WHERE id = ?"
+        res = index.con.execute(q, [canonical]).fetchone()
+        assert res is not None
+        rows, schemata = res
+        assert 0 < rows < separate_rows
+        assert schemata == 1
+        (other,) = {left.id, right.id}.difference([canonical])
+        q = "SELECT count(*) FROM entries WHERE id = ?"
+        assert index.con.execute(q, [other]).fetchone() == (0,)
+        for (a, b), _ in index.pairs(max_pairs=100):
+            assert {a.id, b.id} != {left.id, right.id}
+
+        # Matching inputs are collapsed, too:
+        view = dstore.default_view()
+        records = [view.get_entity(left.id), view.get_entity(right.id)]
+        matches = list(index.match_entities(e for e in records if e is not None))
+        assert [subject.id for subject, _ in matches] == [canonical]
+        assert canonical not in {m.id for m, _ in matches[0][1]}
+
+        # A query for a member record doesn't return its own cluster:
+        for record in records:
+            assert record is not None
+            assert canonical not in {m.id for m, _ in index.query(record)}
+    finally:
+        index.close()
+
+
+def test_index_pairs_resolver(
+    index_path: Path,
+    dstore: SimpleMemoryStore,
+    dindex: Index,
+    resolver: Resolver[StatementEntity],
+):
+    pairs = [(left.id, right.id) for (left, right), _ in dindex.pairs(max_pairs=50)]
+    blocked = pairs[0]
+    merged = next(p for p in pairs if not set(p).intersection(blocked))
+    resolver.decide(blocked[0], blocked[1], Judgement.NEGATIVE)
+    canonical = resolver.decide(merged[0], merged[1], Judgement.POSITIVE)
+
+    # Without the resolver, the index still returns the member pairs:
+    unresolved = dindex.pairs(max_pairs=50)
+    assert [(left.id, right.id) for (left, right), _ in unresolved] == pairs
+
+    # The judgements can only be applied to an index keyed by cluster:
+    with pytest.raises(ValueError):
+        list(dindex.pairs(max_pairs=50, resolver=resolver))
+    dindex.close()
+
+    index = Index(dstore.default_view(), index_path, linker=resolver)
+    index.build()
+    resolved = [
+        (left.id, right.id)
+        for (left, right), _ in index.pairs(max_pairs=50, resolver=resolver)
+    ]
+    index.close()
+    assert len(resolved) == 50
+    assert blocked not in resolved
+    ids = {id for pair in resolved for id in pair}
+    assert not ids.intersection(merged)
+    assert canonical.id in ids
+    for left, right in resolved:
+        assert left > right
+        assert resolver.check_candidate(left, right)
+
+
+def test_index_pairs_partitioned(
+    index_path: Path, dstore: SimpleMemoryStore, dindex: Index, caplog
+):
+    pairs = list(dindex.pairs(max_pairs=200))
+    dindex.close()
+
+    index = Index(dstore.default_view(), index_path, options={"pair_partitions": 4})
+    try:
+        partitioned = list(index.pairs(max_pairs=200))
+        assert [p for p, _ in partitioned] == [p for p, _ in pairs]
+        for (_, score), (_, expected) in zip(partitioned, pairs):
+            assert math.isclose(score, expected)
+        done = index.con.execute("SELECT count(*) FROM pair_partitions").fetchone()
+        assert done == (4,)
+
+        # Partitions which were completed are reused by the next run:
+        index.con.execute("DELETE FROM pair_partitions WHERE partition = 2")
+        with caplog.at_level("INFO", logger="nomenklatura.blocker.index"):
+            rerun = list(index.pairs(max_pairs=200))
+        assert [p for p, _ in rerun] == [p for p, _ in partitioned]
+        assert "Reusing pair partition 1/4" in caplog.text
+        assert "Reusing pair partition 3/4" not in caplog.text
+
+        # Partitions of different terms are dropped:
+        index.con.execute("UPDATE term_frequencies_all SET weight = weight * 2")
+        caplog.clear()
+        with caplog.at_level("INFO", logger="nomenklatura.blocker.index"):
+            list(index.pairs(max_pairs=200))
+        assert "Reusing pair partition" not in caplog.text
+    finally:
+        index.close()
+
+
 def test_index_pairs(dstore: SimpleMemoryStore, dindex: Index):
     view = dstore.default_view()
     assert not dindex._has_table("stopwords")
@@ -339,12 +527,8 @@ def test_pairs_join_filtered_term_frequencies(
         assert pair == (Identifier.get("k2"), Identifier.get("k1"))
         # each side weighs 1.0 * idf, idf = 1 + ln(7 entities / df 2)
         assert score == pytest.approx(2 * (1 + math.log(7 / 2)))
-        assert index.con.execute(
-            "SELECT COUNT(*) FROM term_frequencies_all WHERE token = 'np:stopped'"
-        ).fetchone() == (5,)
-        assert index.con.execute(
-            "SELECT COUNT(*) FROM term_frequencies WHERE token = 'np:stopped'"
-        ).fetchone() == (0,)
+        assert count_token_rows(index, "term_frequencies_all", "np:stopped") == 5
+        assert count_token_rows(index, "term_frequencies", "np:stopped") == 0
     finally:
         index.close()
 
@@ -377,12 +561,8 @@ def test_matching_keeps_internal_stopword_when_cross_cost_is_safe(
         assert index.con.execute(
             "SELECT COUNT(*) FROM entries_filtered WHERE token = 'np:shared'"
         ).fetchone() == (0,)
-        assert index.con.execute(
-            "SELECT COUNT(*) FROM term_frequencies_all WHERE token = 'np:shared'"
-        ).fetchone() == (5,)
-        assert index.con.execute(
-            "SELECT COUNT(*) FROM term_frequencies WHERE token = 'np:shared'"
-        ).fetchone() == (0,)
+        assert count_token_rows(index, "term_frequencies_all", "np:shared") == 5
+        assert count_token_rows(index, "term_frequencies", "np:shared") == 0
 
         index.con.execute("""
             CREATE OR REPLACE TABLE matching
@@ -440,11 +620,8 @@ def test_matching_stopwords_respect_cross_pair_cost(
     )
     try:
         index._build_stopwords()
-        index.con.execute("""
-            CREATE OR REPLACE TABLE term_frequencies_all AS
-                SELECT schema, field, token, id, 1.0 AS weight
-                FROM entries
-        """)
+        index.con.execute("CREATE OR REPLACE TABLE boosts (field TEXT, boost FLOAT)")
+        index._build_frequencies()
         index.con.execute("""
             CREATE OR REPLACE TABLE matching
                 (schema TEXT, id TEXT, field TEXT, token TEXT, count INT)
@@ -508,11 +685,8 @@ def test_matching_stopwords_count_oriented_schema_pairs_once(
     )
     try:
         index._build_stopwords()
-        index.con.execute("""
-            CREATE OR REPLACE TABLE term_frequencies_all AS
-                SELECT schema, field, token, id, 1.0 AS weight
-                FROM entries
-        """)
+        index.con.execute("CREATE OR REPLACE TABLE boosts (field TEXT, boost FLOAT)")
+        index._build_frequencies()
         index.con.execute("""
             CREATE OR REPLACE TABLE matching
                 (schema TEXT, id TEXT, field TEXT, token TEXT, count INT)
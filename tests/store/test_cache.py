@@ -0,0 +1,132 @@
+from pathlib import Path
+from followthemoney import Dataset
+from followthemoney import StatementEntity as Entity
+
+from nomenklatura.judgement import Judgement
+from nomenklatura.resolver import Resolver
+from nomenklatura.store import CachedView, EntityCache, MemoryStore, SimpleMemoryStore
+from nomenklatura.store import SQLStore
+
+DAIMLER = "66ce9f62af8c7d329506da41cb7c36ba058b3d28"
+
+PERSON = {
+    "id": "john-doe",
+    "schema": "Person",
+    "properties": {"name": ["John Doe"], "birthDate": ["1976"]},
+}
+
+PERSON_EXT = {
+    "id": "john-doe-2",
+    "schema": "Person",
+    "properties": {"birthPlace": ["North Texas"]},
+}
+
+
+def test_cached_view(dstore: SimpleMemoryStore):
+    view = CachedView(dstore.default_view(), max_entries=100)
+    entity = view.get_entity(DAIMLER)
+    assert entity is not None
+    assert view.cache.misses == 1
+    again = view.get_entity(DAIMLER)
+    assert again is entity
+    assert view.cache.hits == 1
+    assert view.cache.hit_rate == 0.5
+    assert view.get_entity("banana") is None
+    assert view.has_entity(DAIMLER)
+
+    adjacent = list(view.get_adjacent(entity))
+    assert len(adjacent) == 10, len(adjacent)
+    assert len(list(view.entities())) == 474
+
+    with dstore.writer() as writer:
+        writer.pop(DAIMLER)
+    assert view.get_entity(DAIMLER) is None
+
+
+def test_cache_limits(dstore: SimpleMemoryStore):
+    view = CachedView(dstore.default_view(), max_entries=5)
+    for entity in dstore.default_view().entities():
+        assert entity.id is not None
+        view.get_entity(entity.id)
+    assert len(view.cache) == 5
+    assert view.cache.evictions == 474 - 5
+
+    cache: EntityCache[Entity] = EntityCache(max_entries=None, max_bytes=10_000)
+    for entity in dstore.default_view().entities():
+        assert entity.id is not None
+        cache.put(entity.id, entity)
+        assert cache.size <= 10_000 or len(cache) == 1
+    assert 1 <= len(cache) < 474
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.size == 0
+
+    # Membership checks don't count as hits or refresh an entry:
+    entities = list(dstore.default_view().entities())[:3]
+    cache = EntityCache(max_entries=2)
+    for entity in entities[:2]:
+        assert entity.id is not None
+        cache.put(entity.id, entity)
+    assert entities[0].id in cache
+    assert cache.hits == 0
+    assert entities[2].id is not None
+    cache.put(entities[2].id, entities[2])
+    assert entities[0].id not in cache
+    assert entities[1].id in cache
+
+
+def test_cache_update(test_dataset: Dataset, resolver: Resolver[Entity]):
+    store = MemoryStore(test_dataset, resolver)
+    with store.writer() as writer:
+        writer.add_entity(Entity.from_data(test_dataset, PERSON))
+        writer.add_entity(Entity.from_data(test_dataset, PERSON_EXT))
+    view = CachedView(store.default_view())
+    entity = view.get_entity("john-doe")
+    assert entity is not None
+    assert entity.get("birthPlace") == []
+
+    merged_id = resolver.decide(
+        "john-doe",
+        "john-doe-2",
+        judgement=Judgement.POSITIVE,
+        user="test",
+    )
+    store.update(merged_id)
+    assert len(view.cache) == 0
+    merged = view.get_entity(merged_id.id)
+    assert merged is not None
+    assert merged.get("birthPlace") == ["North Texas"]
+
+    # Members of the cluster share the cache entry of the canonical entity:
+    assert view.get_entity("john-doe") is merged
+    assert len(view.cache) == 1
+
+
+def test_cache_writes(
+    tmp_path: Path, test_dataset: Dataset, resolver: Resolver[Entity]
+):
+    uri = f"sqlite:///{tmp_path / 'test.db'}"
+    stores = [
+        MemoryStore(test_dataset, resolver),
+        SQLStore(dataset=test_dataset, linker=resolver, uri=uri),
+    ]
+    for store in stores:
+        with store.writer() as writer:
+            writer.add_entity(Entity.from_data(test_dataset, PERSON))
+        view = CachedView(store.default_view())
+        entity = view.get_entity("john-doe")
+        assert entity is not None
+        assert "john-doe" in view.cache
+
+        # Buffered writes are dropped from the cache again once flushed:
+        ext = Entity.from_data(test_dataset, {**PERSON_EXT, "id": "john-doe"})
+        writer = store.writer()
+        writer.add_entity(ext)
+        assert "john-doe" not in view.cache
+        view.get_entity("john-doe")
+        writer.flush()
+        entity = view.get_entity("john-doe")
+        assert entity is not None
+        assert entity.get("birthPlace") == ["North Texas"]
+        writer.close()
+        store.close()
@@ -0,0 +1,138 @@
+import orjson
+from pathlib import Path
+from followthemoney import model, Dataset, StatementEntity
+from pytest import MonkeyPatch
+
+from nomenklatura import settings
+from nomenklatura.resolver import Resolver
+from nomenklatura.judgement import Judgement
+from nomenklatura.store import MemoryStore, load_entity_file_store
+from nomenklatura.store.duckdb_ import DuckDBStore
+
+DAIMLER = "66ce9f62af8c7d329506da41cb7c36ba058b3d28"
+PERSON = {
+    "id": "john-doe",
+    "schema": "Person",
+    "properties": {"name": ["John Doe"], "birthDate": ["1976"]},
+}
+
+PERSON_EXT = {
+    "id": "john-doe-2",
+    "schema": "Person",
+    "properties": {"birthPlace": ["North Texas"]},
+}
+
+
+def test_duckdb_store_basics(
+    tmp_path: Path, test_dataset: Dataset, resolver: Resolver[StatementEntity]
+):
+    store = DuckDBStore(test_dataset, resolver, tmp_path / "store.duckdb")
+    entity = StatementEntity.from_data(test_dataset, PERSON)
+    entity_ext = StatementEntity.from_data(test_dataset, PERSON_EXT)
+    assert len(list(store.view(test_dataset).entities())) == 0
+    writer = store.writer()
+    writer.add_entity(entity)
+    writer.flush()
+    assert len(list(store.view(test_dataset).entities())) == 1
+    writer.add_entity(entity_ext)
+    writer.flush()
+    assert len(list(store.view(test_dataset).entities())) == 2
+
+    merged_id = resolver.decide(
+        "john-doe",
+        "john-doe-2",
+        judgement=Judgement.POSITIVE,
+        user="test",
+    )
+    store.update(merged_id.id)
+    entities = list(store.view(test_dataset).entities())
+    assert len(entities) == 1
+    assert entities[0].get("birthPlace") == ["North Texas"]
+    store.close()
+
+
+def test_duckdb_store_readd(
+    tmp_path: Path, test_dataset: Dataset, resolver: Resolver[StatementEntity]
+):
+    store = DuckDBStore(test_dataset, resolver, tmp_path / "store.duckdb")
+    entity = StatementEntity.from_data(test_dataset, PERSON)
+    stmt = next(s for s in entity.statements if s.prop == "name")
+    with store.writer() as writer:
+        writer.add_entity(entity)
+    with store.writer() as writer:
+        writer.add_statement(stmt.clone(last_seen="2025-01-01T00:00:00"))
+
+    # The canonical ID index is only built on the first lookup:
+    q = "SELECT count(*) FROM duckdb_indexes() WHERE table_name = 'statement'"
+    assert store.con.execute(q).fetchone() == (0,)
+    loaded = store.default_view().get_entity("john-doe")
+    assert store.con.execute(q).fetchone() == (1,)
+    assert loaded is not None
+    names = [s for s in loaded.statements if s.prop == "name"]
+    assert [s.last_seen for s in names] == ["2025-01-01T00:00:00"]
+    (scanned,) = list(store.default_view().entities())
+    assert len(list(scanned.statements)) == len(list(loaded.statements))
+    with store.writer() as writer:
+        popped = writer.pop("john-doe")
+    assert len([s for s in popped if s.prop == "name"]) == 1
+    store.close()
+
+
+def test_duckdb_graph_query(
+    tmp_path: Path,
+    donations_path: Path,
+    test_dataset: Dataset,
+    resolver: Resolver[StatementEntity],
+):
+    store = DuckDBStore(test_dataset, resolver, tmp_path / "store.duckdb")
+    with store.writer() as writer:
+        with open(donations_path, "rb") as fh:
+            while line := fh.readline():
+                data = orjson.loads(line)
+                proxy = StatementEntity.from_data(test_dataset, data)
+                writer.add_entity(proxy)
+    view = store.default_view()
+    assert len(list(view.entities())) == 474
+    schema = model.get("Address")
+    assert schema is not None, schema
+    assert len(list(view.entities(include_schemata=[schema]))) == 89
+
+    entity = view.get_entity(DAIMLER)
+    assert entity is not None, entity
+    assert len(list(view.get_adjacent(entity))) == 10
+
+    ext_entity = StatementEntity.from_data(test_dataset, PERSON)
+    with store.writer() as writer:
+        for stmt in ext_entity.statements:
+            writer.add_statement(stmt.clone(external=True))
+    assert not store.view(test_dataset).has_entity("john-doe")
+    assert store.view(test_dataset, external=True).has_entity("john-doe")
+    store.close()
+
+    # Re-open the database file:
+    store = DuckDBStore(test_dataset, resolver, tmp_path / "store.duckdb")
+    assert len(list(store.default_view().entities())) == 474
+    store.close()
+
+
+def test_load_entity_file_spill(
+    donations_path: Path, resolver: Resolver[StatementEntity], monkeypatch: MonkeyPatch
+):
+    store = load_entity_file_store(donations_path, resolver, spill=True)
+    assert isinstance(store, DuckDBStore)
+    temp_dir = store.temp_dir
+    assert temp_dir is not None and temp_dir.exists()
+    view = store.default_view()
+    assert len(list(view.entities())) == 474
+    entity = view.get_entity(DAIMLER)
+    assert entity is not None
+    assert len(list(view.get_adjacent(entity))) == 10
+    store.close()
+    assert not temp_dir.exists()
+
+    monkeypatch.setattr(settings, "LOAD_SPILL_SIZE", 0)
+    store = load_entity_file_store(donations_path, resolver)
+    assert isinstance(store, DuckDBStore)
+    store.close()
+    store = load_entity_file_store(donations_path, resolver, spill=False)
+    assert isinstance(store, MemoryStore)
@@ -1,9 +1,15 @@
-from followthemoney import model, Dataset
+import sys
+import orjson
+from pathlib import Path
+from concurrent.futures import Future
+from typing import Any, Callable, List, Set
+from followthemoney import model, Dataset, Statement
 from followthemoney import StatementEntity as Entity
 
-from nomenklatura.resolver import Resolver
+from nomenklatura.resolver import Linker, Resolver
 from nomenklatura.judgement import Judgement
-from nomenklatura.store import MemoryStore, SimpleMemoryStore
+from nomenklatura.store import MemoryStore, SimpleMemoryStore, load_entity_file_store
+from nomenklatura.store import _chunk_offsets, _load_parallel
 
 DAIMLER = "66ce9f62af8c7d329506da41cb7c36ba058b3d28"
 
@@ -87,3 +93,152 @@ def test_has_entity(dstore: SimpleMemoryStore, test_dataset: Dataset):
     writer.add_entity(entity_ext)
     writer.flush()
     assert view.has_entity("john-doe-2")
+
+
+def test_packed_statements(test_dataset: Dataset, resolver: Resolver[Entity]):
+    store = MemoryStore(test_dataset, resolver)
+    entity = Entity.from_data(test_dataset, PERSON)
+    stmts = list(entity.statements)
+    custom = stmts[0].clone(original_value="JOHN DOE")
+    custom.id = "custom-id"
+    with store.writer() as writer:
+        writer.add_entity(entity)
+        writer.add_statement(custom)
+
+    packed = store.stmts["john-doe"]
+    assert len(packed) == len(stmts) + 1
+    assert min(len(p) for p in packed.values()) == 2
+    assert packed["custom-id"][4] == "JOHN DOE"
+    # Generated statement IDs are kept as integers:
+    assert int(stmts[1].id, 16) in packed
+    assert len(store.headers) <= len(stmts)
+
+    loaded = store.default_view().get_entity("john-doe")
+    assert loaded is not None
+    ids = {s.id for s in loaded.statements if s.prop != "id"}
+    assert ids == {s.id for s in stmts if s.prop != "id"} | {"custom-id"}
+    with store.writer() as writer:
+        popped = writer.pop("john-doe")
+    by_id = {s.id: s for s in popped}
+    assert by_id["custom-id"].original_value == "JOHN DOE"
+    assert by_id[stmts[1].id].value == stmts[1].value
+    assert len(store.stmts) == 0
+
+
+def test_readd_statement(test_dataset: Dataset, resolver: Resolver[Entity]):
+    store = MemoryStore(test_dataset, resolver)
+    entity = Entity.from_data(test_dataset, PERSON)
+    stmt = list(entity.statements)[0]
+    with store.writer() as writer:
+        writer.add_statement(stmt)
+        later = stmt.clone(last_seen="2025-01-01T00:00:00")
+        assert later.id == stmt.id
+        writer.add_statement(later)
+
+    assert len(store.stmts["john-doe"]) == 1
+    loaded = store.default_view().get_entity("john-doe")
+    assert loaded is not None
+    assert [s.last_seen for s in loaded.statements if s.id == stmt.id] == [
+        "2025-01-01T00:00:00"
+    ]
+    with store.writer() as writer:
+        popped = writer.pop("john-doe")
+    assert len(popped) == 1
+
+
+def test_load_parallel(donations_path: Path, resolver: Resolver[Entity]):
+    store = load_entity_file_store(donations_path, resolver)
+    parallel = load_entity_file_store(
+        donations_path, resolver, workers=2, chunk_size=20_000
+    )
+    assert len(_chunk_offsets(donations_path, 20_000)) > 2
+    assert parallel.dataset.name == store.dataset.name
+    entities = {e.id: e for e in store.default_view().entities()}
+    loaded = list(parallel.default_view().entities())
+    assert len(loaded) == len(entities) == 474
+    for entity in loaded:
+        assert entity.id is not None
+        expected = entities[entity.id]
+        assert {s.id for s in entity.statements} == {s.id for s in expected.statements}
+
+
+class InlineExecutor(object):
+    """Runs submitted chunks synchronously, recording how many were submitted."""
+
+    submitted: List[int] = []
+
+    def __init__(self, max_workers: int) -> None:
+        InlineExecutor.submitted = []
+
+    def __enter__(self) -> "InlineExecutor":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> "Future[Any]":
+        future: "Future[Any]" = Future()
+        future.set_result(func(*args))
+        InlineExecutor.submitted.append(args[1])
+        return future
+
+
+def test_load_parallel_bounded(donations_path: Path, monkeypatch):
+    import nomenklatura.store as store_module
+
+    monkeypatch.setattr(store_module, "ProcessPoolExecutor", InlineExecutor)
+    dataset = Dataset.make({"name": "donations", "title": "Donations"})
+    offsets = _chunk_offsets(donations_path, 5_000)
+    assert len(offsets) > 10
+    chunks = _load_parallel(donations_path, dataset, True, 2, 5_000)
+    for idx, (stmts, _) in enumerate(chunks):
+        # Chunks come back in file order, with at most 2 * workers in flight:
+        assert len(stmts) > 0
+        assert InlineExecutor.submitted[idx] == offsets[idx][0]
+        assert len(InlineExecutor.submitted) - idx <= 4
+    assert len(InlineExecutor.submitted) == len(offsets)
+
+
+def _deep_size(obj: Any, seen: Set[int]) -> int:
+    # The size of an object and everything it refers to, counting shared
+    # objects once:
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += _deep_size(key, seen) + _deep_size(value, seen)
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(_deep_size(item, seen) for item in obj)
+    elif isinstance(obj, Statement):
+        for slot in Statement.__slots__:
+            size += _deep_size(getattr(obj, slot, None), seen)
+    return size
+
+
+def test_packed_memory(donations_path: Path, test_dataset: Dataset):
+    rows: List[bytes] = []
+    with open(donations_path, "rb") as fh:
+        for line in fh:
+            entity = Entity.from_data(test_dataset, orjson.loads(line))
+            for idx, stmt in enumerate(entity.statements):
+                data = stmt.to_dict()
+                data["first_seen"] = f"2024-01-{1 + idx % 28:02d}T00:00:00"
+                data["last_seen"] = "2024-06-01T00:00:00"
+                rows.append(orjson.dumps(data))
+
+    # Memory retained by the statements as objects, and by the store:
+    objects = [Statement.from_dict(orjson.loads(row)) for row in rows]
+    objects_size = _deep_size(objects, set())
+    store = MemoryStore(test_dataset, Linker[Entity]({}))
+    writer = store.writer()
+    for row in rows:
+        writer.add_statement(Statement.from_dict(orjson.loads(row)))
+    entity = store.default_view().get_entity(DAIMLER)
+    assert entity is not None
+    assert "Daimler" in entity.caption
+    seen: Set[int] = set()
+    store_size = _deep_size(store.stmts, seen)
+    store_size += _deep_size(store.entities, seen) + _deep_size(store.inverted, seen)
+    assert store_size * 2.5 < objects_size, (store_size, objects_size)
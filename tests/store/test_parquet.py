@@ -0,0 +1,119 @@
+import orjson
+from pathlib import Path
+from followthemoney import model, Dataset, StatementEntity
+
+from nomenklatura.resolver import Resolver
+from nomenklatura.judgement import Judgement
+from nomenklatura.store.parquet import ParquetStore
+
+DAIMLER = "66ce9f62af8c7d329506da41cb7c36ba058b3d28"
+PERSON = {
+    "id": "john-doe",
+    "schema": "Person",
+    "properties": {"name": ["John Doe"], "birthDate": ["1976"]},
+}
+
+PERSON_EXT = {
+    "id": "john-doe-2",
+    "schema": "Person",
+    "properties": {"birthPlace": ["North Texas"]},
+}
+
+
+def test_parquet_store_basics(
+    tmp_path: Path, test_dataset: Dataset, resolver: Resolver[StatementEntity]
+):
+    store = ParquetStore(test_dataset, resolver, tmp_path / "parquet")
+    entity = StatementEntity.from_data(test_dataset, PERSON)
+    entity_ext = StatementEntity.from_data(test_dataset, PERSON_EXT)
+    assert len(list(store.view(test_dataset).entities())) == 0
+    writer = store.writer()
+    writer.add_entity(entity)
+    writer.flush()
+    assert len(list(store.view(test_dataset).entities())) == 1
+    writer.add_entity(entity_ext)
+    writer.flush()
+    assert len(store.files) == 2
+    assert len(list(store.view(test_dataset).entities())) == 2
+
+    # A part missing from the sequence doesn't get the next part overwritten:
+    (tmp_path / "parquet" / "part-00000.parquet").unlink()
+    writer.add_entity(entity)
+    writer.flush()
+    names = [Path(f).name for f in store.files]
+    assert names == ["part-00001.parquet", "part-00002.parquet"]
+    assert len(list(store.view(test_dataset).entities())) == 2
+
+    merged_id = resolver.decide(
+        "john-doe",
+        "john-doe-2",
+        judgement=Judgement.POSITIVE,
+        user="test",
+    )
+    store.update(merged_id)
+    entities = list(store.view(test_dataset).entities())
+    assert len(entities) == 1
+    assert entities[0].id == merged_id.id
+    assert entities[0].get("birthPlace") == ["North Texas"]
+    merged = store.default_view().get_entity("john-doe")
+    assert merged is not None
+    assert merged.id == merged_id.id
+    store.close()
+
+
+def test_parquet_graph_query(
+    tmp_path: Path,
+    donations_path: Path,
+    test_dataset: Dataset,
+    resolver: Resolver[StatementEntity],
+):
+    store = ParquetStore(test_dataset, resolver, tmp_path / "parquet")
+    store.ROW_GROUP_SIZE = 500
+    with store.writer() as writer:
+        with open(donations_path, "rb") as fh:
+            while line := fh.readline():
+                data = orjson.loads(line)
+                proxy = StatementEntity.from_data(test_dataset, data)
+                writer.add_entity(proxy)
+    assert len(store.row_groups[store.files[0]][0]) > 1
+    tview = store.view(test_dataset)
+    assert len(list(tview.entities())) == 474
+
+    schema = model.get("Address")
+    assert schema is not None, schema
+    assert len(list(tview.entities(include_schemata=[schema]))) == 89
+
+    view = store.default_view()
+    assert view.get_entity("banana") is None
+    assert not view.has_entity("banana")
+    entity = view.get_entity(DAIMLER)
+    assert entity is not None, entity
+    assert view.has_entity(DAIMLER)
+    assert "Daimler" in entity.caption, entity.caption
+
+    adjacent = list(view.get_adjacent(entity))
+    assert len(adjacent) == 10, len(adjacent)
+    schemata = [e.schema for (_, e) in adjacent]
+    assert model.get("Payment") in schemata, set(schemata)
+    assert model.get("Address") in schemata, set(schemata)
+
+    # External
+    ext_entity = StatementEntity.from_data(test_dataset, PERSON)
+    with store.writer() as writer:
+        for stmt in ext_entity.statements:
+            writer.add_statement(stmt.clone(external=True))
+
+    view = store.view(test_dataset, external=False)
+    assert view.get_entity("john-doe") is None
+    assert not view.has_entity("john-doe")
+    ext_view = store.view(test_dataset, external=True)
+    entity = ext_view.get_entity("john-doe")
+    assert entity is not None, entity
+    assert len(list(entity.statements)) == len(list(ext_entity.statements))
+    assert len(list(ext_view.entities())) == 475
+
+    # Files written elsewhere are read without ingest:
+    other = ParquetStore(test_dataset, resolver, store.path)
+    assert len(list(other.default_view().entities())) == 474
+    store.close()
+    other.close()
@@ -5,17 +5,20 @@ Test if the different store implementations all behave the same.
 from pathlib import Path
 from typing import Any, Dict, List
 from unittest.mock import MagicMock
+import pytest
 from followthemoney import Dataset
 from followthemoney import StatementEntity as Entity
 from pytest import MonkeyPatch
-from sqlalchemy import create_mock_engine
+from sqlalchemy import create_mock_engine, event
 
 from nomenklatura import settings
-from nomenklatura.db import SQLITE_MAX_VARS
+from nomenklatura.db import SQLITE_MAX_VARS, supports_copy
+from nomenklatura.judgement import Judgement
 from nomenklatura.resolver import Resolver
 from nomenklatura.store import SimpleMemoryStore, SQLStore, Store
+from nomenklatura.store.duckdb_ import DuckDBStore
 from nomenklatura.store.level import LevelDBStore
-from nomenklatura.store.sql import SQLWriter
+from nomenklatura.store.sql import SQLView, SQLWriter
 
 
 def _run_store_test(
@@ -88,6 +91,18 @@ def test_store_sql(
         store.close()
 
 
+def test_store_sql_copy(
+    test_dataset: Dataset,
+    donations_json: List[Dict[str, Any]],
+    resolver: Resolver[Entity],
+):
+    if not settings.DB_URL.startswith("postgres"):
+        pytest.skip("COPY loading requires PostgreSQL")
+    store = SQLStore(dataset=test_dataset, linker=resolver, uri=settings.DB_URL)
+    assert supports_copy(store.engine.dialect)
+    assert _run_store_test(store, test_dataset, donations_json)
+
+
 def test_sql_writer_sqlite_batch_limit_cap(
     tmp_path: Path,
     test_dataset: Dataset,
@@ -148,3 +163,73 @@ def test_store_level(
     path = tmp_path / "level.db"
     store = LevelDBStore(dataset=test_dataset, linker=resolver, path=path)
     assert _run_store_test(store, test_dataset, donations_json)
+
+
+def test_sql_view_merged(
+    tmp_path: Path,
+    test_dataset: Dataset,
+    resolver: Resolver[Entity],
+):
+    uri = f"sqlite:///{tmp_path / 'test.db'}"
+    store = SQLStore(dataset=test_dataset, linker=resolver, uri=uri)
+    person = {"id": "john-doe", "schema": "Person", "properties": {"name": ["John"]}}
+    other = {"id": "john-2", "schema": "Person", "properties": {"birthDate": ["1976"]}}
+    owner = {
+        "id": "own",
+        "schema": "Ownership",
+        "properties": {"owner": ["john-2"], "asset": ["acme"]},
+    }
+    try:
+        with store.writer() as writer:
+            for data in (person, other, owner):
+                writer.add_entity(Entity.from_data(test_dataset, data))
+        merged_id = resolver.decide("john-doe", "john-2", judgement=Judgement.POSITIVE)
+        store.update(merged_id.id)
+
+        view = store.default_view()
+        assert isinstance(view, SQLView)
+        entity = view.get_entity(merged_id.id)
+        assert entity is not None
+        assert entity.get("name") == ["John"]
+        assert entity.get("birthDate") == ["1976"]
+        assert view.has_entity(merged_id.id)
+        assert not view.has_entity("john-doe")
+        assert len(list(view.entities())) == 2
+
+        inverted = list(view.get_inverted(merged_id.id))
+        assert len(inverted) == 1
+        prop, ownership = inverted[0]
+        assert prop.name == "ownershipOwner"
+        assert ownership.id == "own"
+        assert len(list(view.get_adjacent(entity))) == 1
+
+        view.close()
+        assert view._conn is None
+
+        # A view checks out one pool connection for all of its lookups:
+        checkouts = []
+        event.listen(store.engine, "checkout", lambda *a: checkouts.append(a))
+        with store.default_view() as other_view:
+            assert isinstance(other_view, SQLView)
+            for _ in range(10):
+                assert other_view.get_entity(merged_id.id) is not None
+                assert other_view.has_entity(merged_id.id)
+            assert len(list(other_view.get_inverted(merged_id.id))) == 1
+            assert store.engine.pool.checkedout() == 1
+        assert len(checkouts) == 1
+        assert store.engine.pool.checkedout() == 0
+    finally:
+        store.close()
+
+
+def test_store_duckdb(
+    tmp_path: Path,
+    test_dataset: Dataset,
+    donations_json: List[Dict[str, Any]],
+    resolver: Resolver[Entity],
+):
+    store = DuckDBStore(dataset=test_dataset, linker=resolver, path=tmp_path / "db")
+    try:
+        assert _run_store_test(store, test_dataset, donations_json)
+    finally:
+        store.close()
@@ -5,6 +5,7 @@ from followthemoney import model, Dataset, StatementEntity as Entity
 from followthemoney.dataset.versions import Version
 from rigour.time import datetime_iso, utc_now
 
+from nomenklatura.delta import ADD, DEL, MOD
 from nomenklatura.resolver import Resolver
 from nomenklatura.judgement import Judgement
 from nomenklatura.store.versioned import VersionedRedisStore
@@ -141,3 +142,179 @@ def test_versioning(test_dataset: Dataset, resolver: Resolver[Entity]):
     store.drop_version(test_dataset.name, version_b)
     assert store.get_latest(test_dataset.name) == version_a
     assert len(store.get_history(test_dataset.name)) == 1
+
+
+def test_first_seen_timestamps(test_dataset: Dataset, resolver: Resolver[Entity]):
+    redis = fakeredis.FakeStrictRedis(version=6, decode_responses=False)
+    store = VersionedRedisStore(test_dataset, resolver, db=redis)
+    entity = Entity.from_data(test_dataset, PERSON)
+    entity_ext = Entity.from_data(test_dataset, PERSON_EXT)
+
+    # A version written without timestamps has no first_seen hash:
+    with store.writer() as writer:
+        for stmt in entity.statements:
+            writer.add_statement(stmt.clone(first_seen="2020-01-01T00:00:00"))
+        writer.release()
+
+    with store.writer(timestamps=True) as writer:
+        for stmt in entity.statements:
+            writer.add_statement(stmt.clone(first_seen="2021-01-01T00:00:00"))
+        for stmt in entity_ext.statements:
+            writer.add_statement(stmt.clone(first_seen="2021-01-01T00:00:00"))
+        writer.release()
+    view = store.view(test_dataset)
+    assert set(view.get_timestamps("john-doe").values()) == {"2020-01-01T00:00:00"}
+    assert set(view.get_timestamps("john-doe-2").values()) == {"2021-01-01T00:00:00"}
+
+    # The next version reads the first_seen hash of the previous one:
+    with store.writer(timestamps=True) as writer:
+        for stmt in entity.statements:
+            writer.add_statement(stmt.clone(first_seen="2022-01-01T00:00:00"))
+        for stmt in entity_ext.statements:
+            writer.add_statement(stmt.clone(first_seen="2022-01-01T00:00:00"))
+        writer.release()
+    latest = store.get_latest(test_dataset.name)
+    assert latest is not None
+    assert redis.exists(f"seen:{test_dataset.name}:{latest}")
+    view = store.view(test_dataset)
+    assert set(view.get_timestamps("john-doe").values()) == {"2020-01-01T00:00:00"}
+    assert set(view.get_timestamps("john-doe-2").values()) == {"2021-01-01T00:00:00"}
+
+    store.drop_version(test_dataset.name, latest)
+    assert not redis.exists(f"seen:{test_dataset.name}:{latest}")
+
+
+def test_batched_reads(
+    donations_json, test_dataset: Dataset, resolver: Resolver[Entity]
+):
+    redis = fakeredis.FakeStrictRedis(version=6, decode_responses=False)
+    store = VersionedRedisStore(test_dataset, resolver, db=redis)
+    with store.writer() as writer:
+        for data in donations_json:
+            writer.add_entity(Entity.from_data(test_dataset, data))
+        writer.release()
+    view = store.view(test_dataset)
+    view.BATCH_ENTITIES = 7
+    entities = list(view.entities())
+    assert len(entities) == len(donations_json)
+    assert len({e.id for e in entities}) == len(donations_json)
+    statements = list(view.statements())
+    assert len(statements) == sum(len(list(e.statements)) for e in entities)
+    daimler = [e for e in entities if e.id == DAIMLER][0]
+    assert daimler == view.get_entity(DAIMLER)
+
+
+def test_version_diff(test_dataset: Dataset, resolver: Resolver[Entity]):
+    redis = fakeredis.FakeStrictRedis(version=6, decode_responses=False)
+    store = VersionedRedisStore(test_dataset, resolver, db=redis)
+    person = Entity.from_data(test_dataset, PERSON)
+    person_ext = Entity.from_data(test_dataset, PERSON_EXT)
+    other = Entity.from_data(
+        test_dataset, {"id": "jane", "schema": "Person", "properties": {"name": ["J"]}}
+    )
+    version_a = Version.new().id + "a"
+    with store.writer(version=version_a) as writer:
+        writer.add_entity(person)
+        writer.add_entity(person_ext)
+    version_b = Version.new().id + "b"
+    with store.writer(version=version_b) as writer:
+        for stmt in person.statements:
+            writer.add_statement(stmt.clone(last_seen="2030-01-01T00:00:00"))
+        writer.flush()
+        person_ext.add("birthDate", "1980")
+        writer.add_entity(person_ext)
+        writer.add_entity(other)
+
+    changes = {
+        id: (op, e) for op, id, e in store.diff(test_dataset.name, version_a, version_b)
+    }
+    assert set(changes.keys()) == {"john-doe-2", "jane"}
+    assert changes["jane"][0] == ADD
+    op, entity = changes["john-doe-2"]
+    assert op == MOD
+    assert entity is not None
+    assert entity.get("birthDate") == ["1980"]
+
+    changes = {
+        id: (op, e) for op, id, e in store.diff(test_dataset.name, version_b, version_a)
+    }
+    assert changes["jane"] == (DEL, None)
+    assert changes["john-doe-2"][0] == MOD
+
+    # A statement written again in a later flush is only counted once:
+    version_c = Version.new().id + "c"
+    with store.writer(version=version_c) as writer:
+        writer.add_entity(person)
+        writer.flush()
+        writer.add_entity(person)
+        writer.add_entity(person_ext)
+        writer.add_entity(other)
+    digest_b = redis.hgetall(f"digest:{test_dataset.name}:{version_b}")
+    assert redis.hgetall(f"digest:{test_dataset.name}:{version_c}") == digest_b
+    assert list(store.diff(test_dataset.name, version_b, version_c)) == []
+
+    # Versions without statement digests fall back to comparing statements:
+    redis.delete(f"digest:{test_dataset.name}:{version_a}")
+    diff = list(store.diff(test_dataset.name, version_a, version_b))
+    assert sorted((op, id) for op, id, _ in diff) == [
+        (ADD, "jane"),
+        (MOD, "john-doe-2"),
+    ]
+
+
+def test_drop_version(
+    donations_json, test_dataset: Dataset, resolver: Resolver[Entity]
+):
+    redis = fakeredis.FakeStrictRedis(version=6, decode_responses=False)
+    store = VersionedRedisStore(test_dataset, resolver, db=redis)
+    versions = []
+    for suffix in ("a", "ab", "abc"):
+        version = Version.new().id + suffix
+        with store.writer(version=version, timestamps=True) as writer:
+            for data in donations_json:
+                writer.add_entity(Entity.from_data(test_dataset, data))
+            writer.release()
+        versions.append(version)
+
+    def version_keys(version: str):
+        return [k for k in redis.keys() if f":{version}".encode() in k]
+
+    assert len(version_keys(versions[0])) > len(donations_json)
+    store.BATCH_DROP = 100
+    store.drop_version(test_dataset.name, versions[0])
+    assert version_keys(versions[0]) == []
+    assert store.get_drops() == {}
+    # Versions sharing the prefix of the dropped one are untouched:
+    assert store.has_version(test_dataset.name, versions[1])
+    assert len(list(store.view(test_dataset).entities())) == len(donations_json)
+
+    # Simulate a drop that was interrupted, of a version without a registry:
+    redis.delete(f"meta:{test_dataset.name}:{versions[1]}")
+    redis.hset("drops", f"{test_dataset.name}:{versions[1]}", 0)
+    assert len(store.get_drops()) == 1
+    store.resume_drops()
+    assert version_keys(versions[1]) == []
+    assert store.get_drops() == {}
+
+    # A drop interrupted after it left the history still unsets the latest:
+    assert store.get_latest(test_dataset.name) == versions[2]
+    pipeline = redis.pipeline(transaction=True)
+    pipeline.hsetnx("drops", f"{test_dataset.name}:{versions[2]}", 0)
+    pipeline.lrem(f"ds:{test_dataset.name}:history", 0, versions[2])
+    pipeline.execute()
+    store.resume_drops()
+    assert version_keys(versions[2]) == []
+    assert store.get_history(test_dataset.name) == []
+    assert store.get_latest(test_dataset.name) is None
+    assert store.get_drops() == {}
+
+    version = Version.new().id + "abcd"
+    with store.writer(version=version) as writer:
+        writer.add_entity(Entity.from_data(test_dataset, donations_json[0]))
+        writer.release()
+    versions.append(version)
+    thread = store.drop_version(test_dataset.name, versions[3], background=True)
+    assert thread is not None
+    thread.join()
+    assert version_keys(versions[3]) == []
+    assert versions[3] not in store.get_history(test_dataset.name)
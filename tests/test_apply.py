@@ -0,0 +1,141 @@
+import io
+import csv
+import orjson
+from pathlib import Path
+from typing import List
+from followthemoney import Dataset, StatementEntity, ValueEntity
+from followthemoney.cli.util import write_entity
+from followthemoney.statement import CSV, FORMATS, PACK, Statement, read_statements
+from followthemoney.statement import write_statements
+
+from nomenklatura.apply import apply_entities, apply_statements, read_chunks
+from nomenklatura.judgement import Judgement
+from nomenklatura.resolver import Linker, Resolver
+
+DAIMLER = "66ce9f62af8c7d329506da41cb7c36ba058b3d28"
+DAIMLER_2 = "187e2f6e4aebe4d7119da679f10c4588e74bcabf"
+
+
+def _statements(donations_path: Path, dataset: Dataset) -> List[Statement]:
+    statements: List[Statement] = []
+    with open(donations_path, "rb") as fh:
+        while line := fh.readline():
+            entity = StatementEntity.from_data(dataset, orjson.loads(line))
+            statements.extend(entity.statements)
+    return statements
+
+
+def test_read_chunks():
+    lines = [b'"a","b\n', b'c"\n', b'"d","e"\n']
+    chunks = list(read_chunks(lines, True, size=1))
+    assert chunks == [b'"a","b\nc"\n', b'"d","e"\n']
+    chunks = list(read_chunks(lines, False, size=1))
+    assert len(chunks) == 3
+
+
+def test_apply_statements(
+    tmp_path: Path,
+    donations_path: Path,
+    test_dataset: Dataset,
+    resolver: Resolver[StatementEntity],
+):
+    canonical = resolver.decide(DAIMLER, DAIMLER_2, Judgement.POSITIVE)
+    linker = resolver.get_linker()
+    statements = _statements(donations_path, test_dataset)
+    for format in FORMATS:
+        in_path = tmp_path / f"in.{format}"
+        with open(in_path, "wb") as fh:
+            write_statements(fh, format, statements)
+        expected_path = tmp_path / f"expected.{format}"
+        with open(expected_path, "wb") as fh:
+            applied = (linker.apply_statement(s) for s in statements)
+            write_statements(fh, format, applied)
+        expected = expected_path.read_bytes()
+
+        for workers in (1, 2):
+            out_path = tmp_path / f"out.{format}"
+            with open(in_path, "rb") as infh:
+                with open(out_path, "wb") as outfh:
+                    apply_statements(
+                        linker, infh, outfh, format, workers=workers, chunk_size=20_000
+                    )
+            result = out_path.read_bytes()
+            if format == PACK:
+                # The pack writer removes duplicates per batch, not per chunk:
+                assert set(result.splitlines()) == set(expected.splitlines())
+            else:
+                assert result == expected, format
+        if format == CSV:
+            assert canonical.id.encode("utf-8") in result
+            assert DAIMLER.encode("utf-8") in result
+
+
+def test_apply_entities(donations_path: Path, resolver: Resolver[StatementEntity]):
+    canonical = resolver.decide(DAIMLER, DAIMLER_2, Judgement.POSITIVE)
+    linker = resolver.get_linker()
+    expected = io.BytesIO()
+    with open(donations_path, "rb") as fh:
+        while line := fh.readline():
+            proxy = ValueEntity.from_dict(orjson.loads(line))
+            write_entity(expected, linker.apply_stream(proxy))
+
+    outfh = io.BytesIO()
+    with open(donations_path, "rb") as fh:
+        apply_entities(linker, fh, outfh, workers=2, chunk_size=20_000)
+    assert outfh.getvalue() == expected.getvalue()
+    assert canonical.id.encode("utf-8") in outfh.getvalue()
+
+
+def _apply_csv(linker: Linker[StatementEntity], path: Path, data: bytes) -> bytes:
+    in_path = path / "in.csv"
+    in_path.write_bytes(data)
+    out_path = path / "out.csv"
+    with open(in_path, "rb") as infh, open(out_path, "wb") as outfh:
+        apply_statements(linker, infh, outfh, CSV)
+    return out_path.read_bytes()
+
+
+def test_apply_statements_minimal_csv(
+    tmp_path: Path, resolver: Resolver[StatementEntity]
+):
+    canonical = resolver.decide(DAIMLER, DAIMLER_2, Judgement.POSITIVE)
+    linker = resolver.get_linker()
+    rows = [
+        "entity_id,prop,prop_type,schema,value,dataset",
+        f"pay,payer,entity,Payment,{DAIMLER},donations",
+        f"{DAIMLER_2},name,name,Company,Daimler AG,donations",
+    ]
+    data = "\n".join(rows).encode("utf-8") + b"\n"
+
+    # Columns which the reader fills with defaults may be left out, and are
+    # then added by way of `Statement` objects, like in a plain read and write:
+    result = _apply_csv(linker, tmp_path, data)
+    expected_path = tmp_path / "expected.csv"
+    with open(expected_path, "wb") as fh:
+        stmts = read_statements(io.BytesIO(data), CSV)
+        write_statements(fh, CSV, (linker.apply_statement(s) for s in stmts))
+    assert result == expected_path.read_bytes()
+    applied = list(read_statements(io.BytesIO(result), CSV))
+    assert applied[0].value == canonical.id
+    assert applied[0].original_value == DAIMLER
+    assert applied[0].lang is None
+    assert applied[0].id is not None
+    assert applied[1].canonical_id == canonical.id
+
+    # Without only the unused `lang` column, rows are rewritten in place:
+    with open(expected_path, "wb") as fh:
+        write_statements(fh, CSV, read_statements(io.BytesIO(data), CSV))
+    full = expected_path.read_text("utf-8")
+    rows = list(csv.reader(io.StringIO(full)))
+    lang = rows[0].index("lang")
+    out = io.StringIO()
+    writer = csv.writer(out, dialect=csv.unix_dialect)
+    writer.writerows([c for i, c in enumerate(r) if i != lang] for r in rows)
+    data = out.getvalue().encode("utf-8")
+    result = _apply_csv(linker, tmp_path, data)
+    assert result.splitlines()[0] == data.splitlines()[0]
+    applied = list(read_statements(io.BytesIO(result), CSV))
+    assert applied[0].value == canonical.id
+    assert applied[0].original_value == DAIMLER
+    assert applied[0].lang is None
+    assert applied[1].canonical_id == canonical.id
@@ -1,11 +1,12 @@
 from pathlib import Path
 from typing import List, Dict, Any, Generator
 import pytest
-from sqlalchemy import Column, MetaData, Table, Unicode, insert, select
+from sqlalchemy import Column, MetaData, Table, Unicode, insert, select, text
 from followthemoney import Dataset, Statement, StatementEntity
 
 from nomenklatura.db import get_engine, make_session, Session
-from nomenklatura.db import make_statement_table, insert_statements
+from nomenklatura.db import make_statement_table, insert_statements, supports_copy
+from nomenklatura.db import copy_statements
 
 
 def _kv_table(session: Session) -> Table:
@@ -139,3 +140,52 @@ def test_insert_statements_sqlite_large_batch(
         cursor = conn.execute(q)
         stmts = list(cursor.fetchall())
         assert len(stmts) > len(donations_json)
+
+
+def test_insert_statements_copy(
+    test_dataset: Dataset, donations_json: List[Dict[str, Any]]
+):
+    engine = get_engine()
+    if not supports_copy(engine.dialect):
+        pytest.skip("COPY loading requires PostgreSQL")
+    metadata = MetaData()
+    table = make_statement_table(metadata, name="statement_copy")
+    metadata.create_all(bind=engine, tables=[table])
+    statements = list(_parse_statements(test_dataset, donations_json))
+    odd = statements[0].clone(value="tab\there\nnew \\ line")
+    statements.append(odd)
+    insert_statements(engine, table, test_dataset.name, statements)
+    # Loading twice replaces the dataset and re-builds the indexes:
+    insert_statements(
+        engine, table, test_dataset.name, statements, rebuild_indexes=True
+    )
+
+    with engine.connect() as conn:
+        rows = conn.execute(select(table)).fetchall()
+        assert len(rows) == len({s.id for s in statements})
+        row = conn.execute(select(table).where(table.c.id == odd.id)).fetchone()
+        assert row is not None
+        assert row.value == odd.value
+        assert row.original_value is None
+        assert row.external is False
+    table.drop(bind=engine)
+
+
+def test_copy_statements_restores_timeout(
+    test_dataset: Dataset, donations_json: List[Dict[str, Any]]
+):
+    engine = get_engine()
+    if not supports_copy(engine.dialect):
+        pytest.skip("COPY loading requires PostgreSQL")
+    metadata = MetaData()
+    table = make_statement_table(metadata, name="statement_copy_timeout")
+    metadata.create_all(bind=engine, tables=[table])
+    statements = list(_parse_statements(test_dataset, donations_json))
+    timeout = text("SELECT current_setting('statement_timeout')")
+    with engine.begin() as conn:
+        before = conn.execute(timeout).scalar_one()
+        assert copy_statements(conn, table, statements) == len(statements)
+        # The timeout is only lifted for the merge, not the rest of the
+        # transaction:
+        assert conn.execute(timeout).scalar_one() == before
+    table.drop(bind=engine)
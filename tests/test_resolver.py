@@ -30,6 +30,8 @@ def test_qid_identifier():
     regular = Identifier("src-123")
     assert max(ident_low, ident_hi, nk, regular) == ident_hi
     assert max(nk, regular) == nk
+    for ident in (ident_low, nk, regular):
+        assert Identifier.is_canonical(ident.id) == ident.canonical
 
 
 def test_resolver(resolver: Resolver[StatementEntity], db_session):
@@ -453,3 +455,46 @@ def test_table_name(
     assert other_table_resolver.get_edge("a1", a_canon) is not None
     assert len(list(other_table_resolver.get_judgements())) == 2
     assert "another_table" in repr(other_table_resolver)
+
+
+def test_cluster_blockers(resolver: Resolver[StatementEntity]):
+    def scan(left: str, right: str) -> Judgement:
+        # Reference: check every pair of members for a blocking edge.
+        for e in resolver.connected(Identifier.get(left)):
+            for o in resolver.connected(Identifier.get(right)):
+                for key in ((e.id, o.id), (o.id, e.id)):
+                    judgement = resolver._blockers.get(key)
+                    if judgement is not None:
+                        return judgement
+        return Judgement.NO_JUDGEMENT
+
+    resolver.decide("a1", "b1", Judgement.UNSURE)
+    resolver.decide("a2", "c1", Judgement.NEGATIVE)
+    assert resolver.get_judgement("a1", "b1") == Judgement.UNSURE
+    assert resolver.get_judgement("a1", "c1") == Judgement.NO_JUDGEMENT
+
+    # Merges carry the blockers of both clusters:
+    a_canon = resolver.decide("a1", "a2", Judgement.POSITIVE)
+    assert resolver.get_judgement("a2", "b1") == Judgement.UNSURE
+    assert resolver.get_judgement("c1", "a1") == Judgement.NEGATIVE
+    b_canon = resolver.decide("b1", "b2", Judgement.POSITIVE)
+    assert resolver.get_judgement(b_canon, a_canon) == Judgement.UNSURE
+    assert resolver.get_judgement("b2", "a2") == Judgement.UNSURE
+
+    # A negative edge between the same clusters takes precedence:
+    resolver.decide("b2", "a2", Judgement.NEGATIVE)
+    assert resolver.get_judgement("a1", "b1") == Judgement.NEGATIVE
+    resolver.decide("b2", "a2", Judgement.UNSURE)
+    assert resolver.get_judgement("a1", "b1") == Judgement.UNSURE
+    resolver.remove("b1")
+    assert resolver.get_judgement("a1", "b1") == Judgement.NO_JUDGEMENT
+    assert resolver.get_judgement("a1", "b2") == Judgement.UNSURE
+
+    # Rebuilding from the database gives the same result:
+    ids = ["a1", "a2", "b1", "b2", "c1", a_canon.id, b_canon.id]
+    results = {(e, o): resolver.get_judgement(e, o) for e in ids for o in ids}
+    resolver.load_into_memory()
+    for (e, o), judgement in results.items():
+        assert resolver.get_judgement(e, o) == judgement
+        if judgement != Judgement.POSITIVE:
+            assert scan(e, o) == judgement
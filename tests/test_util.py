@@ -0,0 +1,7 @@
+from nomenklatura.util import chunked
+
+
+def test_chunked():
+    assert list(chunked([], 3)) == []
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunked(iter("abc"), 3)) == [["a", "b", "c"]]
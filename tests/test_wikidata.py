@@ -35,6 +35,24 @@ def test_lang_text():
     assert text1 == text2
 
 
+def test_lang_text_pick_dict():
+    data = {
+        "de": {"language": "de", "value": "Wladimir Putin"},
+        "en": {"language": "en", "value": "Vladimir Putin"},
+        "xx-bogus": {"language": "xx-bogus", "value": "Vlad"},
+    }
+    picked = LangText.pick_dict(data)
+    assert picked == LangText.pick(LangText.from_dict(data))
+    assert picked is not None
+    assert picked.text == "Vladimir Putin"
+    data.pop("en")
+    picked = LangText.pick_dict(data)
+    assert picked is not None
+    assert picked.lang == "deu"
+    aliases = {"xx-bogus": [{"language": "xx-bogus", "value": "Vlad"}]}
+    assert LangText.pick_dict(aliases) is None
+
+
 def test_model_apply():
     dataset = Dataset.make({"name": "wikidata", "title": "Wikidata"})
     ent = Entity.from_data(dataset, {"schema": "Person", "id": "Q7747"})
@@ -508,6 +526,94 @@ def test_types_missing_ancestor(test_cache: Cache):
         assert item.types == {"Q1000", "Q2000"}
 
 
+def test_types_closure_cache(test_cache: Cache):
+    # Q1 and Q2 are instances of Q10, in a class hierarchy with a cycle:
+    parents = {
+        "Q1": ("P31", "Q10"),
+        "Q2": ("P31", "Q10"),
+        "Q10": ("P279", "Q20"),
+        "Q20": ("P279", "Q10"),
+    }
+    fetched = []
+
+    def handler(request, context):
+        qid = request.qs["ids"][0].upper()
+        fetched.append(qid)
+        if qid not in parents:
+            return {"error": {"code": "no-such-entity", "id": qid}}
+        prop, parent = parents[qid]
+        snak = {
+            "snaktype": "value",
+            "property": prop,
+            "datatype": "wikibase-item",
+            "datavalue": {"type": "wikibase-entityid", "value": {"id": parent}},
+        }
+        claim = {"id": f"{qid}$1", "rank": "normal", "mainsnak": snak}
+        return {"entities": {qid: {"id": qid, "claims": {prop: [claim]}}}}
+
+    with requests_mock.Mocker(real_http=False) as m:
+        m.register_uri("GET", WikidataClient.WD_API, json=handler)
+        client = WikidataClient(test_cache)
+        item = client.fetch_item("Q1")
+        assert item is not None
+        assert item.types == {"Q1", "Q10", "Q20"}
+        assert fetched == ["Q1", "Q10", "Q20"]
+        assert client.get_types("Q10") == frozenset(["Q10", "Q20"])
+
+        # A fresh client reads the ancestor closures from the cache:
+        fetched.clear()
+        client = WikidataClient(test_cache)
+        item = client.fetch_item("Q2")
+        assert item is not None
+        assert item.types == {"Q2", "Q10", "Q20"}
+        assert fetched == ["Q2"]
+
+
+def test_types_closure_reference_time(test_cache: Cache):
+    from datetime import datetime
+
+    # Q10 stopped being a subclass of Q20 at the end of 2020:
+    fetched = []
+
+    def handler(request, context):
+        qid = request.qs["ids"][0].upper()
+        fetched.append(qid)
+        if qid not in ("Q1", "Q10"):
+            return {"error": {"code": "no-such-entity", "id": qid}}
+        prop, parent = ("P31", "Q10") if qid == "Q1" else ("P279", "Q20")
+        snak = {
+            "snaktype": "value",
+            "property": prop,
+            "datatype": "wikibase-item",
+            "datavalue": {"type": "wikibase-entityid", "value": {"id": parent}},
+        }
+        claim = {"id": f"{qid}$1", "rank": "normal", "mainsnak": snak}
+        if qid == "Q10":
+            claim["qualifiers"] = {"P582": [_time_snak("P582", "+2020-12-31T00:00:00Z")]}
+        return {"entities": {qid: {"id": qid, "claims": {prop: [claim]}}}}
+
+    with requests_mock.Mocker(real_http=False) as m:
+        m.register_uri("GET", WikidataClient.WD_API, json=handler)
+        before = WikidataClient(test_cache, reference_time=datetime(2020, 6, 1))
+        item = before.fetch_item("Q1")
+        assert item is not None
+        assert item.types == {"Q1", "Q10", "Q20"}
+
+        assert fetched == ["Q1", "Q10", "Q20"]
+
+        # The cached parent types hold for a client pinned to a later time,
+        # which leaves out the ended claim when it builds the closure:
+        fetched.clear()
+        after = WikidataClient(test_cache, reference_time=datetime(2021, 6, 1))
+        item = after.fetch_item("Q1")
+        assert item is not None
+        assert item.types == {"Q1", "Q10"}
+        assert fetched == []
+        before = WikidataClient(test_cache, reference_time=datetime(2020, 6, 1))
+        assert before.get_types("Q1") == frozenset(["Q1", "Q10", "Q20"])
+        assert fetched == []
+
+
 def _time_snak(prop: str, time: str, precision: int = 11):
     return {
         "snaktype": "value",
@@ -635,3 +741,20 @@ def test_model(test_cache: Cache):
         birth_dates = [c for c in item.claims if c.property == "P569"]
         assert len(birth_dates) == 1
         assert birth_dates[0].text.text == "1952-10-07"
+
+
+def test_model_lazy_claims(test_cache: Cache):
+    with requests_mock.Mocker(real_http=False) as m:
+        m.register_uri("GET", WikidataClient.WD_API, json=wd_read_response)
+        client = WikidataClient(test_cache)
+        item = client.fetch_item("Q7747")
+        assert item is not None
+        assert item._parsed == {}
+        assert item.is_instance("Q5")
+        assert list(item._parsed.keys()) == ["P31"]
+        assert [c.property for c in item.filter_claims(["P569"])] == ["P569"]
+        assert "P39" in item.properties
+        assert "P39" not in item._parsed
+        positions = [c for c in item.claims if c.property == "P39"]
+        assert len(positions) > 1
+        assert item.get_claims("P39") == positions
@@ -0,0 +1,98 @@
+import gzip
+import shutil
+import requests_mock
+from pathlib import Path
+from datetime import datetime, timezone
+from click.testing import CliRunner
+
+from nomenklatura.cli import cli
+from nomenklatura.cache import Cache
+from nomenklatura.wikidata import WikidataClient
+from nomenklatura.wikidata.dump import WikidataDump, read_dump
+
+from .conftest import FIXTURES_PATH
+
+DUMP_FIXTURE = FIXTURES_PATH / "wikidata_dump.json"
+
+
+def gzip_dump(tmp_path: Path) -> Path:
+    path = tmp_path / "latest-all.json.gz"
+    with open(DUMP_FIXTURE, "rb") as fh, gzip.open(path, "wb") as out:
+        shutil.copyfileobj(fh, out)
+    return path
+
+
+def test_read_dump(tmp_path: Path):
+    ids = [e["id"] for e in read_dump(gzip_dump(tmp_path))]
+    # The painting and the item with a deprecated P31=Q5 are skipped:
+    assert ids == ["Q1001", "Q2001", "Q3001", "Q5", "Q4164871", "P39"]
+    ids = [e["id"] for e in read_dump(DUMP_FIXTURE, types=["Q3305213"])]
+    assert "Q4001" in ids
+    assert "Q1001" not in ids
+
+
+def test_dump_store(tmp_path: Path):
+    dump = WikidataDump(tmp_path / "store")
+    assert dump.load(gzip_dump(tmp_path)) == 6
+    assert dump.get("Q4001") is None
+    data = dump.get("Q1001")
+    assert data is not None
+    assert set(data["labels"].keys()) == {"en", "de"}
+    assert list(data["descriptions"].keys()) == ["en"]
+    claim = data["claims"]["P31"][0]
+    assert "hash" not in claim["mainsnak"]
+    assert list(claim["references"][0]["snaks"].keys()) == ["P854"]
+    sitelinks = data["sitelinks"]
+    assert sitelinks["enwiki"]["url"] == "https://en.wikipedia.org/wiki/Jane_Example"
+    assert sitelinks["zh_yuewiki"]["url"].startswith("https://zh-yue.wikipedia.org/")
+    assert "url" not in sitelinks["commonswiki"]
+    dump.close()
+
+
+def test_client_reads_dump(tmp_path: Path, test_cache: Cache):
+    dump = WikidataDump(tmp_path / "store")
+    dump.load(DUMP_FIXTURE)
+    requested = []
+
+    def handler(request, context):
+        qid = request.qs["ids"][0].upper()
+        requested.append(qid)
+        return {"error": {"code": "no-such-entity", "id": qid}}
+
+    with requests_mock.Mocker(real_http=False) as m:
+        m.register_uri("GET", WikidataClient.WD_API, json=handler)
+        client = WikidataClient(test_cache, dump=dump)
+        item = client.fetch_item("Q1001")
+        assert item is not None
+        assert item.label is not None
+        assert item.label.text == "Jane Example"
+        assert item.is_instance("Q5")
+        assert item.types == {"Q1001", "Q5", "Q215627"}
+        positions = [c for c in item.claims if c.property == "P39"]
+        assert positions[0].property_label.text == "position held"
+        assert positions[0].text.text == "Minister of Examples"
+        assert [s.url for s in item.wikilinks if s.site == "enwiki"] == [
+            "https://en.wikipedia.org/wiki/Jane_Example"
+        ]
+        # Only the class which isn't in the dump is fetched from the API:
+        assert requested == ["Q215627"]
+
+        # An item changed since the dump was made is read from the API:
+        modified_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        assert client.fetch_item("Q2001", modified_at=modified_at) is None
+        assert requested[-1] == "Q2001"
+        assert client.fetch_item("Q2001", modified_at=datetime(2024, 1, 1)) is not None
+    dump.close()
+
+
+def test_import_dump_cli(tmp_path: Path):
+    store_path = tmp_path / "store"
+    runner = CliRunner()
+    args = ["wikidata-import-dump", str(DUMP_FIXTURE), str(store_path)]
+    res = runner.invoke(cli, args + ["-t", "Q6256"])
+    assert res.exit_code == 0, res.output
+    dump = WikidataDump(store_path)
+    assert dump.get("Q3001") is not None
+    assert dump.get("Q1001") is None
+    assert dump.get("Q5") is not None
+    dump.close()